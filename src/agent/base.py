@@ -1,8 +1,6 @@
-import tomllib
+from agent.prompt_registry import PromptTemplate, get_prompt_registry
 
 
 class BaseAgent:
-    def _load_prompt(self, prompt_source: str, prompt_name: str) -> str:
-        with open(f'src/agent/settings/{prompt_source}', 'rb') as f:
-            config_dict = tomllib.load(f)
-        return config_dict[prompt_name]['default']
+    def _get_prompt(self, prompt_source: str, prompt_name: str) -> PromptTemplate:
+        return get_prompt_registry().get(prompt_source, prompt_name)
@@ -1,14 +1,15 @@
+import asyncio
 from collections.abc import AsyncGenerator
 
 import attr
 
 from agent.base import BaseAgent
-from database.mongodb.chat_doc import ChatDoc
-from database.mongodb.client import async_mongodb_client
-from database.mongodb.gmail_doc import GmailDoc
-from database.qdrant.client import async_qdrant_client
-from database.qdrant.rag_vec_store import RAGVecStore
+from agent.prompt_builder import PromptBuilder, build_prompt_builder
+from core.rerank import IdentityReranker, RerankerProtocol
+from core.retrieval import RetrievalConstraints, RetrievedChunk, Retriever
+from core.retrieval_cache import RetrievalCache
 from embedding.base import EncoderProtocol
+from settings import get_settings
 
 
 @attr.s()
@@ -16,63 +17,66 @@ class ChatAgent(BaseAgent):
     user_name: str | None = attr.ib()
     encoder: EncoderProtocol = attr.ib()
     llm_chat_func: callable = attr.ib()
+    constraints: RetrievalConstraints | None = attr.ib(default=None)
+    retrieval_cache: RetrievalCache | None = attr.ib(default=None)
+    reranker: RerankerProtocol = attr.ib(factory=IdentityReranker)
+    prompt_builder: PromptBuilder = attr.ib(factory=build_prompt_builder)
 
-    def _construct_prompt(self, query: str, context: str) -> str:
-        prompt_template = self._load_prompt(
+    def _construct_messages(
+        self,
+        query: str,
+        chunks: list[RetrievedChunk],
+        history: list[dict],
+        context_window: int | None = None,
+    ) -> list[dict]:
+        prompt_template = self._get_prompt(
             prompt_source='chat_agent_prompts.toml', prompt_name='memory_recall_prompt'
         )
-        return prompt_template.format(
-            user_name=self.user_name, query=query, context=context
-        )
-
-    async def _get_text_list_by_source(self, source: str, ids: list[str]) -> list[str]:
-        if source == 'message':
-            source_cls = ChatDoc
-        elif source == 'gmail':
-            source_cls = GmailDoc
-        else:
-            raise ValueError('There is no {source} source!}')
-
-        async with async_mongodb_client() as client:
-            chunks = await source_cls.get_doc_by_ids(
-                client=client, ids=[_id.replace('-', '') for _id in ids]
-            )
-        return [chunk['text'] for chunk in chunks]
-
-    async def _retrieve_similar_messages(
-        self, embedding: list[float], limit: int = 5
-    ) -> list[str]:
-        async with async_qdrant_client() as client:
-            vector_results = await RAGVecStore.search(
-                client=client,
-                query_vector=embedding,
-                limit=limit,
-                with_payload=['source'],
-            )
+        return self.prompt_builder.build(
+            template=prompt_template,
+            query=query,
+            chunks=chunks,
+            history=history,
+            fields={'user_name': self.user_name},
+            max_context_chunks=context_window,
+        ).messages
 
-        text_list = []
-        for source in ['message', 'gmail']:
-            vector_ids = [
-                vector_result.id
-                for vector_result in vector_results
-                if vector_result.payload['source'] == source
-            ]
-            text_list += await self._get_text_list_by_source(source, vector_ids)
-
-        return text_list
+    async def _retrieve_similar_chunks(
+        self, query: str, limit: int
+    ) -> list[RetrievedChunk]:
+        settings = get_settings()
+        retriever = Retriever(
+            encoder=self.encoder,
+            cache=self.retrieval_cache,
+            expand_neighbors=settings.RETRIEVAL_EXPAND_NEIGHBORS,
+            merge_spans=settings.RETRIEVAL_MERGE_SPANS,
+        )
+        return await retriever.retrieve(
+            query, limit=limit, constraints=self.constraints
+        )
 
-    async def _retrieve_context(self, query: str, context_window: int = 30) -> str:
-        query_embedding = self.encoder.encode([query])[0]
-        results = await self._retrieve_similar_messages(
-            embedding=query_embedding.tolist(), limit=context_window
+    async def _retrieve_context(
+        self, query: str, context_window: int | None = None
+    ) -> list[RetrievedChunk]:
+        # 先多撈候選再 rerank，最後由 prompt builder 依 token 預算挑出前 k 個
+        context_window = context_window or self.prompt_builder.max_context_chunks
+        candidates = await self._retrieve_similar_chunks(
+            query, limit=max(context_window, self.reranker.candidates)
         )
-        return ' '.join(results)
+        return await self.reranker.rerank(query, candidates)
 
     async def generate_response(
-        self, query: str, history: list[dict], context_window: int = 3
+        self, query: str, history: list[dict], context_window: int | None = None
     ) -> AsyncGenerator[str, None]:
-        context = await self._retrieve_context(query, context_window=context_window)
-        async for token in self.llm_chat_func(
-            prompt=self._construct_prompt(query=query, context=context), history=history
-        ):
+        chunks = await self._retrieve_context(query, context_window=context_window)
+        # history 最後一則是這次的提問，由組好的 prompt 取代；
+        # 計算 token 會呼叫 tokenizer，放到 thread 執行避免卡住 event loop
+        messages = await asyncio.to_thread(
+            self._construct_messages,
+            query,
+            chunks,
+            history[:-1],
+            context_window=context_window,
+        )
+        async for token in self.llm_chat_func(messages=messages):
             yield token
@@ -1,27 +1,195 @@
-from collections.abc import AsyncGenerator
+import asyncio
+import importlib.util
+import weakref
+from collections import OrderedDict, defaultdict, deque
+from collections.abc import AsyncGenerator, Callable
 from contextlib import asynccontextmanager
 
+import attr
+import httpx
 from ollama import AsyncClient
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
 from settings import get_settings
 
+LLMClient = AsyncOpenAI | AsyncClient
+
+
+def _http_client_kwargs() -> dict:
+    settings = get_settings()
+    return {
+        'timeout': httpx.Timeout(
+            settings.LLM_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS
+        ),
+        'limits': httpx.Limits(
+            max_connections=settings.LLM_POOL_SIZE,
+            max_keepalive_connections=settings.LLM_POOL_SIZE,
+            keepalive_expiry=settings.LLM_KEEPALIVE_SECONDS,
+        ),
+        # 沒裝 h2 時退回 HTTP/1.1
+        'http2': settings.LLM_HTTP2 and importlib.util.find_spec('h2') is not None,
+    }
+
+
+def build_openai_client(api_key: str | None) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=api_key or get_settings().OPENAI_API_KEY,
+        http_client=DefaultAsyncHttpxClient(**_http_client_kwargs()),
+    )
+
+
+def build_ollama_client(host: str | None) -> AsyncClient:
+    return AsyncClient(host=host or get_settings().OLLAMA_HOST, **_http_client_kwargs())
+
+
+async def close_llm_client(client: LLMClient) -> None:
+    if isinstance(client, AsyncOpenAI):
+        await client.close()
+    else:
+        await client._client.aclose()
+
+
+@attr.s(auto_attribs=True)
+class LLMClientRegistry:
+    max_size: int = 8
+    ttft_window: int = 200
+
+    def __attrs_post_init__(self) -> None:
+        self._clients: OrderedDict[tuple, LLMClient] = OrderedDict()
+        self._borrowed: dict[int, int] = defaultdict(int)
+        self._evicted: dict[int, LLMClient] = {}
+        self._ttft: dict[str, deque[float]] = defaultdict(
+            lambda: deque(maxlen=self.ttft_window)
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @asynccontextmanager
+    async def borrow(
+        self, source: str, api_key: str | None = None, host: str | None = None
+    ) -> AsyncGenerator[LLMClient, None]:
+        client = await self._get_or_create(source, api_key, host)
+        self._borrowed[id(client)] += 1
+        try:
+            yield client
+        finally:
+            self._borrowed[id(client)] -= 1
+            if not self._borrowed[id(client)]:
+                del self._borrowed[id(client)]
+                # 被 LRU 淘汰時還在串流的 client，最後一個借用者歸還後才關閉
+                evicted = self._evicted.pop(id(client), None)
+                if evicted is not None:
+                    await close_llm_client(evicted)
+
+    def record_ttft(self, source: str, seconds: float) -> None:
+        self._ttft[source].append(seconds)
+
+    def stats(self) -> dict:
+        ttft = {}
+        for source, samples in self._ttft.items():
+            ordered = sorted(samples)
+            ttft[source] = {
+                'count': len(ordered),
+                'mean_seconds': sum(ordered) / len(ordered),
+                'p50_seconds': ordered[len(ordered) // 2],
+                'p95_seconds': ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+            }
+        return {
+            'clients': len(self._clients),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'ttft': ttft,
+        }
+
+    async def close(self) -> None:
+        clients = list(self._clients.values()) + list(self._evicted.values())
+        self._clients.clear()
+        self._evicted.clear()
+        await asyncio.gather(*(close_llm_client(client) for client in clients))
+
+    async def _get_or_create(
+        self, source: str, api_key: str | None, host: str | None
+    ) -> LLMClient:
+        key = (source, api_key, host)
+        if key in self._clients:
+            self.hits += 1
+            self._clients.move_to_end(key)
+            return self._clients[key]
+
+        self.misses += 1
+        client = LLM_CLIENT_BUILDERS[source](api_key=api_key, host=host)
+        self._clients[key] = client
+        while len(self._clients) > self.max_size:
+            _, evicted = self._clients.popitem(last=False)
+            self.evictions += 1
+            if self._borrowed.get(id(evicted)):
+                self._evicted[id(evicted)] = evicted
+            else:
+                await close_llm_client(evicted)
+        return client
+
+
+LLM_CLIENT_BUILDERS: dict[str, Callable[..., LLMClient]] = {
+    'openai': lambda api_key, host: build_openai_client(api_key),
+    'ollama': lambda api_key, host: build_ollama_client(host),
+}
+
+# lifespan 建立的 registry 依 event loop 區分，沒有 registry 時維持每次建立新 client
+_registries: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LLMClientRegistry] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def init_llm_client_registry() -> LLMClientRegistry:
+    loop = asyncio.get_running_loop()
+    if loop not in _registries:
+        _registries[loop] = LLMClientRegistry(
+            max_size=get_settings().LLM_CLIENT_CACHE_SIZE
+        )
+    return _registries[loop]
+
+
+def get_llm_client_registry() -> LLMClientRegistry | None:
+    return _registries.get(asyncio.get_running_loop())
+
+
+async def close_llm_client_registry() -> None:
+    registry = _registries.pop(asyncio.get_running_loop(), None)
+    if registry is not None:
+        await registry.close()
+
 
 @asynccontextmanager
-async def async_ollama_client() -> AsyncGenerator[AsyncClient, None]:
-    client = AsyncClient(host=get_settings().OLLAMA_HOST)
+async def async_llm_client(
+    source: str, api_key: str | None = None, host: str | None = None
+) -> AsyncGenerator[LLMClient, None]:
+    registry = get_llm_client_registry()
+    if registry is not None:
+        async with registry.borrow(source, api_key=api_key, host=host) as client:
+            yield client
+        return
+
+    client = LLM_CLIENT_BUILDERS[source](api_key=api_key, host=host)
     try:
         yield client
     finally:
-        await client._client.aclose()
+        await close_llm_client(client)
+
+
+@asynccontextmanager
+async def async_ollama_client(
+    host: str | None = None,
+) -> AsyncGenerator[AsyncClient, None]:
+    async with async_llm_client('ollama', host=host) as client:
+        yield client
 
 
 @asynccontextmanager
 async def async_openai_client(
     api_key: str | None = None,
 ) -> AsyncGenerator[AsyncOpenAI, None]:
-    client = AsyncOpenAI(api_key=api_key or get_settings().OPENAI_API_KEY)
-    try:
+    async with async_llm_client('openai', api_key=api_key) as client:
         yield client
-    finally:
-        await client.close()
@@ -0,0 +1,220 @@
+import asyncio
+import functools
+import logging
+import threading
+from typing import TYPE_CHECKING
+
+import attr
+
+from agent.prompt_registry import PromptTemplate
+from core.rerank import select_within_budget
+from core.retrieval import RetrievedChunk
+from embedding.sparse import tokenize
+from settings import get_settings
+from utils import estimate_tokens
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerBase
+
+TRUNCATION_MARK = '…'
+CONTEXT_SEPARATOR = '\n\n'
+
+
+@attr.s(auto_attribs=True)
+class TokenCounter:
+    tokenizer_name: str | None = None
+
+    def __attrs_post_init__(self) -> None:
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        # fast tokenizer 不適合多個 thread 同時呼叫，編碼時逐一進行
+        self._encode_lock = threading.Lock()
+        self._load_task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        # API 啟動後在背景載入，第一個請求不用在 event loop 上等 from_pretrained
+        if self._load_task is None:
+            self._load_task = asyncio.create_task(
+                asyncio.to_thread(self._get_tokenizer)
+            )
+
+    def _get_tokenizer(self) -> 'PreTrainedTokenizerBase | None':
+        with self._lock:
+            if self._loaded:
+                return self._tokenizer
+            self._loaded = True
+            if self.tokenizer_name is None:
+                return None
+
+            try:
+                from transformers import AutoTokenizer
+
+                self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+            except Exception:
+                # 載不到 tokenizer 就退回字元估算，只影響預算精準度
+                logging.exception('Failed to load tokenizer %s', self.tokenizer_name)
+            return self._tokenizer
+
+    def count(self, text: str) -> int:
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            return estimate_tokens(text)
+        with self._encode_lock:
+            return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.count(text) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ''
+
+        tokenizer = self._get_tokenizer()
+        if tokenizer is not None:
+            with self._encode_lock:
+                token_ids = tokenizer.encode(text, add_special_tokens=False)
+                return tokenizer.decode(token_ids[:max_tokens]) + TRUNCATION_MARK
+
+        # 二分搜尋最長且不超過預算的前綴
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate_tokens(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low] + TRUNCATION_MARK
+
+
+@functools.cache
+def get_token_counter(tokenizer_name: str | None = None) -> TokenCounter:
+    return TokenCounter(tokenizer_name=tokenizer_name)
+
+
+def build_token_counter() -> TokenCounter:
+    settings = get_settings()
+    # 與 Encoder 相同，只有 production 才載入真正的 tokenizer
+    if settings.ENVIRONMENT != 'production':
+        return get_token_counter(None)
+    return get_token_counter(settings.PROMPT_TOKENIZER_NAME)
+
+
+def jaccard_similarity(left: set[str], right: set[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+@attr.s(auto_attribs=True)
+class BuiltPrompt:
+    messages: list[dict]
+    prompt_tokens: int
+    context_chunks: int
+    history_turns: int
+
+
+@attr.s(auto_attribs=True)
+class PromptBuilder:
+    token_counter: TokenCounter = attr.Factory(TokenCounter)
+    max_prompt_tokens: int = 6000
+    max_context_tokens: int = 1500
+    max_context_chunks: int = 5
+    recent_turns: int = 4
+    max_turn_tokens: int = 200
+    dedup_threshold: float = 0.6
+
+    def dedupe_chunks(self, chunks: list[RetrievedChunk]) -> list[RetrievedChunk]:
+        # 重疊的 window 會共用幾行訊息，已出現過的行不再重複放入
+        seen_lines = set()
+        kept_tokens = []
+        deduped = []
+        for chunk in chunks:
+            lines = [
+                line
+                for line in chunk.text.splitlines()
+                if line.strip() and line not in seen_lines
+            ]
+            if not lines:
+                continue
+
+            text = '\n'.join(lines)
+            tokens = set(tokenize(text))
+            if any(
+                jaccard_similarity(tokens, kept) >= self.dedup_threshold
+                for kept in kept_tokens
+            ):
+                continue
+
+            seen_lines.update(lines)
+            kept_tokens.append(tokens)
+            deduped.append(attr.evolve(chunk, text=text))
+        return deduped
+
+    def compact_history(self, history: list[dict], token_budget: int) -> list[dict]:
+        # 由新到舊放入，最近幾輪保留原文，較舊的截短，超過預算就捨棄更舊的
+        compacted = []
+        used_tokens = 0
+        for idx, turn in enumerate(reversed(history)):
+            content = turn.get('content') or ''
+            if idx >= self.recent_turns:
+                content = self.token_counter.truncate(content, self.max_turn_tokens)
+
+            tokens = self.token_counter.count(content)
+            if used_tokens + tokens > token_budget:
+                break
+            compacted.append({'role': turn['role'], 'content': content})
+            used_tokens += tokens
+        return compacted[::-1]
+
+    def build(
+        self,
+        template: PromptTemplate,
+        query: str,
+        chunks: list[RetrievedChunk],
+        history: list[dict],
+        fields: dict | None = None,
+        max_context_chunks: int | None = None,
+    ) -> BuiltPrompt:
+        fields = fields or {}
+        base_tokens = self.token_counter.count(
+            template.render(query=query, context='', **fields)
+        )
+        context_chunks = select_within_budget(
+            self.dedupe_chunks(chunks),
+            top_k=max_context_chunks or self.max_context_chunks,
+            token_budget=min(
+                self.max_context_tokens, max(self.max_prompt_tokens - base_tokens, 0)
+            ),
+            count_tokens=self.token_counter.count,
+        )
+        prompt = template.render(
+            query=query,
+            context=CONTEXT_SEPARATOR.join(chunk.text for chunk in context_chunks),
+            **fields,
+        )
+        prompt_tokens = self.token_counter.count(prompt)
+
+        # context 沒用完的預算留給對話紀錄
+        turns = self.compact_history(
+            history, max(self.max_prompt_tokens - prompt_tokens, 0)
+        )
+        return BuiltPrompt(
+            messages=[*turns, {'role': 'user', 'content': prompt}],
+            prompt_tokens=prompt_tokens
+            + sum(self.token_counter.count(turn['content']) for turn in turns),
+            context_chunks=len(context_chunks),
+            history_turns=len(turns),
+        )
+
+
+def build_prompt_builder() -> PromptBuilder:
+    settings = get_settings()
+    return PromptBuilder(
+        token_counter=build_token_counter(),
+        max_prompt_tokens=settings.PROMPT_MAX_TOKENS,
+        max_context_tokens=settings.RERANK_CONTEXT_TOKEN_BUDGET,
+        max_context_chunks=settings.RERANK_TOP_K,
+        recent_turns=settings.PROMPT_RECENT_TURNS,
+        max_turn_tokens=settings.PROMPT_MAX_TURN_TOKENS,
+        dedup_threshold=settings.PROMPT_DEDUP_THRESHOLD,
+    )
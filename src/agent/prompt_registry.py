@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+import tomllib
+from pathlib import Path
+from string import Formatter
+
+import attr
+
+from settings import get_settings
+
+PROMPT_DIR = Path(__file__).parent / 'settings'
+DEFAULT_VARIANT = 'default'
+
+
+class PromptTemplateError(ValueError):
+    pass
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class PromptTemplate:
+    name: str
+    template: str
+    placeholders: frozenset[str] = attr.ib(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        placeholders = set()
+        try:
+            fields = [field for _, field, _, _ in Formatter().parse(self.template)]
+        except ValueError as e:
+            raise PromptTemplateError(f'Prompt {self.name} is malformed: {e}') from e
+
+        for field in fields:
+            if field is None:
+                continue
+            # 只允許具名欄位，{0}、{user.name} 這類寫法在 render 時才會出錯
+            if not field.isidentifier():
+                raise PromptTemplateError(
+                    f'Prompt {self.name} has unsupported placeholder {{{field}}}'
+                )
+            placeholders.add(field)
+        object.__setattr__(self, 'placeholders', frozenset(placeholders))
+
+    def render(self, **fields: object) -> str:
+        missing = self.placeholders - fields.keys()
+        if missing:
+            raise PromptTemplateError(
+                f'Prompt {self.name} is missing fields {sorted(missing)}'
+            )
+        return self.template.format_map(fields)
+
+
+def load_prompt_file(path: Path) -> dict[tuple[str, str, str], PromptTemplate]:
+    with open(path, 'rb') as f:
+        config_dict = tomllib.load(f)
+
+    templates = {}
+    for prompt_name, prompt_config in config_dict.items():
+        # placeholders 宣告這個 prompt 必須（也只能）用到的欄位
+        declared = set(prompt_config.get('placeholders', []))
+        for variant, template in prompt_config.items():
+            if variant == 'placeholders':
+                continue
+            prompt = PromptTemplate(
+                name=f'{path.name}:{prompt_name}.{variant}', template=template
+            )
+            if 'placeholders' in prompt_config and prompt.placeholders != declared:
+                raise PromptTemplateError(
+                    f'Prompt {prompt.name} uses {sorted(prompt.placeholders)}, '
+                    f'expected {sorted(declared)}'
+                )
+            templates[(path.name, prompt_name, variant)] = prompt
+    return templates
+
+
+@attr.s(auto_attribs=True)
+class PromptRegistry:
+    prompt_dir: Path = PROMPT_DIR
+    hot_reload: bool = False
+    reload_interval: float = 1.0
+
+    def __attrs_post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._templates: dict[tuple[str, str, str], PromptTemplate] = {}
+        self._mtimes: dict[Path, float] = {}
+        self._checked_at = 0.0
+        self.load()
+
+    def load(self) -> None:
+        templates = {}
+        mtimes = {}
+        for path in sorted(Path(self.prompt_dir).glob('*.toml')):
+            mtimes[path] = path.stat().st_mtime
+            templates.update(load_prompt_file(path))
+
+        with self._lock:
+            self._templates = templates
+            self._mtimes = mtimes
+            self._checked_at = time.monotonic()
+
+    def get(
+        self, prompt_source: str, prompt_name: str, variant: str = DEFAULT_VARIANT
+    ) -> PromptTemplate:
+        if self.hot_reload:
+            self._reload_if_changed()
+
+        key = (prompt_source, prompt_name, variant)
+        if key not in self._templates:
+            raise KeyError(f'Unknown prompt {prompt_source}:{prompt_name}.{variant}')
+        return self._templates[key]
+
+    def render(
+        self,
+        prompt_source: str,
+        prompt_name: str,
+        variant: str = DEFAULT_VARIANT,
+        **fields: object,
+    ) -> str:
+        return self.get(prompt_source, prompt_name, variant).render(**fields)
+
+    def _reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        paths = set(Path(self.prompt_dir).glob('*.toml'))
+        if paths == set(self._mtimes) and all(
+            path.stat().st_mtime == mtime for path, mtime in self._mtimes.items()
+        ):
+            return
+
+        try:
+            self.load()
+        except (OSError, tomllib.TOMLDecodeError, PromptTemplateError):
+            # 改到一半的檔案先沿用舊的 prompt，下次檢查再重新載入
+            logging.exception('Failed to reload prompts, keeping the previous ones')
+
+
+_prompt_registry: PromptRegistry | None = None
+
+
+def init_prompt_registry() -> PromptRegistry:
+    global _prompt_registry
+    _prompt_registry = PromptRegistry(hot_reload=get_settings().PROMPT_HOT_RELOAD)
+    return _prompt_registry
+
+
+def get_prompt_registry() -> PromptRegistry:
+    # 沒有經過 API lifespan（例如 script、測試）時第一次使用才載入
+    if _prompt_registry is None:
+        return init_prompt_registry()
+    return _prompt_registry
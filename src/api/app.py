@@ -1,26 +1,71 @@
+import asyncio
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from agent.client import close_llm_client_registry, init_llm_client_registry
+from agent.prompt_builder import build_token_counter
+from agent.prompt_registry import init_prompt_registry
 from api.router.auth import auth_router
 from api.router.chat import chat_router
 from api.router.ingest import ingest_router
 from api.router.memory import memory_router
+from core.job_scheduler import IngestJobScheduler
+from core.rerank import build_reranker
+from core.retrieval_cache import build_retrieval_cache
 from database.mongodb.base import init_mongodb_cols
+from database.mongodb.client import (
+    check_mongodb_health,
+    close_mongodb_client,
+    init_mongodb_client,
+)
 from database.qdrant.base import init_qdrant_cols
-from embedding.encoder import Encoder
+from database.qdrant.client import (
+    check_qdrant_health,
+    close_qdrant_client,
+    init_qdrant_client,
+)
+from embedding.factory import build_encoder
+from embedding.loader import EncoderLoader
+from settings import get_settings
 
 app = FastAPI()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator:
+    app.state.qdrant_client = await init_qdrant_client()
+    app.state.mongodb_client = await init_mongodb_client()
+    app.state.llm_client_registry = init_llm_client_registry()
+    # prompt 啟動時載入並檢查，render 時不再讀檔
+    app.state.prompt_registry = init_prompt_registry()
+    # tokenizer 在背景載入，chat 請求共用同一個 TokenCounter
+    build_token_counter().start()
+    app.state.retrieval_cache = build_retrieval_cache()
+    app.state.reranker = build_reranker()
+    app.state.reranker.start()
     await init_qdrant_cols()
     await init_mongodb_cols()
-    app.state.encoder = Encoder()
+    app.state.encoder_loader = EncoderLoader(factory=build_encoder)
+    app.state.encoder_loader.start()
+    settings = get_settings()
+    app.state.ingest_scheduler = IngestJobScheduler(
+        concurrency={
+            'message': settings.INGEST_JOB_MESSAGE_CONCURRENCY,
+            'gmail': settings.INGEST_JOB_GMAIL_CONCURRENCY,
+        },
+        history_size=settings.INGEST_JOB_HISTORY_SIZE,
+    )
+    app.state.ingest_scheduler.start()
     yield
     print('🛑 Shutting down...')
+    await app.state.ingest_scheduler.close()
+    app.state.encoder_loader.close()
+    app.state.reranker.close()
+    await close_qdrant_client()
+    await close_mongodb_client()
+    await close_llm_client_registry()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -31,5 +76,30 @@ app.include_router(memory_router)
 
 
 @app.get('/health_check')
-def health_check() -> None:
-    return {'message': 'Hello, FastAPI! Bonjur!'}
+async def health_check() -> dict:
+    qdrant_status, mongodb_status = await asyncio.gather(
+        check_qdrant_health(), check_mongodb_health()
+    )
+    return {
+        'message': 'Hello, FastAPI! Bonjur!',
+        'encoder': app.state.encoder_loader.status,
+        'qdrant': qdrant_status,
+        'mongodb': mongodb_status,
+    }
+
+
+@app.get('/stats')
+async def stats() -> dict:
+    retrieval_cache = app.state.retrieval_cache
+    service_stats = {
+        'llm': app.state.llm_client_registry.stats(),
+        'retrieval_cache': (
+            retrieval_cache.stats() if retrieval_cache else {'enabled': False}
+        ),
+        'reranker': app.state.reranker.stats(),
+    }
+    if app.state.encoder_loader.status != 'ready':
+        return {'encoder': {'status': app.state.encoder_loader.status}, **service_stats}
+
+    encoder = await app.state.encoder_loader.get()
+    return {'encoder': encoder.stats(), **service_stats}
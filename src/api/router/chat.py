@@ -1,12 +1,15 @@
 from collections.abc import AsyncGenerator
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import StreamingResponse
 
 from api.schema import MessagePayload
-from api.utils import get_encoder, safe_stream_wrapper
+from api.utils import get_encoder, safe_stream_wrapper, start_stream
 from core.agent_handler import AgentHandler
 from core.llm_handler import LLMHandler
+from core.rerank import RerankerProtocol
+from core.retrieval import RetrievalConstraints
+from core.retrieval_cache import RetrievalCache
 from embedding.base import EncoderProtocol
 
 chat_router = APIRouter(prefix='/chat', tags=['chat'])
@@ -21,6 +24,9 @@ async def chat_stream_response(
     api_key: str | None,
     user_name: str | None,
     encoder: EncoderProtocol,
+    reranker: RerankerProtocol,
+    constraints: RetrievalConstraints | None = None,
+    retrieval_cache: RetrievalCache | None = None,
 ) -> AsyncGenerator[str, None]:
     llm_handler = LLMHandler(llm_name=llm_name, llm_source=llm_source, api_key=api_key)
     llm_chat_func = llm_handler.get_llm_chat_func()
@@ -29,6 +35,9 @@ async def chat_stream_response(
         user_name=user_name,
         encoder=encoder,
         llm_chat_func=llm_chat_func,
+        constraints=constraints,
+        retrieval_cache=retrieval_cache,
+        reranker=reranker,
     )
     response = agent_handler.get_chat_response(message=message, history=history)
     async for token in response:
@@ -38,17 +47,24 @@ async def chat_stream_response(
 @chat_router.post('/chat-with-agent')
 async def chat_with_agent(
     payload: MessagePayload,
+    request: Request,
     encoder: EncoderProtocol = Depends(get_encoder),  # noqa: B008
 ) -> dict:
-    return StreamingResponse(
-        chat_stream_response(
-            message=payload.message,
-            history=payload.history,
-            llm_name=payload.llm_name,
-            llm_source=payload.llm_source,
-            api_key=payload.api_key,
-            user_name=payload.user_name,
-            encoder=encoder,
+    stream = chat_stream_response(
+        message=payload.message,
+        history=payload.history,
+        llm_name=payload.llm_name,
+        llm_source=payload.llm_source,
+        api_key=payload.api_key,
+        user_name=payload.user_name,
+        encoder=encoder,
+        reranker=request.app.state.reranker,
+        constraints=RetrievalConstraints.from_dates(
+            senders=payload.senders,
+            start_date=payload.start_date,
+            end_date=payload.end_date,
+            sources=payload.sources,
         ),
-        media_type='text/plain',
+        retrieval_cache=request.app.state.retrieval_cache,
     )
+    return StreamingResponse(await start_stream(stream), media_type='text/plain')
@@ -1,98 +1,171 @@
+import functools
 import json
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, AsyncIterable
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 
 from api.schema import IngestMessagePayload
 from api.utils import get_encoder, safe_stream_wrapper
 from core.gmail_handler import GmailHandler
+from core.job_scheduler import IngestJobScheduler
+from core.message_chunker import get_chunking_config
 from core.message_handler import MessageHandler
+from core.message_upload import UPLOAD_JOB_TYPE, MessageUploadHandler
+from core.retrieval_cache import RetrievalCache, invalidate_on_write
+from database.mongodb.client import async_mongodb_client
+from database.mongodb.ingest_job_doc import IngestJobDoc
 from embedding.base import EncoderProtocol
+from settings import get_settings
 
 ingest_router = APIRouter(prefix='/ingest', tags=['ingest'])
 
-
-@safe_stream_wrapper
-async def ingest_message_stream_response(
-    documents: list[dict], encoder: EncoderProtocol
-) -> AsyncGenerator[int, None]:
-    handler = MessageHandler(
-        documents=documents,
-        encoder=encoder,
-        window_sizes=[5],
-        stride=3,
-    )
-    response = handler.index_message_chunks()
-
-    async for indexed_ratio in response:
-        yield (
-            json.dumps(
-                {
-                    'status': 'ok',
-                    'indexed_ratio': indexed_ratio,
-                }
-            )
-            + '\n'
-        )
+GMAIL_MAX_RESULTS = 5
 
 
 @safe_stream_wrapper
-async def ingest_gmail_stream_response(
-    access_token: str,
-    refresh_token: str,
-    token_uri: str,
-    client_id: str,
-    client_secret: str,
-    scopes: list[str],
+async def ingest_upload_stream_response(
+    job: dict,
+    chunks: AsyncIterable[bytes],
+    offset: int,
     encoder: EncoderProtocol,
-) -> AsyncGenerator[int, None]:
-    handler = GmailHandler(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-        scopes=scopes,
+    ingest_scheduler: IngestJobScheduler,
+    retrieval_cache: RetrievalCache | None = None,
+) -> AsyncGenerator[str, None]:
+    settings = get_settings()
+    handler = MessageUploadHandler(
+        job=job,
         encoder=encoder,
+        preprocess_workers=settings.INGEST_PREPROCESS_WORKERS,
+        group_size=settings.INGEST_UPLOAD_GROUP_DOCUMENTS,
+        acquire_slot=functools.partial(ingest_scheduler.slot, 'message'),
+        **get_chunking_config(),
     )
 
-    response = handler.index_gmail_chunks(max_results=5, label_ids=['INBOX'])
-
-    async for indexed_ratio in response:
-        yield (
-            json.dumps(
-                {
-                    'status': 'ok',
-                    'indexed_ratio': indexed_ratio,
-                }
-            )
-            + '\n'
-        )
+    run = invalidate_on_write(
+        retrieval_cache,
+        'message',
+        functools.partial(handler.ingest_stream, chunks, offset=offset),
+    )
+    async for progress in run():
+        yield json.dumps({'status': 'ok', **progress}) + '\n'
+
+
+async def get_upload_job(job_id: str) -> dict:
+    async with async_mongodb_client() as client:
+        job = await IngestJobDoc.get_job(client=client, job_id=job_id)
+    if job is None or job['job_type'] != UPLOAD_JOB_TYPE:
+        raise HTTPException(status_code=404, detail=f'Unknown upload job {job_id}')
+    return job
 
 
 @ingest_router.post('/message')
 async def ingest_message(
     payload: IngestMessagePayload,
+    request: Request,
     encoder: EncoderProtocol = Depends(get_encoder),  # noqa: B008
 ) -> dict:
-    documents = payload.documents
+    handler = MessageHandler(
+        documents=payload.documents,
+        encoder=encoder,
+        preprocess_workers=get_settings().INGEST_PREPROCESS_WORKERS,
+        **get_chunking_config(),
+    )
+    job = await request.app.state.ingest_scheduler.submit(
+        job_type='message',
+        size=sum(len(doc.get('messages', [])) for doc in payload.documents),
+        run=invalidate_on_write(
+            request.app.state.retrieval_cache, 'message', handler.index_message_chunks
+        ),
+    )
+    return job.to_dict()
+
+
+@ingest_router.post('/message/uploads')
+async def create_message_upload() -> dict:
+    async with async_mongodb_client() as client:
+        job = await IngestJobDoc.create_job(client=client, job_type=UPLOAD_JOB_TYPE)
+    return {'job_id': job['job_id'], 'committed_documents': 0}
+
+
+@ingest_router.put('/message/uploads/{job_id}')
+async def upload_message_documents(
+    job_id: str,
+    request: Request,
+    offset: int = 0,
+    encoder: EncoderProtocol = Depends(get_encoder),  # noqa: B008
+) -> StreamingResponse:
+    # body 為 NDJSON 或串接的 JSON object，邊收邊解析，每 commit 一組文件就更新 job
+    # request body 只能在 request 期間讀取，所以不進 ingest_scheduler 的佇列，
+    # 但每組文件都要先取得 'message' 的名額；DELETE /ingest/jobs/{job_id} 會在
+    # 下一組 commit 時停止，之後從 committed_documents 續傳
+    job = await get_upload_job(job_id)
+    if offset > job['committed_documents']:
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f'Offset {offset} is past the committed documents, resume from '
+                f'{job["committed_documents"]}'
+            ),
+        )
 
     return StreamingResponse(
-        ingest_message_stream_response(documents, encoder),
+        ingest_upload_stream_response(
+            job,
+            request.stream(),
+            offset,
+            encoder,
+            ingest_scheduler=request.app.state.ingest_scheduler,
+            retrieval_cache=request.app.state.retrieval_cache,
+        ),
         media_type='text/plain',
     )
 
 
+@ingest_router.get('/message/uploads/{job_id}')
+async def get_message_upload(job_id: str) -> dict:
+    job = await get_upload_job(job_id)
+    return {key: value for key, value in job.items() if key != '_id'}
+
+
 @ingest_router.post('/gmail')
 async def ingest_gmail(
     request: Request,
     encoder: EncoderProtocol = Depends(get_encoder),  # noqa: B008
-) -> None:
-    return StreamingResponse(
-        ingest_gmail_stream_response(
-            **request.app.state.credentials_dict,
-            encoder=encoder,
+) -> dict:
+    handler = GmailHandler(**request.app.state.credentials_dict, encoder=encoder)
+    job = await request.app.state.ingest_scheduler.submit(
+        job_type='gmail',
+        size=GMAIL_MAX_RESULTS,
+        run=invalidate_on_write(
+            request.app.state.retrieval_cache,
+            'gmail',
+            functools.partial(
+                handler.index_gmail_chunks,
+                max_results=GMAIL_MAX_RESULTS,
+                label_ids=['INBOX'],
+            ),
         ),
-        media_type='text/plain',
     )
+    return job.to_dict()
+
+
+@ingest_router.get('/jobs/{job_id}')
+async def get_ingest_job(job_id: str, request: Request) -> dict:
+    job = request.app.state.ingest_scheduler.get(job_id)
+    if job is not None:
+        return job.to_dict()
+
+    # 其他 API worker 或先前的 process 建立的 job 從 Mongo 讀取最後回報的進度
+    async with async_mongodb_client() as client:
+        doc = await IngestJobDoc.get_job(client=client, job_id=job_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail=f'Unknown ingest job {job_id}')
+    return {key: value for key, value in doc.items() if key != '_id'}
+
+
+@ingest_router.delete('/jobs/{job_id}')
+async def cancel_ingest_job(job_id: str, request: Request) -> dict:
+    await get_ingest_job(job_id, request)
+    cancelled = await request.app.state.ingest_scheduler.cancel(job_id)
+    return {'job_id': job_id, 'cancel_requested': True, 'cancelled': cancelled}
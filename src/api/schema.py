@@ -1,3 +1,4 @@
+from datetime import date
 from typing import Any
 
 from pydantic import BaseModel
@@ -10,6 +11,11 @@ class MessagePayload(BaseModel):
     llm_source: str = 'openai'
     api_key: str | None = None
     user_name: str | None = None
+    # 檢索條件
+    senders: list[str] | None = None
+    start_date: date | None = None
+    end_date: date | None = None
+    sources: list[str] | None = None
 
 
 class IngestMessagePayload(BaseModel):
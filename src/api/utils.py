@@ -4,16 +4,46 @@ import logging
 from collections.abc import AsyncGenerator, Callable, Coroutine
 from typing import Any
 
-from fastapi import Request
+from fastapi import HTTPException, Request
 from fastapi.responses import JSONResponse
 
+from embedding.base import EncoderProtocol
+from embedding.executor import InferenceQueueFullError
+from embedding.loader import EncoderNotReadyError
+from settings import get_settings
+
 ERROR_STATUS_KEY = 'status'
 ERROR_MESSAGE_KEY = 'message'
 ERROR_VALUE = 'error_value'
 
 
-def get_encoder(request: Request) -> object:
-    return request.app.state.encoder
+async def get_encoder(request: Request) -> EncoderProtocol:
+    try:
+        return await request.app.state.encoder_loader.get(
+            timeout=get_settings().ENCODER_LOAD_WAIT_SECONDS
+        )
+    except EncoderNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+
+
+async def start_stream(
+    stream: AsyncGenerator[str, None],
+) -> AsyncGenerator[str, None]:
+    # 先取出第一個 chunk 再送出 header，開始回應前推論佇列已滿才能回 503
+    try:
+        first = await anext(stream)
+    except StopAsyncIteration:
+        return stream
+    except InferenceQueueFullError as e:
+        await stream.aclose()
+        raise HTTPException(status_code=503, detail=str(e)) from e
+
+    async def resume() -> AsyncGenerator[str, None]:
+        yield first
+        async for item in stream:
+            yield item
+
+    return resume()
 
 
 def safe_stream_wrapper(
@@ -28,6 +58,9 @@ def safe_stream_wrapper(
         try:
             async for item in func(*args, **kwargs):
                 yield item
+        except InferenceQueueFullError:
+            # 交給 start_stream 轉成 503
+            raise
         except Exception as e:
             logging.exception('Unexpected error occurred during streaming')
             yield (
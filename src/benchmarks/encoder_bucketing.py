@@ -0,0 +1,89 @@
+"""Compare token-budget batching against a plain model.encode call.
+
+Usage (from the repository root, with the production model available):
+
+    ENVIRONMENT=production PYTHONPATH=src python -m benchmarks.encoder_bucketing
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from embedding.encoder import Encoder
+
+CHAT_LINES = [
+    'Alice: 明天早上要不要一起去爬山？',
+    'Bob: 好啊，幾點集合？',
+    'Alice: 八點在捷運站見',
+    'Bob: Did you book the restaurant for Friday?',
+    'Alice: Yes, 7pm at the ramen place near the office 🍜',
+    'Bob: 記得帶雨傘，氣象說下午會下雨',
+    'Alice: 我把報告寄給你了，有空看一下',
+]
+EMAIL_PARAGRAPH = (
+    'Dear customer, thank you for your order. Your package has been shipped and '
+    'is expected to arrive within three to five business days. 您的訂單已出貨，'
+    '預計於三到五個工作天內送達。如有任何問題，請回覆此郵件與客服聯繫。 '
+)
+
+
+def build_mixed_corpus(
+    chat_windows: int, emails: int, window_size: int = 5, seed: int = 0
+) -> list[str]:
+    rng = random.Random(seed)
+    corpus = [
+        '\n'.join(rng.choice(CHAT_LINES) for _ in range(window_size))
+        for _ in range(chat_windows)
+    ]
+    corpus += [EMAIL_PARAGRAPH * rng.randint(2, 20) for _ in range(emails)]
+    rng.shuffle(corpus)
+    return corpus
+
+
+def timed(func: callable, repeat: int) -> tuple[float, np.ndarray]:
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chat-windows', type=int, default=400)
+    parser.add_argument('--emails', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-tokens-per-batch', type=int, default=16384)
+    args = parser.parse_args()
+
+    corpus = build_mixed_corpus(chat_windows=args.chat_windows, emails=args.emails)
+    encoder = Encoder(max_tokens_per_batch=args.max_tokens_per_batch)
+    lengths = encoder.token_lengths(corpus)
+    print(
+        f'corpus: {len(corpus)} texts, {sum(lengths)} tokens, '
+        f'min/median/max length {min(lengths)}/{int(np.median(lengths))}/'
+        f'{max(lengths)}'
+    )
+
+    baseline_seconds, baseline = timed(
+        lambda: encoder.model.encode(sentences=corpus), repeat=args.repeat
+    )
+    bucketed_seconds, bucketed = timed(
+        lambda: encoder.encode(sentences=corpus), repeat=args.repeat
+    )
+
+    cosine = np.sum(baseline * bucketed, axis=1) / (
+        np.linalg.norm(baseline, axis=1) * np.linalg.norm(bucketed, axis=1)
+    )
+    print(f'model.encode:        {baseline_seconds:.2f}s')
+    print(f'token-budget encode: {bucketed_seconds:.2f}s')
+    print(f'speedup:             {baseline_seconds / bucketed_seconds:.2f}x')
+    print(f'min cosine vs baseline: {cosine.min():.6f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Report cosine drift of a quantized/ONNX encoder backend against fp32 torch.
+
+Usage (from the repository root, with the production model available):
+
+    ENVIRONMENT=production PYTHONPATH=src python -m benchmarks.encoder_parity \\
+        --backend torch-int8
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.encoder_bucketing import build_mixed_corpus
+from embedding.encoder import ENCODER_BACKENDS, Encoder
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def encode_timed(encoder: Encoder, corpus: list[str]) -> tuple[float, np.ndarray]:
+    start = time.perf_counter()
+    embeddings = encoder.encode(sentences=corpus)
+    return time.perf_counter() - start, normalize(embeddings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', choices=ENCODER_BACKENDS, default='torch-int8')
+    parser.add_argument('--chat-windows', type=int, default=200)
+    parser.add_argument('--emails', type=int, default=20)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    corpus = build_mixed_corpus(chat_windows=args.chat_windows, emails=args.emails)
+    reference_seconds, reference = encode_timed(Encoder(backend='torch'), corpus)
+    candidate_seconds, candidate = encode_timed(Encoder(backend=args.backend), corpus)
+
+    assert candidate.shape == reference.shape, (
+        f'Shape mismatch: {candidate.shape} != {reference.shape}'
+    )
+
+    cosine = np.sum(reference * candidate, axis=1)
+    reference_top_k = np.argsort(-(reference @ reference.T), axis=1)[:, : args.top_k]
+    candidate_top_k = np.argsort(-(candidate @ candidate.T), axis=1)[:, : args.top_k]
+    overlap = np.mean(
+        [
+            len(set(ref) & set(cand)) / args.top_k
+            for ref, cand in zip(reference_top_k, candidate_top_k, strict=True)
+        ]
+    )
+
+    print(f'backend:          {args.backend}')
+    print(f'dimensions:       {candidate.shape[1]}')
+    print(f'fp32 encode:      {reference_seconds:.2f}s')
+    print(f'{args.backend} encode: {candidate_seconds:.2f}s')
+    print(f'cosine mean:      {cosine.mean():.6f}')
+    print(f'cosine p1 / min:  {np.percentile(cosine, 1):.6f} / {cosine.min():.6f}')
+    print(f'top-{args.top_k} overlap:   {overlap:.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Compare dense, BM25 and hybrid (RRF) recall on a small fixture corpus.
+
+The corpus in fixtures/memory_recall.json mixes Chinese and English chats and
+emails with names, dates and codes. Everything runs against an in-memory
+Qdrant collection.
+
+Usage (from the repository root, with the production model available):
+
+    ENVIRONMENT=production PYTHONPATH=src python -m benchmarks.hybrid_recall
+
+Pass --random-encoder to smoke-test without the model (dense recall is then
+meaningless).
+"""
+
+import argparse
+import asyncio
+import json
+import uuid
+from pathlib import Path
+
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+
+from database.qdrant.rag_vec_store import RAGVecStore
+from embedding.base import EncoderProtocol
+from embedding.encoder import Encoder, RandomEncoder
+
+FIXTURE_PATH = Path(__file__).parent / 'fixtures' / 'memory_recall.json'
+
+
+def to_point_id(chunk_id: str) -> str:
+    return uuid.uuid5(uuid.NAMESPACE_URL, chunk_id).hex
+
+
+async def search_ids(
+    client: AsyncQdrantClient, mode: str, query: str, embedding: list[float], k: int
+) -> list[str]:
+    if mode == 'bm25':
+        response = await client.query_points(
+            collection_name=RAGVecStore.get_full_collection_name(),
+            query=RAGVecStore.SPARSE_ENCODER.encode_query(query),
+            using=RAGVecStore.SPARSE_VECTOR_NAME,
+            limit=k,
+        )
+        points = response.points
+    else:
+        points = await RAGVecStore.search(
+            client=client,
+            query_vector=embedding,
+            query_text=query if mode == 'hybrid' else None,
+            limit=k,
+        )
+    return [str(point.id).replace('-', '') for point in points]
+
+
+async def run(encoder: EncoderProtocol, k: int) -> None:
+    fixture = json.loads(FIXTURE_PATH.read_text())
+    chunks = fixture['chunks']
+    queries = fixture['queries']
+
+    client = AsyncQdrantClient(location=':memory:')
+    await RAGVecStore.create_collection(client=client)
+    embeddings = encoder.encode([chunk['text'] for chunk in chunks])
+    points = [
+        {**chunk, 'chunk_id': to_point_id(chunk['chunk_id']), 'embedding': embedding}
+        for chunk, embedding in zip(chunks, embeddings.tolist(), strict=True)
+    ]
+    async for _ in RAGVecStore.iter_upsert_points(
+        client=client, batched_iter_points=RAGVecStore.prepare_iter_points(points)
+    ):
+        pass
+
+    query_embeddings = encoder.encode([query['query'] for query in queries]).tolist()
+    print(f'corpus: {len(chunks)} chunks, {len(queries)} queries, k={k}')
+    for mode in ['dense', 'bm25', 'hybrid']:
+        recall = 0.0
+        reciprocal_rank = 0.0
+        for query, embedding in zip(queries, query_embeddings, strict=True):
+            relevant = {to_point_id(chunk_id) for chunk_id in query['relevant']}
+            ids = await search_ids(client, mode, query['query'], embedding, k)
+            recall += len(relevant & set(ids)) / len(relevant)
+            rank = next(
+                (idx + 1 for idx, _id in enumerate(ids) if _id in relevant), None
+            )
+            reciprocal_rank += 1 / rank if rank else 0.0
+        print(
+            f'{mode:<7} recall@{k} {recall / len(queries):.3f}  '
+            f'MRR {reciprocal_rank / len(queries):.3f}'
+        )
+    await client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--random-encoder', action='store_true')
+    args = parser.parse_args()
+
+    encoder = RandomEncoder() if args.random_encoder else Encoder()
+    asyncio.run(run(encoder, args.k))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Measure time-to-first-token with per-call LLM clients and the shared registry.
+
+Usage (from the repository root, with Ollama or an OpenAI key available):
+
+    PYTHONPATH=src python -m benchmarks.llm_ttft --source ollama --model llama3
+    PYTHONPATH=src python -m benchmarks.llm_ttft --source openai --model gpt-4o-mini
+"""
+
+import argparse
+import asyncio
+import statistics
+
+from agent.client import (
+    close_llm_client_registry,
+    get_llm_client_registry,
+    init_llm_client_registry,
+)
+from core.llm_handler import LLMHandler
+
+PROMPT = 'Reply with a single word: hello.'
+
+
+async def measure(source: str, model: str, turns: int, shared: bool) -> list[float]:
+    if shared:
+        init_llm_client_registry()
+
+    handler = LLMHandler(llm_name=model, llm_source=source, api_key=None)
+    chat_func = handler.MODEL_REGISTRY[source]
+    samples = []
+    try:
+        for _ in range(turns):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            messages = [{'role': 'user', 'content': PROMPT}]
+            async for _ in chat_func(messages=messages):
+                samples.append(loop.time() - start)
+                break
+        if shared:
+            print(f'registry: {get_llm_client_registry().stats()}')
+    finally:
+        await close_llm_client_registry()
+    return samples
+
+
+def report(name: str, samples: list[float]) -> None:
+    print(
+        f'{name:<18} first {samples[0] * 1000:7.1f}ms  '
+        f'median {statistics.median(samples) * 1000:7.1f}ms  '
+        f'median after first {statistics.median(samples[1:]) * 1000:7.1f}ms'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', choices=['openai', 'ollama'], default='ollama')
+    parser.add_argument('--model', default='llama3')
+    parser.add_argument('--turns', type=int, default=10)
+    args = parser.parse_args()
+
+    per_call = asyncio.run(measure(args.source, args.model, args.turns, shared=False))
+    shared = asyncio.run(measure(args.source, args.model, args.turns, shared=True))
+    report('per-call clients', per_call)
+    report('shared registry', shared)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Measure chunks/sec when ingesting many small Messenger threads.
+
+Compares encoding each thread on its own against the pooled cross-thread
+batches, with preprocessing inline or in a process pool.
+
+Usage (from the repository root):
+
+    ENVIRONMENT=production PYTHONPATH=src python -m benchmarks.message_preprocessing
+
+Pass --random-encoder to measure preprocessing and batching overhead only.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.encoder_bucketing import CHAT_LINES
+from core.message_handler import MessageHandler
+from embedding.base import EncoderProtocol
+from embedding.encoder import Encoder, RandomEncoder
+
+WINDOW_SIZES = [5]
+STRIDE = 3
+
+
+def build_thread_corpus(threads: int, max_messages: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    documents = []
+    for idx in range(threads):
+        start_ts = 1741300000000 + idx * 10**8
+        messages = []
+        for msg_idx in range(rng.randint(3, max_messages)):
+            sender, text = rng.choice(CHAT_LINES).split(': ', 1)
+            if rng.random() < 0.2:
+                text += f' https://example.com/{idx}/{msg_idx}'
+            messages.append(
+                {
+                    'sender_name': sender,
+                    # 模擬 Messenger 匯出的 latin-1 mojibake
+                    'content': text.encode('utf-8').decode('latin-1'),
+                    'timestamp_ms': start_ts + msg_idx * 60000,
+                }
+            )
+        documents.append(
+            {
+                'participants': [{'name': 'Alice'}, {'name': 'Bob'}],
+                'messages': messages,
+                'thread_path': f'inbox/thread_{idx}',
+            }
+        )
+    return documents
+
+
+def encode_per_thread(documents: list[dict], encoder: EncoderProtocol) -> int:
+    handler = MessageHandler(
+        documents=documents, encoder=encoder, window_sizes=WINDOW_SIZES, stride=STRIDE
+    )
+    total = 0
+    for doc in documents:
+        chunks = handler._build_document_chunks(doc)
+        if chunks:
+            encoder.encode([chunk['text'] for chunk in chunks])
+        total += len(chunks)
+    return total
+
+
+async def encode_pooled(
+    documents: list[dict], encoder: EncoderProtocol, workers: int, batch_size: int
+) -> int:
+    handler = MessageHandler(
+        documents=documents,
+        encoder=encoder,
+        window_sizes=WINDOW_SIZES,
+        stride=STRIDE,
+        preprocess_workers=workers,
+    )
+    embedded = 0
+    async for progress in handler.index_message_chunks(
+        dry_run=True, batch_size=batch_size
+    ):
+        embedded = progress.embedded_chunks
+    return embedded
+
+
+def report(name: str, chunks: int, seconds: float) -> None:
+    print(f'{name:<28} {seconds:7.2f}s {chunks / seconds:10.1f} chunks/s')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=3000)
+    parser.add_argument('--max-messages', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=250)
+    # 只量測前處理與 batching 的開銷，不載入模型
+    parser.add_argument('--random-encoder', action='store_true')
+    args = parser.parse_args()
+
+    documents = build_thread_corpus(args.threads, args.max_messages)
+    encoder = RandomEncoder() if args.random_encoder else Encoder()
+    print(
+        f'corpus: {len(documents)} threads, '
+        f'{sum(len(doc["messages"]) for doc in documents)} messages, '
+        f'encoder: {type(encoder).__name__}'
+    )
+
+    start = time.perf_counter()
+    chunks = encode_per_thread(documents, encoder)
+    report('per-thread encode', chunks, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    chunks = asyncio.run(
+        encode_pooled(documents, encoder, workers=0, batch_size=args.batch_size)
+    )
+    report('pooled batches, inline', chunks, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    chunks = asyncio.run(
+        encode_pooled(
+            documents, encoder, workers=args.workers, batch_size=args.batch_size
+        )
+    )
+    report(f'pooled batches, {args.workers} procs', chunks, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
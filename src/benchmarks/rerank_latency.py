@@ -0,0 +1,94 @@
+"""Measure cross-encoder rerank latency per request on CPU.
+
+Times one CrossEncoderReranker.score call for different candidate counts, to
+check RERANK_CANDIDATES / RERANKER_MAX_LENGTH against RERANK_TIMEOUT_SECONDS.
+
+Usage (from the repository root, with the reranker model available):
+
+    PYTHONPATH=src python -m benchmarks.rerank_latency --candidates 10 30 50
+
+Pass --random-weights to time a randomly initialised model with the same
+architecture at fixed sequence lengths, without downloading the model.
+"""
+
+import argparse
+import random
+import time
+
+import torch
+
+from benchmarks.encoder_bucketing import CHAT_LINES
+from core.rerank import CrossEncoderReranker
+
+WINDOW_SIZE = 5
+
+
+def timed(func: callable, repeat: int) -> float:
+    func()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_model(args: argparse.Namespace) -> None:
+    reranker = CrossEncoderReranker(max_length=args.max_length)
+    rng = random.Random(0)
+    texts = [
+        '\n'.join(rng.choice(CHAT_LINES) for _ in range(WINDOW_SIZE))
+        for _ in range(max(args.candidates))
+    ]
+    for candidates in args.candidates:
+        seconds = timed(
+            lambda n=candidates: reranker.score('上次跟 Bob 約幾點？', texts[:n]),
+            repeat=args.repeat,
+        )
+        print(f'{candidates:>4} candidates  {seconds * 1000:8.1f} ms')
+    reranker.close()
+
+
+def run_random_weights(args: argparse.Namespace) -> None:
+    from transformers import XLMRobertaConfig, XLMRobertaForSequenceClassification
+
+    # 與 mmarco-mMiniLMv2-L12-H384 相同的架構
+    config = XLMRobertaConfig(
+        vocab_size=250002,
+        hidden_size=384,
+        num_hidden_layers=12,
+        num_attention_heads=12,
+        intermediate_size=1536,
+        max_position_embeddings=514,
+        num_labels=1,
+    )
+    model = XLMRobertaForSequenceClassification(config).eval()
+    for length in args.lengths:
+        for candidates in args.candidates:
+            input_ids = torch.randint(5, config.vocab_size, (candidates, length))
+            with torch.inference_mode():
+                seconds = timed(lambda ids=input_ids: model(input_ids=ids), args.repeat)
+            print(
+                f'{candidates:>4} candidates x {length:>3} tokens  '
+                f'{seconds * 1000:8.1f} ms'
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--candidates', type=int, nargs='*', default=[10, 30, 50])
+    parser.add_argument('--max-length', type=int, default=256)
+    parser.add_argument('--lengths', type=int, nargs='*', default=[64, 128, 256])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--random-weights', action='store_true')
+    args = parser.parse_args()
+
+    print(f'torch threads: {torch.get_num_threads()}')
+    if args.random_weights:
+        run_random_weights(args)
+    else:
+        run_model(args)
+
+
+if __name__ == '__main__':
+    main()
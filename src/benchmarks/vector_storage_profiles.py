@@ -0,0 +1,179 @@
+"""Compare recall@k, latency and memory of the vector storage profiles.
+
+Vectors are sampled from the current RAG collection (or generated with
+--synthetic) and written to temporary benchmark collections, one per profile.
+Ground truth is exact float32 cosine search over the same vectors.
+
+Usage (from the repository root, with Qdrant running):
+
+    PYTHONPATH=src python -m benchmarks.vector_storage_profiles --limit 20000
+
+Search-time parameters can be swept without rebuilding the collections:
+
+    PYTHONPATH=src python -m benchmarks.vector_storage_profiles --hnsw-ef 64
+"""
+
+import argparse
+import asyncio
+import time
+from contextlib import nullcontext
+
+import numpy as np
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+
+from database.qdrant.client import async_qdrant_client
+from database.qdrant.rag_vec_store import RAGVecStore, get_rag_vec_store
+from database.qdrant.storage_profile import VECTOR_STORAGE_PROFILES
+
+BENCHMARK_COLLECTION_BASE_NAME = 'benchmark_rag_vector_store'
+
+
+async def load_current_vectors(client: AsyncQdrantClient, limit: int) -> np.ndarray:
+    vectors = []
+    offset = None
+    while len(vectors) < limit:
+        points, offset = await client.scroll(
+            collection_name=get_rag_vec_store().get_full_collection_name(),
+            limit=min(1000, limit - len(vectors)),
+            offset=offset,
+            with_vectors=['default'],
+            with_payload=False,
+        )
+        vectors += [point.vector['default'] for point in points]
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def generate_synthetic_vectors(count: int, dim: int = 768, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(count // 50, 1), dim))
+    vectors = centers[rng.integers(len(centers), size=count)]
+    vectors += rng.normal(scale=0.6, size=vectors.shape)
+    return vectors.astype(np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def benchmark_profile(
+    client: AsyncQdrantClient,
+    profile_name: str,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    ground_truth: np.ndarray,
+    top_k: int,
+    search_options: dict | None = None,
+) -> dict:
+    store = RAGVecStore.with_storage_profile(
+        VECTOR_STORAGE_PROFILES[profile_name],
+        collection_base_name=BENCHMARK_COLLECTION_BASE_NAME,
+    )
+    collection_name = store.get_full_collection_name()
+    if await client.collection_exists(collection_name=collection_name):
+        await client.delete_collection(collection_name=collection_name)
+    await store.create_collection(client=client)
+
+    try:
+        chunks = [
+            {'chunk_id': idx, 'embedding': vector, 'text': '', 'source': 'benchmark'}
+            for idx, vector in enumerate(vectors)
+        ]
+        async for _ in store.iter_upsert_points(
+            client=client, batched_iter_points=store.prepare_iter_points(chunks)
+        ):
+            pass
+
+        recalls = []
+        latencies = []
+        for query, expected in zip(queries, ground_truth, strict=True):
+            start = time.perf_counter()
+            results = await store.search(
+                client=client,
+                query_vector=query,
+                limit=top_k,
+                with_payload=False,
+                **(search_options or {}),
+            )
+            latencies.append(time.perf_counter() - start)
+            found = {result.id for result in results}
+            recalls.append(len(found & set(expected.tolist())) / top_k)
+    finally:
+        await client.delete_collection(collection_name=collection_name)
+
+    memory = store.STORAGE_PROFILE.estimate_bytes_per_point()
+    return {
+        'profile': profile_name,
+        'recall': float(np.mean(recalls)),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'ram_mb': memory['ram'] * len(vectors) / 2**20,
+        'disk_mb': memory['disk'] * len(vectors) / 2**20,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--limit', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--synthetic', action='store_true')
+    parser.add_argument('--in-memory', action='store_true')
+    parser.add_argument(
+        '--profiles', nargs='*', default=list(VECTOR_STORAGE_PROFILES.keys())
+    )
+    parser.add_argument('--hnsw-ef', type=int, default=None)
+    parser.add_argument('--exact', action='store_true')
+    parser.add_argument('--oversampling', type=float, default=None)
+    parser.add_argument('--no-rescore', action='store_true')
+    args = parser.parse_args()
+    search_options = {
+        'hnsw_ef': args.hnsw_ef,
+        'exact': args.exact or None,
+        'oversampling': args.oversampling,
+        'rescore': False if args.no_rescore else None,
+    }
+
+    async with (
+        nullcontext(AsyncQdrantClient(location=':memory:'))
+        if args.in_memory
+        else async_qdrant_client()
+    ) as client:
+        vectors = (
+            generate_synthetic_vectors(args.limit)
+            if args.synthetic
+            else await load_current_vectors(client, args.limit)
+        )
+        if not len(vectors):
+            raise SystemExit('No vectors found, re-run with --synthetic')
+
+        rng = np.random.default_rng(1)
+        query_ids = rng.choice(len(vectors), size=min(args.queries, len(vectors)))
+        queries = vectors[query_ids] + rng.normal(
+            scale=0.05, size=(len(query_ids), vectors.shape[1])
+        ).astype(np.float32)
+
+        scores = normalize(queries) @ normalize(vectors).T
+        ground_truth = np.argsort(-scores, axis=1)[:, : args.top_k]
+
+        print(f'{len(vectors)} vectors, {len(queries)} queries, recall@{args.top_k}')
+        print('profile              recall   p50 ms   p95 ms   RAM MB   disk MB')
+        for profile_name in args.profiles:
+            row = await benchmark_profile(
+                client,
+                profile_name,
+                vectors,
+                queries,
+                ground_truth,
+                args.top_k,
+                search_options,
+            )
+            print(
+                f'{row["profile"]:<20} {row["recall"]:.4f} {row["p50_ms"]:8.2f} '
+                f'{row["p95_ms"]:8.2f} {row["ram_mb"]:8.1f} {row["disk_mb"]:9.1f}'
+            )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -3,6 +3,9 @@ from collections.abc import AsyncGenerator
 import attr
 
 from agent.chat_agent import ChatAgent
+from core.rerank import IdentityReranker, RerankerProtocol
+from core.retrieval import RetrievalConstraints
+from core.retrieval_cache import RetrievalCache
 from embedding.base import EncoderProtocol
 
 
@@ -11,6 +14,9 @@ class AgentHandler:
     user_name: str | None
     encoder: EncoderProtocol
     llm_chat_func: callable
+    constraints: RetrievalConstraints | None = None
+    retrieval_cache: RetrievalCache | None = None
+    reranker: RerankerProtocol = attr.Factory(IdentityReranker)
 
     async def get_chat_response(
         self, message: str, history: list[dict]
@@ -19,6 +25,9 @@ class AgentHandler:
             user_name=self.user_name,
             encoder=self.encoder,
             llm_chat_func=self.llm_chat_func,
+            constraints=self.constraints,
+            retrieval_cache=self.retrieval_cache,
+            reranker=self.reranker,
         )
         async for token in chat_agent.generate_response(query=message, history=history):
             yield token
@@ -0,0 +1,59 @@
+import asyncio
+from collections.abc import AsyncGenerator, Iterable
+
+import attr
+from motor.motor_asyncio import AsyncIOMotorClient
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+
+from database.mongodb.base import BaseDocCol
+from database.qdrant.base import BaseVecStore
+from utils import iter_bounded_gather
+
+
+@attr.s(auto_attribs=True)
+class ChunkWriter:
+    vec_store: type[BaseVecStore]
+    doc_col: type[BaseDocCol]
+    qdrant_client: AsyncQdrantClient
+    mongodb_client: AsyncIOMotorClient
+    source: str
+    qdrant_wait: bool = True
+
+    def __attrs_post_init__(self) -> None:
+        self._last_points: list | None = None
+
+    async def write(self, chunks: list[dict]) -> list[dict]:
+        points = next(
+            self.vec_store.prepare_iter_points(
+                [{**chunk, 'source': self.source} for chunk in chunks],
+                batch_size=len(chunks),
+            )
+        )
+        docs = next(self.doc_col.prepare_iter_docs(chunks, batch_size=len(chunks)))
+
+        # 兩邊都 ack 才算這個 batch 完成
+        await asyncio.gather(
+            self.vec_store.upsert_points(
+                client=self.qdrant_client, points=points, wait=self.qdrant_wait
+            ),
+            self.doc_col.upsert_docs(client=self.mongodb_client, docs=docs),
+        )
+        self._last_points = points
+        return chunks
+
+    async def iter_write(
+        self, batched_chunks: Iterable[list[dict]], max_in_flight: int = 1
+    ) -> AsyncGenerator[list[dict], None]:
+        async for chunks in iter_bounded_gather(
+            (self.write(chunks) for chunks in batched_chunks), limit=max_in_flight
+        ):
+            yield chunks
+
+    async def flush(self) -> None:
+        # wait=False 時 Qdrant 只保證收到；同一 collection 的更新依序套用，
+        # 所以最後再以 wait=True 重寫一次最後的 batch，當作一致性屏障
+        if not self.qdrant_wait and self._last_points:
+            await self.vec_store.upsert_points(
+                client=self.qdrant_client, points=self._last_points, wait=True
+            )
+        await self.doc_col.create_index(client=self.mongodb_client)
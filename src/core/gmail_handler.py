@@ -1,6 +1,8 @@
+import asyncio
 import base64
 import re
 from collections.abc import AsyncGenerator
+from email.utils import parseaddr
 
 import attr
 from bs4 import BeautifulSoup
@@ -8,11 +10,14 @@ from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 
 from consts import INDEX_GMAIL_MAX_RESULT
+from core.chunk_writer import ChunkWriter
+from core.progress import IngestProgress
 from database.mongodb.client import async_mongodb_client
 from database.mongodb.gmail_doc import GmailDoc
 from database.qdrant.client import async_qdrant_client
-from database.qdrant.rag_vec_store import RAGVecStore
+from database.qdrant.rag_vec_store import get_rag_vec_store
 from embedding.base import EncoderProtocol
+from settings import get_settings
 from utils import ensure_date_type, generate_gmail_chunk_id
 
 
@@ -45,42 +50,49 @@ class GmailHandler:
         query_filter: str = '',
         dry_run: bool = False,
         batch_size: int = 250,
-    ) -> AsyncGenerator[float, None] | None:
-        chunks = self._fetch_recent_messages(
-            max_results=max_results, label_ids=label_ids, q=query_filter
+    ) -> AsyncGenerator[IngestProgress, None] | None:
+        chunks = await asyncio.to_thread(
+            self._fetch_recent_messages,
+            max_results=max_results,
+            label_ids=label_ids,
+            q=query_filter,
         )
         text_list = [chunk['text'] for chunk in chunks]
-        embeddings = self.encoder.encode(sentences=text_list, show_progress_bar=True)
+        embeddings = await self.encoder.aencode(
+            sentences=text_list, show_progress_bar=True, bulk=True
+        )
 
         for idx, chunk in enumerate(chunks):
             chunk['embedding'] = embeddings[idx]
 
-        if not dry_run:
-            total_batches = (len(chunks) + batch_size - 1) // batch_size
-            batch_count = 0
-            async with async_qdrant_client() as client:
-                async for _ in RAGVecStore.iter_upsert_points(
-                    client=client,
-                    batched_iter_points=RAGVecStore.prepare_iter_points(
-                        [
-                            {
-                                'chunk_id': chunk['chunk_id'],
-                                'embedding': chunk['embedding'],
-                                'source': self.SOURCE,
-                            }
-                            for chunk in chunks
-                        ]
+        if not dry_run and chunks:
+            settings = get_settings()
+            indexed_chunks = 0
+            async with (
+                async_qdrant_client() as qdrant_client,
+                async_mongodb_client() as mongodb_client,
+            ):
+                writer = ChunkWriter(
+                    vec_store=get_rag_vec_store(),
+                    doc_col=GmailDoc,
+                    qdrant_client=qdrant_client,
+                    mongodb_client=mongodb_client,
+                    source=self.SOURCE,
+                    qdrant_wait=settings.QDRANT_UPSERT_WAIT,
+                )
+                async for written in writer.iter_write(
+                    (
+                        chunks[start : start + batch_size]
+                        for start in range(0, len(chunks), batch_size)
                     ),
+                    max_in_flight=settings.INGEST_MAX_IN_FLIGHT_WRITES,
                 ):
-                    pass
-            async with async_mongodb_client() as client:
-                async for _ in GmailDoc.iter_upsert_docs(
-                    client=client, docs=GmailDoc.prepare_iter_docs(chunks)
-                ):
-                    batch_count += 1
-                await GmailDoc.create_index(client=client)
-
-            yield batch_count / total_batches
+                    indexed_chunks += len(written)
+                    yield IngestProgress(
+                        indexed_ratio=indexed_chunks / len(chunks),
+                        embedded_chunks=indexed_chunks,
+                    )
+                await writer.flush()
 
     @staticmethod
     def decode_body(data: str) -> str:
@@ -96,6 +108,16 @@ class GmailHandler:
     def is_noise(text: str) -> bool:
         return not text.replace(' ', '') or all(c == '?' for c in text.replace(' ', ''))
 
+    @staticmethod
+    def _get_senders(message: dict) -> list[str]:
+        headers = message.get('payload', {}).get('headers', [])
+        senders = []
+        for header in headers:
+            if header.get('name', '').lower() == 'from':
+                name, address = parseaddr(header.get('value', ''))
+                senders.append(name or address)
+        return senders
+
     def _extract_plain_text_from_message(self, message: dict) -> str | None:
         payload = message.get('payload', {})
 
@@ -155,6 +177,10 @@ class GmailHandler:
                     ),
                     'text': plain_text,
                     'on_date': ensure_date_type(internal_date),
+                    'start_timestamp': internal_date,
+                    'end_timestamp': internal_date,
+                    'senders': self._get_senders(message_detail),
+                    'thread_id': message_detail.get('threadId'),
                 }
             )
 
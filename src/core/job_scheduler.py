@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Callable
+from contextlib import aclosing
+
+import attr
+
+from core.progress import IngestProgress
+from database.mongodb.client import async_mongodb_client
+from database.mongodb.ingest_job_doc import IngestJobDoc
+
+JOB_FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+@attr.s(auto_attribs=True)
+class IngestJob:
+    job_id: str
+    job_type: str
+    size: int
+    run: Callable[[], AsyncGenerator[IngestProgress, None]]
+    status: str = 'queued'
+    progress: IngestProgress = attr.Factory(lambda: IngestProgress(indexed_ratio=0.0))
+    error: str | None = None
+    created_at: float = attr.Factory(time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    def to_dict(self) -> dict:
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+
+        ratio = self.progress.indexed_ratio
+        processed = self.progress.embedded_chunks + self.progress.skipped_chunks
+        eta_seconds = None
+        if self.status == 'running' and ratio > 0:
+            eta_seconds = elapsed * (1 - ratio) / ratio
+
+        return {
+            'job_id': self.job_id,
+            'job_type': self.job_type,
+            'size': self.size,
+            'status': self.status,
+            'error': self.error,
+            **self.progress.to_dict(),
+            'chunks_per_second': processed / elapsed if elapsed > 0 else 0.0,
+            'eta_seconds': eta_seconds,
+            'elapsed_seconds': elapsed,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+@attr.s(auto_attribs=True)
+class IngestJobScheduler:
+    concurrency: dict[str, int]
+    history_size: int = 100
+    persist: bool = True
+
+    def __attrs_post_init__(self) -> None:
+        self._jobs: OrderedDict[str, IngestJob] = OrderedDict()
+        self._queues: dict[str, asyncio.PriorityQueue] = {}
+        self._slots: dict[str, asyncio.Semaphore] = {}
+        self._running: dict[str, asyncio.Task] = {}
+        self._workers: list[asyncio.Task] = []
+        self._sequence = itertools.count()
+
+    def start(self) -> None:
+        # 每種 job type 各自排隊，worker 數量即該類型的並行上限
+        for job_type, concurrency in self.concurrency.items():
+            self._queues[job_type] = asyncio.PriorityQueue()
+            self._slots[job_type] = asyncio.Semaphore(concurrency)
+            self._workers += [
+                asyncio.create_task(self._work(job_type)) for _ in range(concurrency)
+            ]
+
+    async def close(self) -> None:
+        tasks = self._workers + list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+    async def submit(
+        self,
+        job_type: str,
+        size: int,
+        run: Callable[[], AsyncGenerator[IngestProgress, None]],
+    ) -> IngestJob:
+        if job_type not in self._queues:
+            raise ValueError(f'Unknown job type {job_type}')
+
+        job = IngestJob(job_id=uuid.uuid4().hex, job_type=job_type, size=size, run=run)
+        self._jobs[job.job_id] = job
+        self._prune_history()
+        if self.persist:
+            fields = job.to_dict()
+            async with async_mongodb_client() as client:
+                await IngestJobDoc.create_job(
+                    client=client,
+                    job_type=fields.pop('job_type'),
+                    job_id=fields.pop('job_id'),
+                    **fields,
+                )
+
+        # 小 job 優先，同樣大小依送出順序
+        await self._queues[job_type].put((size, next(self._sequence), job.job_id))
+        return job
+
+    def slot(self, job_type: str) -> asyncio.Semaphore:
+        # 不經過佇列、在 request 內執行的工作（例如上傳）也要佔用同類型的名額
+        if job_type not in self._slots:
+            raise ValueError(f'Unknown job type {job_type}')
+        return self._slots[job_type]
+
+    def get(self, job_id: str) -> IngestJob | None:
+        return self._jobs.get(job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        if self.persist:
+            async with async_mongodb_client() as client:
+                # 其他 API worker 上跑的 job 會在下次回報進度時看到這個 flag
+                await IngestJobDoc.update_job(
+                    client=client, job_id=job_id, cancel_requested=True
+                )
+
+        job = self._jobs.get(job_id)
+        if job is None or job.status in JOB_FINISHED_STATUSES:
+            return False
+
+        if job_id in self._running:
+            self._running[job_id].cancel()
+        else:
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            await self._save(job)
+        return True
+
+    async def _work(self, job_type: str) -> None:
+        queue = self._queues[job_type]
+        while True:
+            _, _, job_id = await queue.get()
+            async with self._slots[job_type]:
+                # 等待名額期間可能已被取消
+                job = self._jobs.get(job_id)
+                if job is None or job.status != 'queued':
+                    continue
+
+                task = asyncio.create_task(self._run(job))
+                self._running[job_id] = task
+                try:
+                    await asyncio.wait([task])
+                finally:
+                    self._running.pop(job_id, None)
+
+    async def _run(self, job: IngestJob) -> None:
+        job.status = 'running'
+        job.started_at = time.time()
+        await self._save(job)
+
+        try:
+            async with aclosing(job.run()) as progress_iter:
+                async for progress in progress_iter:
+                    job.progress = progress
+                    if await self._save(job):
+                        raise asyncio.CancelledError
+            job.status = 'completed'
+        except asyncio.CancelledError:
+            job.status = 'cancelled'
+        except Exception as e:
+            logging.exception('Ingest job %s failed', job.job_id)
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            await self._save(job)
+
+    async def _save(self, job: IngestJob) -> bool:
+        if not self.persist:
+            return False
+
+        async with async_mongodb_client() as client:
+            doc = await IngestJobDoc.update_job(
+                client=client, job_id=job.job_id, **job.to_dict()
+            )
+        return bool(doc and doc.get('cancel_requested'))
+
+    def _prune_history(self) -> None:
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in JOB_FINISHED_STATUSES
+        ]
+        for job_id in finished[: max(len(finished) - self.history_size, 0)]:
+            del self._jobs[job_id]
@@ -0,0 +1,108 @@
+import json
+import re
+from collections.abc import AsyncGenerator, AsyncIterable
+
+import attr
+
+# 只需要找出最外層 JSON object 的邊界，字串內容交給 json.loads 解析
+# 完整的字串一次跳過；字串還沒收完時只吃掉開頭的引號，改用 STRING_END_PATTERN 接續
+STRUCTURE_PATTERN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]"]')
+STRING_END_PATTERN = re.compile(rb'["\\]')
+WHITESPACE = b' \t\r\n'
+
+
+class JSONStreamError(ValueError):
+    pass
+
+
+@attr.s(auto_attribs=True)
+class JSONDocumentSplitter:
+    max_document_bytes: int = 256 * 1024 * 1024
+
+    def __attrs_post_init__(self) -> None:
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, data: bytes) -> list[bytes]:
+        self._buffer += data
+        documents = []
+
+        while self._depth > 0 or self._start_document():
+            scan = self._scan_string if self._in_string else self._scan_structure
+            closed = scan()
+            if closed is None:
+                break
+            if closed:
+                documents.append(bytes(self._buffer[: self._pos]))
+                del self._buffer[: self._pos]
+                self._pos = 0
+
+        if len(self._buffer) > self.max_document_bytes:
+            raise JSONStreamError(
+                f'JSON document exceeds {self.max_document_bytes} bytes'
+            )
+        return documents
+
+    def close(self) -> None:
+        if self._buffer.strip(WHITESPACE):
+            raise JSONStreamError('Stream ended inside a JSON document')
+
+    def _start_document(self) -> bool:
+        document_start = len(self._buffer) - len(self._buffer.lstrip(WHITESPACE))
+        del self._buffer[:document_start]
+        self._pos = 0
+        if not self._buffer:
+            return False
+        if self._buffer[0] != ord('{'):
+            raise JSONStreamError(
+                f'Expected a JSON object, got {chr(self._buffer[0])!r}'
+            )
+        return True
+
+    def _scan_string(self) -> bool | None:
+        match = STRING_END_PATTERN.search(self._buffer, self._pos)
+        if match is None:
+            self._pos = len(self._buffer)
+            return None
+        if match.group() == b'\\':
+            # escape 後面的字元可能還沒收到
+            if match.end() >= len(self._buffer):
+                self._pos = match.start()
+                return None
+            self._pos = match.end() + 1
+            return False
+        self._in_string = False
+        self._pos = match.end()
+        return False
+
+    def _scan_structure(self) -> bool | None:
+        match = STRUCTURE_PATTERN.search(self._buffer, self._pos)
+        if match is None:
+            self._pos = len(self._buffer)
+            return None
+
+        self._pos = match.end()
+        token = match.group()
+        if token[0] == ord('"'):
+            self._in_string = token == b'"'
+        elif token in (b'{', b'['):
+            self._depth += 1
+        else:
+            self._depth -= 1
+        return self._depth == 0
+
+
+async def iter_json_documents(
+    chunks: AsyncIterable[bytes], max_document_bytes: int = 256 * 1024 * 1024
+) -> AsyncGenerator[dict, None]:
+    # 支援 NDJSON 與多個（可含縮排的）JSON object 串接，收到一份就解析一份
+    splitter = JSONDocumentSplitter(max_document_bytes=max_document_bytes)
+    async for chunk in chunks:
+        for raw_document in splitter.feed(chunk):
+            try:
+                yield json.loads(raw_document)
+            except json.JSONDecodeError as e:
+                raise JSONStreamError(f'Invalid JSON document: {e}') from e
+    splitter.close()
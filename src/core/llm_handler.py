@@ -1,9 +1,15 @@
+import functools
+import time
 from collections.abc import AsyncGenerator
 
 import attr
 from openai.types.chat import ChatCompletionChunk
 
-from agent.client import async_ollama_client, async_openai_client
+from agent.client import (
+    async_ollama_client,
+    async_openai_client,
+    get_llm_client_registry,
+)
 
 
 @attr.s(auto_attribs=True)
@@ -19,19 +25,29 @@ class LLMHandler:
         }
 
     def get_llm_chat_func(self) -> callable:
-        return self.MODEL_REGISTRY[self.llm_source]
+        return functools.partial(self._track_ttft, self.MODEL_REGISTRY[self.llm_source])
+
+    async def _track_ttft(
+        self, chat_func: callable, messages: list[dict]
+    ) -> AsyncGenerator[str, None]:
+        # 從呼叫到第一個 token，包含取得 client 與建立連線的時間
+        start = time.perf_counter()
+        first_token = True
+        async for token in chat_func(messages=messages):
+            if first_token:
+                first_token = False
+                registry = get_llm_client_registry()
+                if registry is not None:
+                    registry.record_ttft(self.llm_source, time.perf_counter() - start)
+            yield token
 
     async def _chat_with_openai(
-        self, prompt: str, history: list[dict]
+        self, messages: list[dict]
     ) -> AsyncGenerator[str, None]:
         async with async_openai_client(api_key=self.api_key) as client:
-            history[-1] = {
-                'role': 'user',
-                'content': prompt,
-            }
             async for chunk in await client.chat.completions.create(
                 model=self.llm_name,
-                messages=history,
+                messages=messages,
                 stream=True,
             ):
                 if isinstance(chunk, ChatCompletionChunk):
@@ -40,16 +56,12 @@ class LLMHandler:
                         yield delta.content
 
     async def _chat_with_ollama(
-        self, prompt: str, history: list[dict]
+        self, messages: list[dict]
     ) -> AsyncGenerator[str, None]:
         async with async_ollama_client() as client:
-            history[-1] = {
-                'role': 'user',
-                'content': prompt,
-            }
             async for chunk in await client.chat(
                 model=self.llm_name,
-                messages=history,
+                messages=messages,
                 stream=True,
             ):
                 yield chunk['message']['content']
@@ -0,0 +1,141 @@
+from settings import get_settings
+from utils import decode_content, generate_message_chunk_id, mask_urls
+
+CHUNKING_MODES = ('window', 'span')
+
+# 純函式，方便在 process pool 中執行
+
+
+def get_text_messages(document: dict) -> list[dict]:
+    return [msg for msg in document.get('messages', []) if is_text_message(msg)]
+
+
+def is_text_message(message: dict) -> bool:
+    return 'content' in message
+
+
+def merge_messages_to_chunk(messages: list[dict]) -> str:
+    return '\n'.join(f'{msg["sender_name"]}: {msg["content"]}' for msg in messages)
+
+
+def get_chunking_config(mode: str | None = None) -> dict:
+    settings = get_settings()
+    mode = mode or settings.INGEST_CHUNKING_MODE
+    if mode == 'window':
+        return {'window_sizes': [5], 'stride': 3, 'include_tail': False}
+    if mode == 'span':
+        # 不重疊的 span，查詢時再向前後展開並合併
+        span_size = settings.INGEST_SPAN_SIZE
+        return {'window_sizes': [span_size], 'stride': span_size, 'include_tail': True}
+    raise ValueError(f'Unknown chunking mode {mode}, expected one of {CHUNKING_MODES}')
+
+
+def iter_window_starts(
+    message_count: int,
+    window_size: int,
+    stride: int,
+    first_new_index: int = 0,
+    include_tail: bool = False,
+) -> range:
+    # 只保留結尾落在新訊息上的 window，起點仍對齊 stride 以保持 chunk_id 一致
+    start = max(first_new_index - window_size + 1, 0)
+    start = -(-start // stride) * stride
+    # include_tail 時最後不足一個 window 的訊息也切成一個 chunk
+    stop = message_count if include_tail else message_count - window_size + 1
+    return range(start, stop, stride)
+
+
+def count_document_chunks(
+    document: dict,
+    window_sizes: list[int],
+    stride: int,
+    first_new_index: int = 0,
+    include_tail: bool = False,
+) -> int:
+    message_count = len(get_text_messages(document))
+    return sum(
+        len(
+            iter_window_starts(
+                message_count, window_size, stride, first_new_index, include_tail
+            )
+        )
+        for window_size in window_sizes
+    )
+
+
+def build_document_chunks(
+    document: dict,
+    window_sizes: list[int],
+    stride: int,
+    first_new_index: int = 0,
+    include_tail: bool = False,
+) -> list[dict]:
+    messages = get_text_messages(document)
+
+    if not messages:
+        return []
+
+    senders = [
+        decode_content(participant.get('name', ''))
+        for participant in document.get('participants', [])
+    ]
+
+    return build_chunks(
+        senders=senders,
+        messages=messages,
+        thread_id=document.get('thread_path'),
+        window_sizes=window_sizes,
+        stride=stride,
+        first_new_index=first_new_index,
+        include_tail=include_tail,
+    )
+
+
+def build_many_document_chunks(
+    documents: list[dict],
+    first_new_indexes: list[int],
+    window_sizes: list[int],
+    stride: int,
+    include_tail: bool = False,
+) -> list[list[dict]]:
+    return [
+        build_document_chunks(doc, window_sizes, stride, first_new_index, include_tail)
+        for doc, first_new_index in zip(documents, first_new_indexes, strict=True)
+    ]
+
+
+def build_chunks(
+    senders: list[str],
+    messages: list[dict],
+    window_sizes: list[int],
+    stride: int,
+    first_new_index: int = 0,
+    thread_id: str | None = None,
+    include_tail: bool = False,
+) -> list[dict]:
+    messages.sort(key=lambda x: x['timestamp_ms'])
+    chunks = []
+
+    for window_size in window_sizes:
+        for i in iter_window_starts(
+            len(messages), window_size, stride, first_new_index, include_tail
+        ):
+            window = messages[i : i + window_size]
+            chunk_text = merge_messages_to_chunk(window)
+            chunk_text = mask_urls(decode_content(chunk_text))
+
+            chunk = {
+                'chunk_id': generate_message_chunk_id(
+                    start_ts=window[0]['timestamp_ms'],
+                    end_ts=window[-1]['timestamp_ms'],
+                    senders=senders,
+                ),
+                'text': chunk_text,
+                'start_timestamp': window[0]['timestamp_ms'],
+                'end_timestamp': window[-1]['timestamp_ms'],
+                'senders': senders,
+                'thread_id': thread_id,
+            }
+            chunks.append(chunk)
+
+    return chunks
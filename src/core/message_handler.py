@@ -1,15 +1,40 @@
+import asyncio
+from collections import Counter, deque
 from collections.abc import AsyncGenerator
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, datetime
 
 import attr
+from motor.motor_asyncio import AsyncIOMotorClient
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
 
+from core.chunk_writer import ChunkWriter
+from core.message_chunker import (
+    build_document_chunks,
+    build_many_document_chunks,
+    count_document_chunks,
+    get_text_messages,
+    iter_window_starts,
+)
+from core.pipeline import PipelineStage, run_pipeline
+from core.progress import IngestProgress
 from database.mongodb.chat_doc import ChatDoc
 from database.mongodb.client import async_mongodb_client
+from database.mongodb.thread_state_doc import ThreadStateDoc
 from database.qdrant.client import async_qdrant_client
-from database.qdrant.rag_vec_store import RAGVecStore
+from database.qdrant.rag_vec_store import get_rag_vec_store
 from embedding.base import EncoderProtocol
-from utils import decode_content, generate_message_chunk_id, mask_urls
+from settings import get_settings
 
 SOURCE = 'message'
+# 在記錄切法之前寫入的 thread state 都是 window 模式
+DEFAULT_CHUNKING_KEY = '[5]:3:False'
+
+
+@attr.s(auto_attribs=True)
+class ChunkBatch:
+    chunks: list[dict]
+    skipped: int = 0
 
 
 @attr.s(auto_attribs=True)
@@ -18,94 +43,340 @@ class MessageHandler:
     encoder: EncoderProtocol
     window_sizes: list[int] = [3]
     stride: int = 1
+    preprocess_workers: int = 0
+    preprocess_chunksize: int = 64
+    include_tail: bool = False
+
+    def __attrs_post_init__(self) -> None:
+        self._thread_path_counts = Counter(
+            doc.get('thread_path') for doc in self.documents
+        )
 
     async def index_message_chunks(
         self,
         dry_run: bool = False,
         batch_size: int = 250,
-    ) -> AsyncGenerator[float, None] | None:
-        all_chunks = []
-        for doc in self.documents:
-            chunks = await self._process_single_document(doc)
-            all_chunks += chunks
-
-        if not dry_run:
-            total_batches = (len(all_chunks) + batch_size - 1) // batch_size
-            batch_count = 0
-            async with async_qdrant_client() as client:
-                async for _ in RAGVecStore.iter_upsert_points(
-                    client=client,
-                    batched_iter_points=RAGVecStore.prepare_iter_points(
-                        [
-                            {
-                                'chunk_id': chunk['chunk_id'],
-                                'embedding': chunk['embedding'],
-                                'source': SOURCE,
-                            }
-                            for chunk in all_chunks
-                        ]
+        queue_size: int = 2,
+    ) -> AsyncGenerator[IngestProgress, None] | None:
+        settings = get_settings()
+        async with (
+            async_qdrant_client() as qdrant_client,
+            async_mongodb_client() as mongodb_client,
+        ):
+            thread_states = (
+                {} if dry_run else await self._load_thread_states(mongodb_client)
+            )
+            # 已經 ingest 過的 thread 只重建碰到新訊息的 window
+            first_new_indexes = [
+                self._get_first_new_index(doc, thread_states.get(self._thread_key(doc)))
+                for doc in self.documents
+            ]
+            if not dry_run:
+                await self._delete_stale_chunks(
+                    qdrant_client, mongodb_client, thread_states, first_new_indexes
+                )
+            total_chunks = 0
+            skipped_chunks = 0
+            for doc, first_new_index in zip(
+                self.documents, first_new_indexes, strict=True
+            ):
+                chunk_count = self._count_chunks(doc, first_new_index=first_new_index)
+                total_chunks += chunk_count
+                skipped_chunks += self._count_chunks(doc) - chunk_count
+
+            if not total_chunks:
+                yield IngestProgress(indexed_ratio=1.0, skipped_chunks=skipped_chunks)
+                return
+
+            writer = ChunkWriter(
+                vec_store=get_rag_vec_store(),
+                doc_col=ChatDoc,
+                qdrant_client=qdrant_client,
+                mongodb_client=mongodb_client,
+                source=SOURCE,
+                qdrant_wait=settings.QDRANT_UPSERT_WAIT,
+            )
+
+            async def skip_existing(batch: ChunkBatch) -> ChunkBatch:
+                if dry_run:
+                    return batch
+                return await self._skip_existing_chunks(
+                    qdrant_client, mongodb_client, batch
+                )
+
+            async def write_chunks(batch: ChunkBatch) -> ChunkBatch:
+                if not dry_run and batch.chunks:
+                    await writer.write(batch.chunks)
+                return batch
+
+            # parse/window -> 略過已存在 -> embed -> upsert，每個 batch embed 完就寫入
+            processed_chunks = 0
+            embedded_chunks = 0
+            async for batch in run_pipeline(
+                self._iter_chunk_batches(
+                    first_new_indexes=first_new_indexes, batch_size=batch_size
+                ),
+                stages=[
+                    skip_existing,
+                    self._embed_chunks,
+                    PipelineStage(
+                        func=write_chunks,
+                        concurrency=settings.INGEST_MAX_IN_FLIGHT_WRITES,
                     ),
-                ):
-                    pass
-            async with async_mongodb_client() as client:
-                async for _ in ChatDoc.iter_upsert_docs(
-                    client=client, docs=ChatDoc.prepare_iter_docs(all_chunks)
-                ):
-                    batch_count += 1
-                await ChatDoc.create_index(client=client)
-            yield batch_count / total_batches
-
-    async def _process_single_document(self, document: dict) -> list[dict]:
-        messages = [
-            msg for msg in document.get('messages', []) if self._is_text_message(msg)
-        ]
+                ],
+                queue_size=queue_size,
+            ):
+                processed_chunks += len(batch.chunks) + batch.skipped
+                embedded_chunks += len(batch.chunks)
+                skipped_chunks += batch.skipped
+                yield IngestProgress(
+                    indexed_ratio=processed_chunks / total_chunks,
+                    embedded_chunks=embedded_chunks,
+                    skipped_chunks=skipped_chunks,
+                )
+
+            if not dry_run:
+                await writer.flush()
+                await self._save_thread_states(mongodb_client)
 
-        if not messages:
+    async def _iter_chunk_batches(
+        self, first_new_indexes: list[int], batch_size: int
+    ) -> AsyncGenerator[ChunkBatch, None]:
+        batch = []
+        async for chunks in self._iter_document_chunks(first_new_indexes):
+            batch += chunks
+            while len(batch) >= batch_size:
+                yield ChunkBatch(chunks=batch[:batch_size])
+                batch = batch[batch_size:]
+
+        if batch:
+            yield ChunkBatch(chunks=batch)
+
+    async def _iter_document_chunks(
+        self, first_new_indexes: list[int]
+    ) -> AsyncGenerator[list[dict], None]:
+        if self.preprocess_workers <= 0:
+            for doc, first_new_index in zip(
+                self.documents, first_new_indexes, strict=True
+            ):
+                yield self._build_document_chunks(doc, first_new_index=first_new_index)
+                await asyncio.sleep(0)
             return
 
-        senders = [
-            decode_content(participant.get('name', ''))
-            for participant in document.get('participants', [])
-        ]
+        # 解析、排序、切 window 與 regex 清理在 process pool 執行，依原順序取回結果；
+        # 一次送一組文件，攤平 pickle 與 IPC 的成本
+        loop = asyncio.get_running_loop()
+        pending = deque()
+        pool = ProcessPoolExecutor(max_workers=self.preprocess_workers)
+        try:
+            for start in range(0, len(self.documents), self.preprocess_chunksize):
+                end = start + self.preprocess_chunksize
+                pending.append(
+                    loop.run_in_executor(
+                        pool,
+                        build_many_document_chunks,
+                        self.documents[start:end],
+                        first_new_indexes[start:end],
+                        self.window_sizes,
+                        self.stride,
+                        self.include_tail,
+                    )
+                )
+                if len(pending) >= self.preprocess_workers * 2:
+                    for chunks in await pending.popleft():
+                        yield chunks
 
-        chunks = self._build_chunks(senders=senders, messages=messages)
-        text_list = [chunk['text'] for chunk in chunks]
-        embeddings = self.encoder.encode(sentences=text_list, show_progress_bar=True)
+            while pending:
+                for chunks in await pending.popleft():
+                    yield chunks
+        finally:
+            for future in pending:
+                future.cancel()
+            # 不等待 worker 結束，提早關閉 generator 時也不會卡住 event loop
+            pool.shutdown(wait=False, cancel_futures=True)
 
-        for idx, chunk in enumerate(chunks):
+    async def _skip_existing_chunks(
+        self,
+        qdrant_client: AsyncQdrantClient,
+        mongodb_client: AsyncIOMotorClient,
+        batch: ChunkBatch,
+    ) -> ChunkBatch:
+        chunk_ids = [chunk['chunk_id'] for chunk in batch.chunks]
+        # 兩邊都有才算存在，避免上次只寫入一半的 chunk 被略過
+        vector_ids, doc_ids = await asyncio.gather(
+            get_rag_vec_store().get_existing_ids(client=qdrant_client, ids=chunk_ids),
+            ChatDoc.get_existing_ids(client=mongodb_client, ids=chunk_ids),
+        )
+        existing_ids = vector_ids & doc_ids
+        return ChunkBatch(
+            chunks=[
+                chunk for chunk in batch.chunks if chunk['chunk_id'] not in existing_ids
+            ],
+            skipped=batch.skipped + len(existing_ids),
+        )
+
+    async def _embed_chunks(self, batch: ChunkBatch) -> ChunkBatch:
+        if not batch.chunks:
+            return batch
+
+        embeddings = await self.encoder.aencode(
+            sentences=[chunk['text'] for chunk in batch.chunks], bulk=True
+        )
+        for idx, chunk in enumerate(batch.chunks):
             chunk['embedding'] = embeddings[idx]
+        return batch
 
-        return chunks
+    # --------- incremental ingest ---------
 
-    def _build_chunks(self, senders: list[str], messages: list[dict]) -> list[dict]:
-        messages.sort(key=lambda x: x['timestamp_ms'])
-        chunks = []
+    def _thread_key(self, document: dict) -> str | None:
+        thread_path = document.get('thread_path')
+        # Messenger 會把長 thread 拆成多個檔案，同次上傳中重複的 thread 一律全量處理
+        if not thread_path or self._thread_path_counts[thread_path] > 1:
+            return None
+        return thread_path
 
-        for window_size in self.window_sizes:
-            for i in range(0, len(messages) - window_size + 1, self.stride):
-                window = messages[i : i + window_size]
-                chunk_text = self._merge_messages_to_chunk(window)
-                chunk_text = mask_urls(decode_content(chunk_text))
+    async def _load_thread_states(
+        self, mongodb_client: AsyncIOMotorClient
+    ) -> dict[str, dict]:
+        thread_paths = [
+            thread_key
+            for thread_key in map(self._thread_key, self.documents)
+            if thread_key
+        ]
+        return await ThreadStateDoc.get_states(
+            client=mongodb_client, thread_paths=thread_paths
+        )
 
-                chunk = {
-                    'chunk_id': generate_message_chunk_id(
-                        start_ts=window[0]['timestamp_ms'],
-                        end_ts=window[-1]['timestamp_ms'],
-                        senders=senders,
-                    ),
-                    'text': chunk_text,
-                    'start_timestamp': window[0]['timestamp_ms'],
-                    'end_timestamp': window[-1]['timestamp_ms'],
-                    'senders': senders,
+    async def _save_thread_states(self, mongodb_client: AsyncIOMotorClient) -> None:
+        states = []
+        for doc in self.documents:
+            thread_key = self._thread_key(doc)
+            timestamps = [msg['timestamp_ms'] for msg in get_text_messages(doc)]
+            if not thread_key or not timestamps:
+                continue
+
+            states.append(
+                {
+                    'thread_path': thread_key,
+                    'first_timestamp_ms': min(timestamps),
+                    'last_timestamp_ms': max(timestamps),
+                    'message_count': len(timestamps),
+                    'collection_name': get_rag_vec_store().get_full_collection_name(),
+                    'chunking': self._chunking_key,
+                    'updated_at': datetime.now(UTC),
                 }
-                chunks.append(chunk)
+            )
+
+        async for _ in ThreadStateDoc.iter_upsert_docs(
+            client=mongodb_client, docs=ThreadStateDoc.prepare_iter_docs(states)
+        ):
+            pass
+
+    def _get_first_new_index(self, document: dict, state: dict | None) -> int:
+        # 換了 vector collection（例如新的 schema 或 storage profile）或切法就要全量重建
+        if (
+            state is None
+            or state.get('collection_name')
+            != get_rag_vec_store().get_full_collection_name()
+            or state.get('chunking', DEFAULT_CHUNKING_KEY) != self._chunking_key
+        ):
+            return 0
+
+        timestamps = [msg['timestamp_ms'] for msg in get_text_messages(document)]
+        known_count = sum(ts <= state['last_timestamp_ms'] for ts in timestamps)
+        # 舊訊息有增減（例如重新匯出範圍不同）時無法只看尾端，改為全量重建
+        if (
+            known_count != state['message_count']
+            or not timestamps
+            or min(timestamps) != state['first_timestamp_ms']
+        ):
+            return 0
+        return known_count
+
+    def _get_stale_from_timestamp(
+        self, document: dict, state: dict | None, first_new_index: int
+    ) -> int | None:
+        # 重建後 chunk_id 不同的舊 chunk 要先刪掉，否則會和新 chunk 重複留在 collection
+        if (
+            state is None
+            or state.get('collection_name')
+            != get_rag_vec_store().get_full_collection_name()
+        ):
+            return None
+        # 換了切法，整個 thread 的舊 chunk 都要刪
+        if state.get('chunking', DEFAULT_CHUNKING_KEY) != self._chunking_key:
+            return 0
+        if not self.include_tail or not first_new_index:
+            return None
+
+        # 先前不足一個 window 的尾端會被含有新訊息的完整 window 取代
+        timestamps = sorted(msg['timestamp_ms'] for msg in get_text_messages(document))
+        starts = [
+            iter_window_starts(
+                len(timestamps), window_size, self.stride, first_new_index, True
+            )
+            for window_size in self.window_sizes
+        ]
+        rebuilt_starts = [window_starts[0] for window_starts in starts if window_starts]
+        if not rebuilt_starts:
+            return None
+        return timestamps[min(rebuilt_starts)]
+
+    async def _delete_stale_chunks(
+        self,
+        qdrant_client: AsyncQdrantClient,
+        mongodb_client: AsyncIOMotorClient,
+        thread_states: dict[str, dict],
+        first_new_indexes: list[int],
+    ) -> None:
+        for doc, first_new_index in zip(self.documents, first_new_indexes, strict=True):
+            thread_key = self._thread_key(doc)
+            from_timestamp = self._get_stale_from_timestamp(
+                doc, thread_states.get(thread_key), first_new_index
+            )
+            if from_timestamp is None:
+                continue
+
+            await asyncio.gather(
+                get_rag_vec_store().delete_points(
+                    client=qdrant_client,
+                    include_filter_map={
+                        'source': SOURCE,
+                        'thread_id': thread_key,
+                        'start_timestamp': {'gte': from_timestamp},
+                    },
+                ),
+                ChatDoc.delete_docs(
+                    client=mongodb_client,
+                    query_filter={
+                        'thread_id': thread_key,
+                        'start_timestamp': {'$gte': from_timestamp},
+                    },
+                ),
+            )
 
-        return chunks
+    # --------- chunking ---------
 
-    # --------- static-like utilities ---------
+    @property
+    def _chunking_key(self) -> str:
+        return f'{self.window_sizes}:{self.stride}:{self.include_tail}'
 
-    def _is_text_message(self, message: dict) -> bool:
-        return 'content' in message
+    def _count_chunks(self, document: dict, first_new_index: int = 0) -> int:
+        return count_document_chunks(
+            document,
+            window_sizes=self.window_sizes,
+            stride=self.stride,
+            first_new_index=first_new_index,
+            include_tail=self.include_tail,
+        )
 
-    def _merge_messages_to_chunk(self, messages: list[dict]) -> str:
-        return '\n'.join(f'{msg["sender_name"]}: {msg["content"]}' for msg in messages)
+    def _build_document_chunks(
+        self, document: dict, first_new_index: int = 0
+    ) -> list[dict]:
+        return build_document_chunks(
+            document,
+            window_sizes=self.window_sizes,
+            stride=self.stride,
+            first_new_index=first_new_index,
+            include_tail=self.include_tail,
+        )
@@ -0,0 +1,140 @@
+import contextlib
+from collections.abc import AsyncGenerator, AsyncIterable, Callable
+from contextlib import AbstractAsyncContextManager
+
+import attr
+
+from core.json_stream import iter_json_documents
+from core.message_handler import MessageHandler
+from database.mongodb.client import async_mongodb_client
+from database.mongodb.ingest_job_doc import IngestJobDoc
+from embedding.base import EncoderProtocol
+
+UPLOAD_JOB_TYPE = 'message_upload'
+
+
+@attr.s(auto_attribs=True)
+class MessageUploadHandler:
+    job: dict
+    encoder: EncoderProtocol
+    window_sizes: list[int] = [5]
+    stride: int = 3
+    include_tail: bool = False
+    preprocess_workers: int = 0
+    group_size: int = 50
+    # 每組文件處理前取得的並行名額，API 傳入 ingest_scheduler.slot('message')
+    acquire_slot: Callable[[], AbstractAsyncContextManager] = contextlib.nullcontext
+
+    async def ingest_stream(
+        self, chunks: AsyncIterable[bytes], offset: int = 0, dry_run: bool = False
+    ) -> AsyncGenerator[dict, None]:
+        # offset 是這次上傳第一份文件在整個 job 中的序號，已 commit 的文件直接略過
+        committed = self.job['committed_documents']
+        embedded = self.job['embedded_chunks']
+        skipped = self.job['skipped_chunks']
+        await self._update_job(
+            dry_run, status='running', error=None, cancel_requested=False
+        )
+
+        try:
+            group = []
+            document_idx = offset
+            async for document in iter_json_documents(chunks):
+                if document_idx >= committed:
+                    group.append(document)
+                document_idx += 1
+
+                if len(group) < self.group_size:
+                    continue
+
+                async for state in self._ingest_group(group, dry_run):
+                    yield self._to_dict(committed, embedded, skipped, state)
+                committed = document_idx
+                embedded, skipped = self._add_group_counts(embedded, skipped, state)
+                if await self._commit(dry_run, committed, embedded, skipped):
+                    # DELETE /ingest/jobs/{job_id} 設定的 flag，停在已 commit 的位置
+                    await self._update_job(dry_run, status='cancelled')
+                    yield self._summary(committed, embedded, skipped, 'cancelled')
+                    return
+                group = []
+
+            if group:
+                async for state in self._ingest_group(group, dry_run):
+                    yield self._to_dict(committed, embedded, skipped, state)
+                embedded, skipped = self._add_group_counts(embedded, skipped, state)
+
+            committed = max(committed, document_idx)
+            await self._commit(dry_run, committed, embedded, skipped, status='idle')
+            yield self._summary(committed, embedded, skipped, 'ok')
+        except Exception as e:
+            await self._update_job(dry_run, status='failed', error=str(e))
+            raise
+
+    async def _ingest_group(
+        self, documents: list[dict], dry_run: bool
+    ) -> AsyncGenerator[dict, None]:
+        handler = MessageHandler(
+            documents=documents,
+            encoder=self.encoder,
+            window_sizes=self.window_sizes,
+            stride=self.stride,
+            include_tail=self.include_tail,
+            preprocess_workers=self.preprocess_workers,
+        )
+        async with self.acquire_slot():
+            async for progress in handler.index_message_chunks(dry_run=dry_run):
+                yield progress.to_dict()
+
+    def _add_group_counts(
+        self, embedded: int, skipped: int, state: dict
+    ) -> tuple[int, int]:
+        return embedded + state['embedded_chunks'], skipped + state['skipped_chunks']
+
+    def _to_dict(
+        self, committed: int, embedded: int, skipped: int, state: dict
+    ) -> dict:
+        return {
+            'job_id': self.job['job_id'],
+            'indexed_ratio': state['indexed_ratio'],
+            'committed_documents': committed,
+            'embedded_chunks': embedded + state['embedded_chunks'],
+            'skipped_chunks': skipped + state['skipped_chunks'],
+        }
+
+    def _summary(
+        self, committed: int, embedded: int, skipped: int, status: str
+    ) -> dict:
+        return {
+            'status': status,
+            'job_id': self.job['job_id'],
+            'indexed_ratio': 1.0,
+            'committed_documents': committed,
+            'embedded_chunks': embedded,
+            'skipped_chunks': skipped,
+        }
+
+    async def _commit(
+        self,
+        dry_run: bool,
+        committed: int,
+        embedded: int,
+        skipped: int,
+        status: str = 'running',
+    ) -> bool:
+        return await self._update_job(
+            dry_run,
+            status=status,
+            committed_documents=committed,
+            embedded_chunks=embedded,
+            skipped_chunks=skipped,
+        )
+
+    async def _update_job(self, dry_run: bool, **fields: object) -> bool:
+        self.job.update(fields)
+        if dry_run:
+            return False
+        async with async_mongodb_client() as client:
+            doc = await IngestJobDoc.update_job(
+                client=client, job_id=self.job['job_id'], **fields
+            )
+        return bool(doc and doc.get('cancel_requested'))
@@ -0,0 +1,84 @@
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterable, Awaitable, Callable
+from typing import Any
+
+import attr
+
+Stage = Callable[[Any], Awaitable[Any]]
+
+_DONE = object()
+
+
+@attr.s(auto_attribs=True)
+class PipelineStage:
+    func: Stage
+    concurrency: int = 1
+
+
+@attr.s(auto_attribs=True)
+class _StageFailure:
+    error: BaseException
+
+
+async def _feed(source: AsyncIterable, outbox: asyncio.Queue) -> None:
+    try:
+        async for item in source:
+            await outbox.put(item)
+    except Exception as e:
+        await outbox.put(_StageFailure(e))
+    else:
+        await outbox.put(_DONE)
+
+
+async def _work(
+    stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue, workers: list[int]
+) -> None:
+    while True:
+        item = await inbox.get()
+        if isinstance(item, _StageFailure):
+            await outbox.put(item)
+            return
+        if item is _DONE:
+            # 同一個 stage 的其他 worker 也要收到結束訊號，最後一個再往下游傳
+            workers[0] -= 1
+            await (outbox if workers[0] == 0 else inbox).put(_DONE)
+            return
+        try:
+            result = await stage(item)
+        except Exception as e:
+            await outbox.put(_StageFailure(e))
+            return
+        await outbox.put(result)
+
+
+async def run_pipeline(
+    source: AsyncIterable, stages: list[Stage | PipelineStage], queue_size: int = 2
+) -> AsyncGenerator[Any, None]:
+    # 每個 stage 由 worker task 執行，之間以 bounded queue 相連，下游塞車時上游會被擋住
+    stages = [
+        stage if isinstance(stage, PipelineStage) else PipelineStage(func=stage)
+        for stage in stages
+    ]
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    tasks = [asyncio.create_task(_feed(source, queues[0]))]
+    for idx, stage in enumerate(stages):
+        workers = [stage.concurrency]
+        tasks += [
+            asyncio.create_task(
+                _work(stage.func, queues[idx], queues[idx + 1], workers)
+            )
+            for _ in range(stage.concurrency)
+        ]
+
+    try:
+        while True:
+            item = await queues[-1].get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageFailure):
+                raise item.error
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
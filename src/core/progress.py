@@ -0,0 +1,11 @@
+import attr
+
+
+@attr.s(auto_attribs=True)
+class IngestProgress:
+    indexed_ratio: float
+    embedded_chunks: int = 0
+    skipped_chunks: int = 0
+
+    def to_dict(self) -> dict:
+        return attr.asdict(self)
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Protocol
+
+import attr
+import numpy as np
+
+from core.retrieval import RetrievedChunk
+from embedding.executor import InferenceExecutor, InferenceQueueFullError
+from settings import get_settings
+from utils import estimate_tokens
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
+
+class RerankerProtocol(Protocol):
+    candidates: int
+
+    async def rerank(
+        self, query: str, chunks: list[RetrievedChunk]
+    ) -> list[RetrievedChunk]: ...
+
+    def start(self) -> None: ...
+
+    def close(self) -> None: ...
+
+    def stats(self) -> dict: ...
+
+
+@attr.s(auto_attribs=True)
+class IdentityReranker:
+    candidates: int = 0
+
+    async def rerank(
+        self, query: str, chunks: list[RetrievedChunk]
+    ) -> list[RetrievedChunk]:
+        return chunks
+
+    def start(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {'model_name': None}
+
+
+@attr.s(auto_attribs=True)
+class CrossEncoderReranker:
+    model_name: str = 'cross-encoder/mmarco-mMiniLMv2-L12-H384-v1'
+    max_length: int = 256
+    candidates: int = 20
+    timeout: float = 2.0
+
+    def __attrs_post_init__(self) -> None:
+        self.executor = InferenceExecutor(max_workers=1, max_queue_size=4)
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._load_task: asyncio.Task | None = None
+        self.calls = 0
+        self.not_ready = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+
+    def _get_model(self) -> 'CrossEncoder':
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(
+                    self.model_name, max_length=self.max_length, device='cpu'
+                )
+        return self._model
+
+    def load(self) -> None:
+        # 載入後先跑一次推論，第一個請求不用負擔初始化成本
+        self.score('warmup', ['warmup'])
+
+    def start(self) -> None:
+        # 與 EncoderLoader 相同，在背景載入模型，不拖慢 API 啟動
+        if self._load_task is None:
+            self._load_task = asyncio.create_task(self.executor.run(self.load))
+            self._load_task.add_done_callback(self._log_load_failure)
+
+    def _log_load_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(
+                'Failed to load reranker %s',
+                self.model_name,
+                exc_info=task.exception(),
+            )
+
+    def score(self, query: str, texts: list[str]) -> np.ndarray:
+        # 所有候選一次送進模型，只跑一個 batch
+        return np.asarray(
+            self._get_model().predict(
+                [(query, text) for text in texts],
+                batch_size=max(len(texts), 1),
+                show_progress_bar=False,
+            )
+        )
+
+    async def rerank(
+        self, query: str, chunks: list[RetrievedChunk]
+    ) -> list[RetrievedChunk]:
+        if not chunks:
+            return chunks
+
+        if self._model is None:
+            # 模型還沒載入完成時不排隊等待，直接維持向量搜尋的順序
+            self.start()
+            self.not_ready += 1
+            return chunks
+
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            scores = await asyncio.wait_for(
+                self.executor.run(self.score, query, [chunk.text for chunk in chunks]),
+                timeout=self.timeout,
+            )
+        except InferenceQueueFullError:
+            self.rejected += 1
+            return chunks
+        except TimeoutError:
+            # 超過延遲預算就維持向量搜尋的順序
+            self.timeouts += 1
+            return chunks
+        except Exception:
+            logging.exception('Rerank failed, falling back to vector order')
+            self.failures += 1
+            return chunks
+        finally:
+            self.total_seconds += time.perf_counter() - start
+
+        order = np.argsort(-scores, kind='stable')
+        return [
+            attr.evolve(chunks[idx], rerank_score=float(scores[idx])) for idx in order
+        ]
+
+    def close(self) -> None:
+        if self._load_task is not None:
+            self._load_task.cancel()
+        self.executor.shutdown()
+
+    def stats(self) -> dict:
+        return {
+            'model_name': self.model_name,
+            'loaded': self._model is not None,
+            'calls': self.calls,
+            'not_ready': self.not_ready,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'failures': self.failures,
+            'avg_latency_ms': (
+                self.total_seconds / self.calls * 1000 if self.calls else 0.0
+            ),
+        }
+
+
+def select_within_budget(
+    chunks: list[RetrievedChunk],
+    top_k: int,
+    token_budget: int,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> list[RetrievedChunk]:
+    # 依排名挑選，放不進剩餘預算的 chunk 跳過，讓後面較短的有機會放入
+    selected = []
+    used_tokens = 0
+    for chunk in chunks:
+        if len(selected) >= top_k:
+            break
+        tokens = count_tokens(chunk.text)
+        if used_tokens + tokens > token_budget:
+            continue
+        selected.append(chunk)
+        used_tokens += tokens
+    return selected
+
+
+def build_reranker() -> RerankerProtocol:
+    settings = get_settings()
+    if not settings.RERANKER_ENABLED or settings.ENVIRONMENT != 'production':
+        return IdentityReranker()
+    return CrossEncoderReranker(
+        model_name=settings.RERANKER_MODEL_NAME,
+        max_length=settings.RERANKER_MAX_LENGTH,
+        candidates=settings.RERANK_CANDIDATES,
+        timeout=settings.RERANK_TIMEOUT_SECONDS,
+    )
@@ -0,0 +1,340 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import date
+
+import attr
+from motor.motor_asyncio import AsyncIOMotorClient
+from qdrant_client.conversions.common_types import ScoredPoint
+
+from core.retrieval_cache import RetrievalCache
+from database.mongodb.base import BaseDocCol
+from database.mongodb.chat_doc import ChatDoc
+from database.mongodb.client import async_mongodb_client
+from database.mongodb.gmail_doc import GmailDoc
+from database.qdrant.base import BaseVecStore
+from database.qdrant.client import async_qdrant_client
+from database.qdrant.rag_vec_store import get_rag_vec_store
+from embedding.base import EncoderProtocol
+from utils import date_to_timestamp_ms
+
+SOURCE_DOC_COLS: dict[str, type[BaseDocCol]] = {
+    'message': ChatDoc,
+    'gmail': GmailDoc,
+}
+HIT_PAYLOAD_FIELDS = ['source', 'thread_id', 'start_timestamp', 'end_timestamp']
+
+
+@attr.s(auto_attribs=True)
+class RetrievedChunk:
+    chunk_id: str
+    source: str
+    score: float
+    text: str
+    doc: dict = attr.Factory(dict)
+    rerank_score: float | None = None
+    thread_id: str | None = None
+    start_timestamp: int | None = None
+    end_timestamp: int | None = None
+
+
+@attr.s(auto_attribs=True)
+class RetrievalConstraints:
+    senders: list[str] | None = None
+    start_timestamp: int | None = None
+    end_timestamp: int | None = None
+    sources: list[str] | None = None
+    thread_ids: list[str] | None = None
+
+    @classmethod
+    def from_dates(
+        cls,
+        senders: list[str] | None = None,
+        start_date: str | date | None = None,
+        end_date: str | date | None = None,
+        sources: list[str] | None = None,
+    ) -> 'RetrievalConstraints':
+        return cls(
+            senders=senders,
+            start_timestamp=date_to_timestamp_ms(start_date) if start_date else None,
+            end_timestamp=(
+                date_to_timestamp_ms(end_date, end_of_day=True) if end_date else None
+            ),
+            sources=sources,
+        )
+
+    def to_filter_map(self) -> dict | None:
+        filter_map = {}
+        if self.senders:
+            filter_map['senders'] = self.senders
+        if self.sources:
+            filter_map['source'] = self.sources
+        if self.thread_ids:
+            filter_map['thread_id'] = self.thread_ids
+        # chunk 的時間區間與查詢區間有重疊就算符合
+        if self.start_timestamp is not None:
+            filter_map['end_timestamp'] = {'gte': self.start_timestamp}
+        if self.end_timestamp is not None:
+            filter_map['start_timestamp'] = {'lte': self.end_timestamp}
+        return filter_map or None
+
+
+def to_doc_id(point_id: str | int) -> str:
+    # Qdrant 的 UUID 帶 dash，Mongo 的 _id 是原本的 chunk_id
+    return str(point_id).replace('-', '')
+
+
+async def fetch_retrieved_chunks(
+    client: AsyncIOMotorClient, hits: list[ScoredPoint]
+) -> list[RetrievedChunk]:
+    ids_by_source = defaultdict(list)
+    for hit in hits:
+        source = hit.payload['source']
+        if source not in SOURCE_DOC_COLS:
+            raise ValueError(f'There is no {source} source!')
+        ids_by_source[source].append(to_doc_id(hit.id))
+
+    # 每個 source 一個以 _id 查詢的 request，同時送出
+    sources = list(ids_by_source)
+    results = await asyncio.gather(
+        *(
+            SOURCE_DOC_COLS[source].get_doc_by_ids(
+                client=client, ids=ids_by_source[source]
+            )
+            for source in sources
+        )
+    )
+    docs = {
+        (source, doc['_id']): doc
+        for source, source_docs in zip(sources, results, strict=True)
+        for doc in source_docs
+    }
+
+    # 依 Qdrant 的排名輸出，Mongo 還沒寫入的 chunk 直接略過
+    chunks = []
+    for hit in hits:
+        doc = docs.get((hit.payload['source'], to_doc_id(hit.id)))
+        if doc is None:
+            continue
+        chunks.append(
+            RetrievedChunk(
+                chunk_id=doc['_id'],
+                source=hit.payload['source'],
+                score=hit.score,
+                text=doc['text'],
+                doc=doc,
+                thread_id=hit.payload.get('thread_id'),
+                start_timestamp=hit.payload.get('start_timestamp'),
+                end_timestamp=hit.payload.get('end_timestamp'),
+            )
+        )
+    return chunks
+
+
+def contains_lines(lines: list[str], sub_lines: list[str]) -> bool:
+    # 以整行比對，避免 'Bob: ok' 被當成 'Bob: okay' 的一部分
+    size = len(sub_lines)
+    return any(
+        lines[idx : idx + size] == sub_lines for idx in range(len(lines) - size + 1)
+    )
+
+
+def join_span_texts(texts: list[str]) -> str:
+    # 依時間順序串接，相鄰 chunk 重疊的訊息行只保留一次
+    lines = []
+    for text in texts:
+        new_lines = text.splitlines()
+        if contains_lines(lines, new_lines):
+            continue
+        overlap = next(
+            (
+                size
+                for size in range(min(len(lines), len(new_lines)), 0, -1)
+                if lines[-size:] == new_lines[:size]
+            ),
+            0,
+        )
+        lines += new_lines[overlap:]
+    return '\n'.join(lines)
+
+
+def is_span_chunk(chunk: RetrievedChunk) -> bool:
+    return (
+        chunk.thread_id is not None
+        and chunk.start_timestamp is not None
+        and chunk.end_timestamp is not None
+    )
+
+
+async def expand_neighbor_chunks(
+    client: AsyncIOMotorClient, chunks: list[RetrievedChunk], neighbors: int
+) -> list[RetrievedChunk]:
+    targets = [
+        chunk for chunk in chunks if chunk.source == 'message' and is_span_chunk(chunk)
+    ]
+    results = await asyncio.gather(
+        *(
+            ChatDoc.get_neighbor_docs(
+                client=client,
+                thread_id=chunk.thread_id,
+                start_timestamp=chunk.start_timestamp,
+                end_timestamp=chunk.end_timestamp,
+                before=neighbors,
+                after=neighbors,
+            )
+            for chunk in targets
+        )
+    )
+    neighbor_docs = {
+        id(chunk): docs for chunk, docs in zip(targets, results, strict=True)
+    }
+
+    expanded = []
+    for chunk in chunks:
+        docs = neighbor_docs.get(id(chunk))
+        if not docs:
+            expanded.append(chunk)
+            continue
+
+        # 命中的 span 向前後各延伸 neighbors 個 span，補上前後文
+        parts = sorted(
+            [
+                (doc['start_timestamp'], doc['end_timestamp'], doc['text'])
+                for doc in docs
+            ]
+            + [(chunk.start_timestamp, chunk.end_timestamp, chunk.text)]
+        )
+        expanded.append(
+            attr.evolve(
+                chunk,
+                text=join_span_texts([text for _, _, text in parts]),
+                start_timestamp=parts[0][0],
+                end_timestamp=max(end for _, end, _ in parts),
+            )
+        )
+    return expanded
+
+
+def merge_overlapping_chunks(
+    chunks: list[RetrievedChunk], gap_ms: int = 0
+) -> list[RetrievedChunk]:
+    # 同一個 thread 時間區間重疊的命中合併成一段，排名取其中最好的
+    groups = defaultdict(list)
+    for rank, chunk in enumerate(chunks):
+        key = (chunk.source, chunk.thread_id) if is_span_chunk(chunk) else rank
+        groups[key].append((rank, chunk))
+
+    merged = []
+    for key, members in groups.items():
+        if not isinstance(key, tuple):
+            merged += members
+            continue
+
+        members.sort(key=lambda member: member[1].start_timestamp)
+        spans = [[members[0]]]
+        end_timestamp = members[0][1].end_timestamp
+        for member in members[1:]:
+            if member[1].start_timestamp <= end_timestamp + gap_ms:
+                spans[-1].append(member)
+            else:
+                spans.append([member])
+                end_timestamp = member[1].end_timestamp
+            end_timestamp = max(end_timestamp, member[1].end_timestamp)
+
+        merged += [merge_span(span) for span in spans]
+
+    return [chunk for _, chunk in sorted(merged, key=lambda member: member[0])]
+
+
+def merge_span(
+    members: list[tuple[int, RetrievedChunk]],
+) -> tuple[int, RetrievedChunk]:
+    if len(members) == 1:
+        return members[0]
+
+    rank, best = min(members, key=lambda member: member[0])
+    chunks = [chunk for _, chunk in members]
+    return rank, attr.evolve(
+        best,
+        score=max(chunk.score for chunk in chunks),
+        text=join_span_texts([chunk.text for chunk in chunks]),
+        start_timestamp=chunks[0].start_timestamp,
+        end_timestamp=max(chunk.end_timestamp for chunk in chunks),
+        doc={**best.doc, 'merged_chunk_ids': [chunk.chunk_id for chunk in chunks]},
+    )
+
+
+@attr.s(auto_attribs=True)
+class Retriever:
+    encoder: EncoderProtocol
+    vec_store: type[BaseVecStore] = attr.Factory(get_rag_vec_store)
+    cache: RetrievalCache | None = None
+    expand_neighbors: int = 0
+    merge_spans: bool = False
+
+    async def retrieve(
+        self,
+        query: str,
+        limit: int = 5,
+        constraints: RetrievalConstraints | None = None,
+    ) -> list[RetrievedChunk]:
+        if self.cache is not None:
+            scope = self.cache.get_scope(limit, constraints)
+            generation = self.cache.generation
+            chunks = self.cache.get_exact(scope, query)
+            if chunks is not None:
+                return chunks
+
+        start = time.perf_counter()
+        query_embedding = (await self.encoder.aencode([query]))[0]
+        encode_seconds = time.perf_counter() - start
+        if self.cache is not None:
+            chunks = self.cache.get_similar(scope, query, query_embedding)
+            if chunks is not None:
+                return chunks
+
+        start = time.perf_counter()
+        chunks = await self._search(query, query_embedding.tolist(), limit, constraints)
+        if self.cache is not None:
+            self.cache.put(
+                scope=scope,
+                query=query,
+                query_embedding=query_embedding,
+                constraints=constraints,
+                chunks=chunks,
+                encode_seconds=encode_seconds,
+                search_seconds=time.perf_counter() - start,
+                generation=generation,
+            )
+        return chunks
+
+    async def _search(
+        self,
+        query: str,
+        query_vector: list[float],
+        limit: int,
+        constraints: RetrievalConstraints | None,
+    ) -> list[RetrievedChunk]:
+        async with async_qdrant_client() as client:
+            hits = await self.vec_store.search(
+                client=client,
+                query_vector=query_vector,
+                query_text=query,
+                limit=limit,
+                with_payload=HIT_PAYLOAD_FIELDS,
+                include_filter_map=constraints.to_filter_map() if constraints else None,
+            )
+
+        if not hits:
+            return []
+
+        async with async_mongodb_client() as client:
+            chunks = await fetch_retrieved_chunks(client, hits)
+            if self.expand_neighbors > 0:
+                chunks = await expand_neighbor_chunks(
+                    client, chunks, self.expand_neighbors
+                )
+
+        if self.merge_spans:
+            chunks = merge_overlapping_chunks(chunks)
+        return chunks
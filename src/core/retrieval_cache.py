@@ -0,0 +1,215 @@
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Callable
+from typing import TYPE_CHECKING, TypeVar
+
+import attr
+import numpy as np
+
+from embedding.cache import normalize_text
+from embedding.sparse import CJK_PATTERN, tokenize
+from settings import get_settings
+
+if TYPE_CHECKING:
+    from core.retrieval import RetrievalConstraints, RetrievedChunk
+
+T = TypeVar('T')
+
+
+def get_keywords(query: str) -> frozenset[str]:
+    # hybrid search 靠英數字詞區分 AB-1234 / AB-1235 這類代碼，embedding 幾乎分不出來
+    return frozenset(token for token in tokenize(query) if not CJK_PATTERN.match(token))
+
+
+@attr.s(auto_attribs=True)
+class RetrievalCacheEntry:
+    scope: str
+    query: str
+    query_embedding: np.ndarray
+    keywords: frozenset[str]
+    sources: frozenset[str] | None
+    chunks: 'list[RetrievedChunk]'
+    encode_seconds: float
+    search_seconds: float
+    expires_at: float
+
+
+@attr.s(auto_attribs=True)
+class RetrievalCache:
+    max_size: int = 1024
+    ttl_seconds: float = 600.0
+    similarity_threshold: float = 0.95
+    # 開啟時 similar hit 還要求英數字詞完全相同
+    match_keywords: bool = True
+
+    def __attrs_post_init__(self) -> None:
+        self._entries: OrderedDict[tuple[str, str], RetrievalCacheEntry] = OrderedDict()
+        self.generation = 0
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    @staticmethod
+    def get_scope(limit: int, constraints: 'RetrievalConstraints | None') -> str:
+        # 只有 limit 與 filter 都相同的查詢才能共用結果
+        filter_map = constraints.to_filter_map() if constraints else None
+        return f'{limit}:{sorted((filter_map or {}).items())}'
+
+    def get_exact(self, scope: str, query: str) -> 'list[RetrievedChunk] | None':
+        key = (scope, normalize_text(query))
+        entry = self._entries.get(key)
+        if entry is None or self._expire(key, entry):
+            return None
+
+        self._entries.move_to_end(key)
+        self.exact_hits += 1
+        self.saved_seconds += entry.encode_seconds + entry.search_seconds
+        return list(entry.chunks)
+
+    def get_similar(
+        self, scope: str, query: str, query_embedding: np.ndarray
+    ) -> 'list[RetrievedChunk] | None':
+        keywords = get_keywords(query)
+        candidates = [
+            (key, entry)
+            for key, entry in list(self._entries.items())
+            if entry.scope == scope
+            and not self._expire(key, entry)
+            and (not self.match_keywords or entry.keywords == keywords)
+        ]
+        if not candidates:
+            self.misses += 1
+            return None
+
+        # 已存的 embedding 都正規化過，內積即為 cosine similarity
+        similarities = np.stack(
+            [entry.query_embedding for _, entry in candidates]
+        ) @ self._normalize(query_embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        key, entry = candidates[best]
+        self._entries.move_to_end(key)
+        self.similar_hits += 1
+        self.saved_seconds += entry.search_seconds
+        return list(entry.chunks)
+
+    def put(
+        self,
+        scope: str,
+        query: str,
+        query_embedding: np.ndarray,
+        constraints: 'RetrievalConstraints | None',
+        chunks: 'list[RetrievedChunk]',
+        encode_seconds: float,
+        search_seconds: float,
+        generation: int,
+    ) -> None:
+        self.miss_seconds += encode_seconds + search_seconds
+        # 查詢期間有 ingest 寫入，結果可能已過時，不放進 cache
+        if generation != self.generation:
+            return
+
+        key = (scope, normalize_text(query))
+        self._entries[key] = RetrievalCacheEntry(
+            scope=scope,
+            query=query,
+            query_embedding=self._normalize(query_embedding),
+            keywords=get_keywords(query),
+            sources=(
+                frozenset(constraints.sources)
+                if constraints and constraints.sources
+                else None
+            ),
+            chunks=list(chunks),
+            encode_seconds=encode_seconds,
+            search_seconds=search_seconds,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, source: str | None = None) -> int:
+        # 沒有限定 source 的查詢可能包含任何 source 的結果，一律清掉
+        keys = [
+            key
+            for key, entry in self._entries.items()
+            if source is None or entry.sources is None or source in entry.sources
+        ]
+        for key in keys:
+            del self._entries[key]
+        self.generation += 1
+        self.invalidations += 1
+        return len(keys)
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.similar_hits
+        total = hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_size': self.max_size,
+            'exact_hits': self.exact_hits,
+            'similar_hits': self.similar_hits,
+            'misses': self.misses,
+            'hit_ratio': hits / total if total else 0.0,
+            'invalidations': self.invalidations,
+            'saved_seconds': self.saved_seconds,
+            'avg_miss_latency_ms': (
+                self.miss_seconds / self.misses * 1000 if self.misses else 0.0
+            ),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expire(self, key: tuple[str, str], entry: RetrievalCacheEntry) -> bool:
+        if entry.expires_at > time.monotonic():
+            return False
+        del self._entries[key]
+        return True
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+def build_retrieval_cache() -> RetrievalCache | None:
+    settings = get_settings()
+    if not settings.RETRIEVAL_CACHE_ENABLED:
+        return None
+    return RetrievalCache(
+        max_size=settings.RETRIEVAL_CACHE_SIZE,
+        ttl_seconds=settings.RETRIEVAL_CACHE_TTL_SECONDS,
+        similarity_threshold=settings.RETRIEVAL_CACHE_SIMILARITY_THRESHOLD,
+        match_keywords=settings.HYBRID_SEARCH_ENABLED,
+    )
+
+
+def invalidate_on_write(
+    cache: RetrievalCache | None,
+    source: str,
+    run: Callable[[], AsyncGenerator[T, None]],
+) -> Callable[[], AsyncGenerator[T, None]]:
+    async def wrapped() -> AsyncGenerator[T, None]:
+        # 每批寫入後就失效，讓進行中的 ingest 也能被後續查詢看到
+        try:
+            async for progress in run():
+                if cache is not None:
+                    cache.invalidate(source)
+                yield progress
+        finally:
+            if cache is not None:
+                cache.invalidate(source)
+
+    return wrapped
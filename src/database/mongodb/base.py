@@ -5,13 +5,16 @@ from pymongo import UpdateOne
 
 from database.mongodb.client import async_mongodb_client
 from settings import get_settings
+from utils import iter_bounded_gather
 
 
 async def init_mongodb_cols() -> None:
     from database.mongodb.chat_doc import ChatDoc
     from database.mongodb.gmail_doc import GmailDoc
+    from database.mongodb.ingest_job_doc import IngestJobDoc
+    from database.mongodb.thread_state_doc import ThreadStateDoc
 
-    all_docs = [ChatDoc, GmailDoc]
+    all_docs = [ChatDoc, GmailDoc, ThreadStateDoc, IngestJobDoc]
     async with async_mongodb_client() as client:
         for col in all_docs:
             await col.create_collection(client=client)
@@ -70,25 +73,35 @@ class BaseDocCol:
             await collection.create_index([field_with_direction])
 
     @classmethod
-    async def iter_upsert_docs(
-        cls, client: AsyncIOMotorClient, docs: Iterable[list[dict]]
-    ) -> AsyncGenerator[int, None]:
+    async def upsert_docs(cls, client: AsyncIOMotorClient, docs: list[dict]) -> None:
         db = client[cls.DATABASE_NAME]
-        full_collection_name = cls.get_full_collection_name()
-
-        for idx, batched_doc in enumerate(docs, start=1):
-            operations = [
-                UpdateOne(
-                    {'_id': doc['doc_id']},
-                    {'$set': doc},
-                    upsert=True,
-                )
-                for doc in batched_doc
-            ]
+        operations = [
+            UpdateOne(
+                {'_id': doc['doc_id']},
+                {'$set': doc},
+                upsert=True,
+            )
+            for doc in docs
+        ]
 
-            if operations:
-                await db[full_collection_name].bulk_write(operations, ordered=False)
+        if operations:
+            await db[cls.get_full_collection_name()].bulk_write(
+                operations, ordered=False
+            )
 
+    @classmethod
+    async def iter_upsert_docs(
+        cls,
+        client: AsyncIOMotorClient,
+        docs: Iterable[list[dict]],
+        max_in_flight: int = 1,
+    ) -> AsyncGenerator[int, None]:
+        idx = 0
+        async for _ in iter_bounded_gather(
+            (cls.upsert_docs(client=client, docs=batched_doc) for batched_doc in docs),
+            limit=max_in_flight,
+        ):
+            idx += 1
             yield idx
 
     @classmethod
@@ -139,8 +152,27 @@ class BaseDocCol:
         await collection.delete_many({'_id': {'$in': ids}})
 
     @classmethod
-    async def get_doc_by_ids(cls, client: AsyncIOMotorClient, ids: list[str]) -> list:
+    async def delete_docs(cls, client: AsyncIOMotorClient, query_filter: dict) -> int:
         db = client[cls.DATABASE_NAME]
         collection = db[cls.get_full_collection_name()]
-        cursor = collection.find({'doc_id': {'$in': ids}})
+        result = await collection.delete_many(query_filter)
+        return result.deleted_count
+
+    @classmethod
+    async def get_doc_by_ids(
+        cls, client: AsyncIOMotorClient, ids: list[str], projection: dict | None = None
+    ) -> list:
+        db = client[cls.DATABASE_NAME]
+        collection = db[cls.get_full_collection_name()]
+        # _id 與 doc_id 相同，查 _id 才會走主鍵索引
+        cursor = collection.find({'_id': {'$in': ids}}, projection=projection)
         return await cursor.to_list(length=None)
+
+    @classmethod
+    async def get_existing_ids(
+        cls, client: AsyncIOMotorClient, ids: list[str]
+    ) -> set[str]:
+        db = client[cls.DATABASE_NAME]
+        collection = db[cls.get_full_collection_name()]
+        cursor = collection.find({'_id': {'$in': ids}}, projection={'_id': 1})
+        return {doc['_id'] for doc in await cursor.to_list(length=None)}
@@ -1,5 +1,7 @@
 from collections.abc import Generator
 
+from motor.motor_asyncio import AsyncIOMotorClient
+
 from database.mongodb.base import BaseDocCol
 
 
@@ -7,7 +9,7 @@ class ChatDoc(BaseDocCol):
     DATABASE_NAME = 'mydrift'
     COLLECTION_BASE_NAME = 'chat_collection'
     COLLECTION_VERSION_NAME = '2025-04-03'
-    INDEX_FIELDS_WITH_DIRECTION = [('senders', 1)]
+    INDEX_FIELDS_WITH_DIRECTION = [('senders', 1), ('thread_id', 1)]
 
     @classmethod
     def prepare_iter_docs(cls, chunks: list[dict], batch_size: int = 250) -> Generator:
@@ -19,6 +21,7 @@ class ChatDoc(BaseDocCol):
                 'end_timestamp': chunk['end_timestamp'],
                 'senders': chunk['senders'],
                 'text': chunk['text'],
+                'thread_id': chunk.get('thread_id'),
             }
             docs.append(doc)
 
@@ -28,3 +31,37 @@ class ChatDoc(BaseDocCol):
 
         if docs:
             yield docs
+
+    @classmethod
+    async def get_neighbor_docs(
+        cls,
+        client: AsyncIOMotorClient,
+        thread_id: str,
+        start_timestamp: int,
+        end_timestamp: int,
+        before: int = 1,
+        after: int = 1,
+    ) -> list[dict]:
+        db = client[cls.DATABASE_NAME]
+        collection = db[cls.get_full_collection_name()]
+        # 同一個 thread 中緊接在前後的 chunk，依時間排序；limit(0) 在 Mongo 代表不限制
+        previous_docs = next_docs = []
+        if before > 0:
+            previous_docs = await (
+                collection.find(
+                    {'thread_id': thread_id, 'end_timestamp': {'$lt': start_timestamp}}
+                )
+                .sort('end_timestamp', -1)
+                .limit(before)
+                .to_list(length=before)
+            )
+        if after > 0:
+            next_docs = await (
+                collection.find(
+                    {'thread_id': thread_id, 'start_timestamp': {'$gt': end_timestamp}}
+                )
+                .sort('start_timestamp', 1)
+                .limit(after)
+                .to_list(length=after)
+            )
+        return previous_docs[::-1] + next_docs
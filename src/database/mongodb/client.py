@@ -1,3 +1,5 @@
+import asyncio
+import weakref
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 
@@ -5,11 +7,57 @@ from motor.motor_asyncio import AsyncIOMotorClient
 
 from settings import get_settings
 
+# Motor client 綁定建立時的 event loop，共用 client 依 loop 區分
+_shared_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, AsyncIOMotorClient
+] = weakref.WeakKeyDictionary()
+
+
+def _get_shared_client(host: str | None) -> AsyncIOMotorClient | None:
+    if host and host != get_settings().MONGODB_HOST:
+        return None
+    return _shared_clients.get(asyncio.get_running_loop())
+
+
+async def init_mongodb_client() -> AsyncIOMotorClient:
+    loop = asyncio.get_running_loop()
+    if loop not in _shared_clients:
+        settings = get_settings()
+        _shared_clients[loop] = AsyncIOMotorClient(
+            settings.MONGODB_HOST,
+            maxPoolSize=settings.MONGODB_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        )
+    return _shared_clients[loop]
+
+
+async def close_mongodb_client() -> None:
+    client = _shared_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        client.close()
+
+
+async def check_mongodb_health() -> str:
+    try:
+        async with async_mongodb_client() as client:
+            await asyncio.wait_for(
+                client.admin.command('ping'),
+                timeout=get_settings().HEALTH_CHECK_TIMEOUT_SECONDS,
+            )
+    except Exception as e:
+        return f'error: {e}'
+    return 'ok'
+
 
 @asynccontextmanager
 async def async_mongodb_client(
     host: str = None,
 ) -> AsyncGenerator[AsyncIOMotorClient, None]:
+    shared_client = _get_shared_client(host)
+    if shared_client is not None:
+        yield shared_client
+        return
+
     client = AsyncIOMotorClient(host or get_settings().MONGODB_HOST)
     try:
         yield client
@@ -0,0 +1,56 @@
+import uuid
+from datetime import UTC, datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+
+from database.mongodb.base import BaseDocCol
+
+
+class IngestJobDoc(BaseDocCol):
+    DATABASE_NAME = 'mydrift'
+    COLLECTION_BASE_NAME = 'ingest_job_collection'
+    COLLECTION_VERSION_NAME = '2026-10-17'
+    INDEX_FIELDS_WITH_DIRECTION = []
+
+    @classmethod
+    async def create_job(
+        cls,
+        client: AsyncIOMotorClient,
+        job_type: str,
+        job_id: str | None = None,
+        **fields: object,
+    ) -> dict:
+        now = datetime.now(UTC)
+        job_id = job_id or uuid.uuid4().hex
+        job = {
+            'doc_id': job_id,
+            'job_id': job_id,
+            'job_type': job_type,
+            'status': 'created',
+            'committed_documents': 0,
+            'embedded_chunks': 0,
+            'skipped_chunks': 0,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+            **fields,
+        }
+        await cls.upsert_docs(client=client, docs=[job])
+        return job
+
+    @classmethod
+    async def get_job(cls, client: AsyncIOMotorClient, job_id: str) -> dict | None:
+        jobs = await cls.get_doc_by_ids(client=client, ids=[job_id])
+        return jobs[0] if jobs else None
+
+    @classmethod
+    async def update_job(
+        cls, client: AsyncIOMotorClient, job_id: str, **fields: object
+    ) -> dict | None:
+        db = client[cls.DATABASE_NAME]
+        return await db[cls.get_full_collection_name()].find_one_and_update(
+            {'_id': job_id},
+            {'$set': {**fields, 'updated_at': datetime.now(UTC)}},
+            return_document=ReturnDocument.AFTER,
+        )
@@ -0,0 +1,44 @@
+from collections.abc import Generator
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from database.mongodb.base import BaseDocCol
+
+
+class ThreadStateDoc(BaseDocCol):
+    DATABASE_NAME = 'mydrift'
+    COLLECTION_BASE_NAME = 'thread_state_collection'
+    COLLECTION_VERSION_NAME = '2026-10-17'
+    INDEX_FIELDS_WITH_DIRECTION = []
+
+    @classmethod
+    def prepare_iter_docs(cls, states: list[dict], batch_size: int = 250) -> Generator:
+        docs = []
+        for state in states:
+            doc = {
+                'doc_id': state['thread_path'],
+                'thread_path': state['thread_path'],
+                'first_timestamp_ms': state['first_timestamp_ms'],
+                'last_timestamp_ms': state['last_timestamp_ms'],
+                'message_count': state['message_count'],
+                'collection_name': state['collection_name'],
+                'chunking': state.get('chunking'),
+                'updated_at': state['updated_at'],
+            }
+            docs.append(doc)
+
+            if len(docs) == batch_size:
+                yield docs
+                docs = []
+
+        if docs:
+            yield docs
+
+    @classmethod
+    async def get_states(
+        cls, client: AsyncIOMotorClient, thread_paths: list[str]
+    ) -> dict[str, dict]:
+        if not thread_paths:
+            return {}
+        states = await cls.get_doc_by_ids(client=client, ids=thread_paths)
+        return {state['thread_path']: state for state in states}
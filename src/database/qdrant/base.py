@@ -4,27 +4,45 @@ from qdrant_client.async_qdrant_client import AsyncQdrantClient
 from qdrant_client.conversions.common_types import ScoredPoint
 from qdrant_client.http import models
 from qdrant_client.http.models import (
+    DatetimeRange,
     FieldCondition,
+    FusionQuery,
     HnswConfigDiff,
     MatchAny,
     MatchValue,
-    NamedVector,
+    PayloadSchemaType,
+    Prefetch,
+    QuantizationConfig,
+    QuantizationSearchParams,
+    QueryRequest,
+    Range,
+    SearchParams,
+    SparseVectorParams,
 )
 
 from database.qdrant.client import async_qdrant_client
+from embedding.sparse import SparseEncoder
 from settings import get_settings
+from utils import iter_bounded_gather
 
 
 async def init_qdrant_cols() -> None:
-    from database.qdrant.rag_vec_store import RAGVecStore
+    from database.qdrant.rag_vec_store import get_rag_vec_store
 
-    all_cols = [RAGVecStore]
+    all_cols = [get_rag_vec_store()]
     async with async_qdrant_client() as client:
         for col in all_cols:
             await col.create_collection(client=client)
 
 
 class BaseVecStore:
+    QUANTIZATION_CONFIG: QuantizationConfig | None = None
+    SEARCH_PARAMS: SearchParams | None = None
+    SPARSE_VECTOR_CONFIG: dict[str, SparseVectorParams] | None = None
+    SPARSE_ENCODER: SparseEncoder | None = None
+    SPARSE_VECTOR_NAME = 'bm25'
+    PAYLOAD_INDEXES: dict[str, PayloadSchemaType] = {}
+
     def __init_subclass__(cls, **kwargs: dict) -> None:
         super().__init_subclass__(**kwargs)
         required_attrs = [
@@ -63,20 +81,104 @@ class BaseVecStore:
                     collection_name=full_collection_name,
                     vectors_config=cls.VECTOR_CONFIG,
                     hnsw_config=cls.HNSW_CONFIG,
+                    quantization_config=cls.QUANTIZATION_CONFIG,
+                    sparse_vectors_config=cls.SPARSE_VECTOR_CONFIG,
                 )
             except Exception as e:
                 raise RuntimeError(f'Failed to create "{full_collection_name}"') from e
 
+        # payload index 讓 filter 在 HNSW 搜尋時直接套用；重複建立不會有副作用
+        for field_name, field_schema in cls.PAYLOAD_INDEXES.items():
+            await client.create_payload_index(
+                collection_name=full_collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+            )
+
+    @classmethod
+    async def upsert_points(
+        cls, client: AsyncQdrantClient, points: list, wait: bool = True
+    ) -> None:
+        await client.upsert(
+            collection_name=cls.get_full_collection_name(), points=points, wait=wait
+        )
+
     @classmethod
     async def iter_upsert_points(
-        cls, client: AsyncQdrantClient, batched_iter_points: Iterable
+        cls,
+        client: AsyncQdrantClient,
+        batched_iter_points: Iterable,
+        wait: bool = True,
+        max_in_flight: int = 1,
     ) -> AsyncGenerator[int, None]:
-        for idx, batched_point in enumerate(batched_iter_points, start=1):
-            await client.upsert(
-                collection_name=cls.get_full_collection_name(), points=batched_point
-            )
+        idx = 0
+        async for _ in iter_bounded_gather(
+            (
+                cls.upsert_points(client=client, points=batched_point, wait=wait)
+                for batched_point in batched_iter_points
+            ),
+            limit=max_in_flight,
+        ):
+            idx += 1
             yield idx
 
+    @classmethod
+    async def delete_points(
+        cls, client: AsyncQdrantClient, include_filter_map: dict, wait: bool = True
+    ) -> None:
+        await client.delete(
+            collection_name=cls.get_full_collection_name(),
+            points_selector=models.FilterSelector(
+                filter=cls._build_filter_conditions(include_filter_map)
+            ),
+            wait=wait,
+        )
+
+    @classmethod
+    async def get_existing_ids(
+        cls, client: AsyncQdrantClient, ids: list[str]
+    ) -> set[str]:
+        points = await client.retrieve(
+            collection_name=cls.get_full_collection_name(),
+            ids=ids,
+            with_payload=False,
+            with_vectors=False,
+        )
+        return {str(point.id).replace('-', '') for point in points}
+
+    @classmethod
+    def build_search_params(
+        cls,
+        hnsw_ef: int | None = None,
+        exact: bool | None = None,
+        rescore: bool | None = None,
+        oversampling: float | None = None,
+    ) -> SearchParams | None:
+        # 呼叫端沒指定就用 settings，oversampling 再退回 storage profile 的預設
+        settings = get_settings()
+        hnsw_ef = hnsw_ef if hnsw_ef is not None else settings.QDRANT_SEARCH_HNSW_EF
+        exact = exact if exact is not None else settings.QDRANT_SEARCH_EXACT
+
+        quantization = None
+        if cls.QUANTIZATION_CONFIG is not None:
+            default_quantization = (
+                cls.SEARCH_PARAMS.quantization if cls.SEARCH_PARAMS else None
+            )
+            if oversampling is None:
+                oversampling = settings.QDRANT_SEARCH_OVERSAMPLING
+            if oversampling is None and default_quantization is not None:
+                oversampling = default_quantization.oversampling
+            quantization = QuantizationSearchParams(
+                rescore=rescore
+                if rescore is not None
+                else settings.QDRANT_SEARCH_RESCORE,
+                oversampling=oversampling,
+            )
+
+        if hnsw_ef is None and not exact and quantization is None:
+            return None
+        return SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
     @classmethod
     async def search(
         cls,
@@ -89,26 +191,157 @@ class BaseVecStore:
         with_payload: list[str] | bool = True,
         include_filter_map: dict | None = None,
         exclude_filter_map: dict | None = None,
+        query_text: str | None = None,
+        hnsw_ef: int | None = None,
+        exact: bool | None = None,
+        rescore: bool | None = None,
+        oversampling: float | None = None,
+        prefetch_limit: int | None = None,
     ) -> list[ScoredPoint]:
-        query_filter = None
+        results = await cls.search_batch(
+            client=client,
+            query_vectors=[query_vector],
+            query_texts=[query_text],
+            threshold=threshold,
+            limit=limit,
+            offset=offset,
+            with_vectors=with_vectors,
+            with_payload=with_payload,
+            include_filter_map=include_filter_map,
+            exclude_filter_map=exclude_filter_map,
+            hnsw_ef=hnsw_ef,
+            exact=exact,
+            rescore=rescore,
+            oversampling=oversampling,
+            prefetch_limit=prefetch_limit,
+        )
+        return results[0]
+
+    @classmethod
+    async def search_batch(
+        cls,
+        client: AsyncQdrantClient,
+        query_vectors: Sequence[Sequence[float]],
+        query_texts: Sequence[str | None] | None = None,
+        threshold: float = 0.0,
+        limit: int = 10,
+        offset: int = 0,
+        with_vectors: bool = False,
+        with_payload: list[str] | bool = True,
+        include_filter_map: dict | None = None,
+        exclude_filter_map: dict | None = None,
+        hnsw_ef: int | None = None,
+        exact: bool | None = None,
+        rescore: bool | None = None,
+        oversampling: float | None = None,
+        prefetch_limit: int | None = None,
+    ) -> list[list[ScoredPoint]]:
+        if not query_vectors:
+            return []
+        if query_texts is None:
+            query_texts = [None] * len(query_vectors)
+        if len(query_texts) != len(query_vectors):
+            raise ValueError('query_texts must have the same length as query_vectors')
+
         query_filter = cls._build_filter_conditions(
             include_filter_map=include_filter_map, exclude_filter_map=exclude_filter_map
         )
-        return await client.search(
-            collection_name=cls.get_full_collection_name(),
-            query_vector=NamedVector(name='default', vector=query_vector),
+        search_params = cls.build_search_params(
+            hnsw_ef=hnsw_ef, exact=exact, rescore=rescore, oversampling=oversampling
+        )
+        requests = [
+            cls._build_query_request(
+                query_vector=query_vector,
+                query_text=query_text,
+                query_filter=query_filter,
+                search_params=search_params,
+                threshold=threshold,
+                limit=limit,
+                offset=offset,
+                with_vectors=with_vectors,
+                with_payload=with_payload,
+                prefetch_limit=prefetch_limit,
+            )
+            for query_vector, query_text in zip(query_vectors, query_texts, strict=True)
+        ]
+        # 多個 query 一次送出，只走一趟 round trip
+        responses = await client.query_batch_points(
+            collection_name=cls.get_full_collection_name(), requests=requests
+        )
+        return [response.points for response in responses]
+
+    @classmethod
+    def _build_query_request(
+        cls,
+        query_vector: Sequence[float],
+        query_text: str | None,
+        query_filter: models.Filter,
+        search_params: SearchParams | None,
+        threshold: float,
+        limit: int,
+        offset: int,
+        with_vectors: bool,
+        with_payload: list[str] | bool,
+        prefetch_limit: int | None,
+    ) -> QueryRequest:
+        dense_query = list(cls.prepare_query_vector(query_vector))
+        if not (
+            query_text and cls.SPARSE_ENCODER and get_settings().HYBRID_SEARCH_ENABLED
+        ):
+            return QueryRequest(
+                query=dense_query,
+                using='default',
+                filter=query_filter,
+                params=search_params,
+                score_threshold=threshold,
+                limit=limit,
+                offset=offset,
+                with_vector=with_vectors,
+                with_payload=with_payload,
+            )
+
+        # dense 與 BM25 各自取候選，再用 RRF 依名次融合；RRF 分數與 cosine 不同尺度
+        if prefetch_limit is None:
+            prefetch_limit = (
+                limit + offset
+            ) * get_settings().HYBRID_PREFETCH_MULTIPLIER
+        return QueryRequest(
+            prefetch=[
+                Prefetch(
+                    query=dense_query,
+                    using='default',
+                    filter=query_filter,
+                    params=search_params,
+                    limit=prefetch_limit,
+                ),
+                Prefetch(
+                    query=cls.SPARSE_ENCODER.encode_query(query_text),
+                    using=cls.SPARSE_VECTOR_NAME,
+                    filter=query_filter,
+                    limit=prefetch_limit,
+                ),
+            ],
+            query=FusionQuery(fusion=models.Fusion.RRF),
             limit=limit,
             offset=offset,
-            query_filter=query_filter,
-            score_threshold=threshold,
-            with_vectors=with_vectors,
+            with_vector=with_vectors,
             with_payload=with_payload,
         )
 
+    @classmethod
+    def prepare_query_vector(cls, query_vector: Sequence[float]) -> Sequence[float]:
+        return query_vector
+
     @classmethod
     def _build_field_condition(cls, key: str, value: object) -> FieldCondition:
-        if isinstance(value, Iterable) and not isinstance(value, str | bytes | dict):
-            match = MatchAny(any=value)
+        # dict 代表範圍條件，例如 {'gte': 1700000000000, 'lt': 1710000000000}
+        if isinstance(value, dict):
+            if any(isinstance(bound, str) for bound in value.values()):
+                return FieldCondition(key=key, range=DatetimeRange(**value))
+            return FieldCondition(key=key, range=Range(**value))
+
+        if isinstance(value, Iterable) and not isinstance(value, str | bytes):
+            match = MatchAny(any=list(value))
         else:
             match = MatchValue(value=value)
 
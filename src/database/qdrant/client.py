@@ -1,15 +1,67 @@
+import asyncio
+import weakref
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 
+import httpx
 from qdrant_client.async_qdrant_client import AsyncQdrantClient
 
 from settings import get_settings
 
+# lifespan 建立的共用 client 依 event loop 區分，其他 loop 仍走臨時連線
+_shared_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, AsyncQdrantClient
+] = weakref.WeakKeyDictionary()
+
+
+def _get_shared_client(host: str | None) -> AsyncQdrantClient | None:
+    if host and host != get_settings().QDRANT_HOST:
+        return None
+    return _shared_clients.get(asyncio.get_running_loop())
+
+
+async def init_qdrant_client() -> AsyncQdrantClient:
+    loop = asyncio.get_running_loop()
+    if loop not in _shared_clients:
+        settings = get_settings()
+        # keep-alive 連線池，localhost 預設會關掉 keep-alive
+        _shared_clients[loop] = AsyncQdrantClient(
+            url=settings.QDRANT_HOST,
+            limits=httpx.Limits(
+                max_connections=settings.QDRANT_POOL_SIZE,
+                max_keepalive_connections=settings.QDRANT_POOL_SIZE,
+            ),
+        )
+    return _shared_clients[loop]
+
+
+async def close_qdrant_client() -> None:
+    client = _shared_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+async def check_qdrant_health() -> str:
+    try:
+        async with async_qdrant_client() as client:
+            await asyncio.wait_for(
+                client.get_collections(),
+                timeout=get_settings().HEALTH_CHECK_TIMEOUT_SECONDS,
+            )
+    except Exception as e:
+        return f'error: {e}'
+    return 'ok'
+
 
 @asynccontextmanager
 async def async_qdrant_client(
     host: str = None,
 ) -> AsyncGenerator[AsyncQdrantClient, None]:
+    shared_client = _get_shared_client(host)
+    if shared_client is not None:
+        yield shared_client
+        return
+
     client = AsyncQdrantClient(url=host or get_settings().QDRANT_HOST)
     try:
         yield client
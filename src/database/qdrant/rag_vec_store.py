@@ -1,23 +1,77 @@
-from collections.abc import Generator
+import functools
+from collections.abc import Generator, Sequence
 
-from qdrant_client.http.models import Datatype, Distance, HnswConfigDiff, VectorParams
-from qdrant_client.models import PointStruct
+from qdrant_client.models import (
+    Modifier,
+    PayloadSchemaType,
+    PointStruct,
+    SparseVectorParams,
+)
 
 from database.qdrant.base import BaseVecStore
+from database.qdrant.storage_profile import (
+    DEFAULT_STORAGE_PROFILE,
+    VectorStorageProfile,
+    get_storage_profile,
+)
+from embedding.sparse import SparseEncoder
+from settings import get_settings
+
+STORAGE_PROFILE = get_storage_profile(DEFAULT_STORAGE_PROFILE)
+# 新增 bm25 sparse vector 後改用新的 collection
+BASE_VERSION_NAME = '2026-10-17'
 
 
 class RAGVecStore(BaseVecStore):
     COLLECTION_BASE_NAME = 'rag_vector_store'
-    COLLECTION_VERSION_NAME = '2025-04-09'
-    PAYLOAD_COLUMNS = []
-    VECTOR_CONFIG = {
-        'default': VectorParams(
-            size=768,
-            distance=Distance.COSINE,
-            datatype=Datatype.FLOAT32,
-        )
+    COLLECTION_VERSION_NAME = STORAGE_PROFILE.collection_version_name(BASE_VERSION_NAME)
+    PAYLOAD_COLUMNS = [
+        'senders',
+        'start_timestamp',
+        'end_timestamp',
+        'on_date',
+        'thread_id',
+    ]
+    PAYLOAD_INDEXES = {
+        'source': PayloadSchemaType.KEYWORD,
+        'senders': PayloadSchemaType.KEYWORD,
+        'thread_id': PayloadSchemaType.KEYWORD,
+        'start_timestamp': PayloadSchemaType.INTEGER,
+        'end_timestamp': PayloadSchemaType.INTEGER,
+        'on_date': PayloadSchemaType.DATETIME,
     }
-    HNSW_CONFIG = HnswConfigDiff(m=48, ef_construct=200)
+    STORAGE_PROFILE = STORAGE_PROFILE
+    VECTOR_CONFIG = {'default': STORAGE_PROFILE.vector_params()}
+    HNSW_CONFIG = STORAGE_PROFILE.hnsw_config()
+    QUANTIZATION_CONFIG = STORAGE_PROFILE.quantization_config
+    SEARCH_PARAMS = STORAGE_PROFILE.search_params()
+    SPARSE_VECTOR_CONFIG = {'bm25': SparseVectorParams(modifier=Modifier.IDF)}
+    SPARSE_ENCODER = SparseEncoder()
+
+    @classmethod
+    def with_storage_profile(
+        cls, profile: VectorStorageProfile, collection_base_name: str | None = None
+    ) -> type['RAGVecStore']:
+        return type(
+            f'{cls.__name__}[{profile.name}]',
+            (cls,),
+            {
+                'COLLECTION_BASE_NAME': collection_base_name
+                or cls.COLLECTION_BASE_NAME,
+                'COLLECTION_VERSION_NAME': profile.collection_version_name(
+                    BASE_VERSION_NAME
+                ),
+                'STORAGE_PROFILE': profile,
+                'VECTOR_CONFIG': {'default': profile.vector_params()},
+                'HNSW_CONFIG': profile.hnsw_config(),
+                'QUANTIZATION_CONFIG': profile.quantization_config,
+                'SEARCH_PARAMS': profile.search_params(),
+            },
+        )
+
+    @classmethod
+    def prepare_query_vector(cls, query_vector: Sequence[float]) -> list[float]:
+        return cls.STORAGE_PROFILE.project(query_vector)
 
     @classmethod
     def prepare_iter_points(
@@ -27,8 +81,20 @@ class RAGVecStore(BaseVecStore):
         for chunk in chunks:
             point = PointStruct(
                 id=chunk['chunk_id'],
-                vector={'default': chunk['embedding']},
-                payload={'source': chunk['source']},
+                vector={
+                    'default': cls.STORAGE_PROFILE.project(chunk['embedding']),
+                    cls.SPARSE_VECTOR_NAME: cls.SPARSE_ENCODER.encode_document(
+                        chunk['text']
+                    ),
+                },
+                payload={
+                    'source': chunk['source'],
+                    **{
+                        column: chunk[column]
+                        for column in cls.PAYLOAD_COLUMNS
+                        if chunk.get(column) is not None
+                    },
+                },
             )
             points.append(point)
 
@@ -38,3 +104,12 @@ class RAGVecStore(BaseVecStore):
 
         if points:
             yield points
+
+
+@functools.cache
+def get_rag_vec_store(profile_name: str | None = None) -> type[RAGVecStore]:
+    # 第一次使用時才依設定決定 storage profile，設定錯誤不會讓 import 失敗
+    profile = get_storage_profile(profile_name or get_settings().VECTOR_STORAGE_PROFILE)
+    if profile.name == DEFAULT_STORAGE_PROFILE:
+        return RAGVecStore
+    return RAGVecStore.with_storage_profile(profile)
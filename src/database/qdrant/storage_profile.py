@@ -0,0 +1,128 @@
+from collections.abc import Sequence
+
+import attr
+import numpy as np
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Datatype,
+    Distance,
+    HnswConfigDiff,
+    QuantizationConfig,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+)
+
+DATATYPE_BYTES = {Datatype.FLOAT32: 4, Datatype.FLOAT16: 2, Datatype.UINT8: 1}
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class VectorStorageProfile:
+    name: str
+    size: int = 768
+    datatype: Datatype = Datatype.FLOAT32
+    quantization_config: QuantizationConfig | None = None
+    oversampling: float = 2.0
+    hnsw_m: int = 48
+    hnsw_ef_construct: int = 200
+
+    def collection_version_name(self, base_version_name: str) -> str:
+        if self.name == DEFAULT_STORAGE_PROFILE:
+            return base_version_name
+        return f'{base_version_name}-{self.name}'
+
+    def vector_params(self) -> VectorParams:
+        return VectorParams(
+            size=self.size,
+            distance=Distance.COSINE,
+            datatype=self.datatype,
+            # 有量化時原始向量放在磁碟，只拿來 rescore
+            on_disk=self.quantization_config is not None,
+        )
+
+    def hnsw_config(self) -> HnswConfigDiff:
+        return HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def search_params(self) -> SearchParams | None:
+        if self.quantization_config is None:
+            return None
+        return SearchParams(
+            quantization=QuantizationSearchParams(
+                rescore=True, oversampling=self.oversampling
+            )
+        )
+
+    def project(self, vector: Sequence[float]) -> list[float]:
+        vector = np.asarray(vector, dtype=np.float32)
+        if len(vector) > self.size:
+            vector = vector[: self.size]
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector = vector / norm
+        return vector.tolist()
+
+    def estimate_bytes_per_point(self) -> dict[str, int]:
+        original = self.size * DATATYPE_BYTES[self.datatype]
+        if isinstance(self.quantization_config, ScalarQuantization):
+            quantized = self.size
+        elif isinstance(self.quantization_config, BinaryQuantization):
+            quantized = (self.size + 7) // 8
+        else:
+            quantized = 0
+        # HNSW 第 0 層每個點最多 2m 條 uint32 連結
+        graph = self.hnsw_m * 2 * 4
+        return {
+            'ram': (quantized or original) + graph,
+            'disk': original if quantized else 0,
+        }
+
+
+DEFAULT_STORAGE_PROFILE = 'float32'
+VECTOR_STORAGE_PROFILES = {
+    profile.name: profile
+    for profile in [
+        VectorStorageProfile(name='float32'),
+        VectorStorageProfile(name='float16', datatype=Datatype.FLOAT16),
+        VectorStorageProfile(
+            name='float16-int8',
+            datatype=Datatype.FLOAT16,
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8, quantile=0.99, always_ram=True
+                )
+            ),
+        ),
+        VectorStorageProfile(
+            name='float16-binary',
+            datatype=Datatype.FLOAT16,
+            quantization_config=BinaryQuantization(
+                binary=BinaryQuantizationConfig(always_ram=True)
+            ),
+            oversampling=3.0,
+        ),
+        VectorStorageProfile(
+            name='float16-d512-int8',
+            size=512,
+            datatype=Datatype.FLOAT16,
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8, quantile=0.99, always_ram=True
+                )
+            ),
+            hnsw_m=32,
+        ),
+    ]
+}
+
+
+def get_storage_profile(name: str) -> VectorStorageProfile:
+    if name not in VECTOR_STORAGE_PROFILES:
+        raise ValueError(
+            f'Unknown vector storage profile {name}, '
+            f'expected one of {list(VECTOR_STORAGE_PROFILES)}'
+        )
+    return VECTOR_STORAGE_PROFILES[name]
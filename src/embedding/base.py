@@ -7,3 +7,11 @@ class EncoderProtocol(Protocol):
     def encode(
         self, sentences: list[str], show_progress_bar: bool = False
     ) -> np.ndarray: ...
+
+    async def aencode(
+        self, sentences: list[str], show_progress_bar: bool = False, bulk: bool = False
+    ) -> np.ndarray: ...
+
+    def close(self) -> None: ...
+
+    def stats(self) -> dict: ...
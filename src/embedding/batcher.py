@@ -0,0 +1,96 @@
+import asyncio
+
+import attr
+import numpy as np
+
+from embedding.base import EncoderProtocol
+
+
+@attr.s(auto_attribs=True)
+class MicroBatchEncoder:
+    encoder: EncoderProtocol
+    max_wait_ms: float = 5.0
+    max_batch_size: int = 32
+
+    def __attrs_post_init__(self) -> None:
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.Handle | None = None
+        self._in_flight: set[asyncio.Task] = set()
+        self.batch_count = 0
+        self.query_count = 0
+
+    def encode(
+        self, sentences: list[str], show_progress_bar: bool = False
+    ) -> np.ndarray:
+        return self.encoder.encode(
+            sentences=sentences, show_progress_bar=show_progress_bar
+        )
+
+    async def aencode(
+        self, sentences: list[str], show_progress_bar: bool = False, bulk: bool = False
+    ) -> np.ndarray:
+        if len(sentences) != 1 or bulk:
+            return await self.encoder.aencode(
+                sentences=sentences, show_progress_bar=show_progress_bar, bulk=bulk
+            )
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((sentences[0], future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            # encoder 閒置時只等到下一輪 loop，忙碌時才累積到 max_wait_ms
+            self._flush_handle = (
+                loop.call_later(self.max_wait_ms / 1000, self._flush)
+                if self._in_flight
+                else loop.call_soon(self._flush)
+            )
+
+        return (await future)[np.newaxis, :]
+
+    def close(self) -> None:
+        self.encoder.close()
+
+    def stats(self) -> dict:
+        return {
+            **self.encoder.stats(),
+            'micro_batch': {
+                'batches': self.batch_count,
+                'queries': self.query_count,
+                'avg_batch_size': (
+                    self.query_count / self.batch_count if self.batch_count else 0.0
+                ),
+            },
+        }
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self.batch_count += 1
+        self.query_count += len(batch)
+        task = asyncio.create_task(self._encode_batch(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _encode_batch(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        try:
+            embeddings = await self.encoder.aencode(
+                sentences=[sentence for sentence, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings, strict=True):
+            if not future.done():
+                future.set_result(embedding)
@@ -0,0 +1,21 @@
+def build_token_budget_batches(
+    lengths: list[int], max_tokens: int, max_batch_size: int
+) -> list[list[int]]:
+    # 由長到短排序，batch 的 padding 成本 = 第一筆長度 * 筆數
+    order = sorted(range(len(lengths)), key=lambda idx: lengths[idx], reverse=True)
+
+    batches = []
+    batch = []
+    for idx in order:
+        if batch and (
+            len(batch) >= max_batch_size
+            or lengths[batch[0]] * (len(batch) + 1) > max_tokens
+        ):
+            batches.append(batch)
+            batch = []
+        batch.append(idx)
+
+    if batch:
+        batches.append(batch)
+
+    return batches
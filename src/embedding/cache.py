@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import attr
+import numpy as np
+
+from embedding.base import EncoderProtocol
+
+SQLITE_MAX_VARIABLES = 500
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize('NFKC', text).strip()
+
+
+def generate_embedding_key(namespace: str, text: str) -> str:
+    base = f'{namespace}\0{normalize_text(text)}'
+    return hashlib.sha256(base.encode()).hexdigest()
+
+
+@attr.s(auto_attribs=True)
+class EmbeddingCache:
+    path: str
+    memory_size: int = 20000
+
+    def __attrs_post_init__(self) -> None:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)'
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            for start in range(0, len(missing), SQLITE_MAX_VARIABLES):
+                batch = missing[start : start + SQLITE_MAX_VARIABLES]
+                rows = self._conn.execute(
+                    'SELECT key, vector FROM embeddings '
+                    f'WHERE key IN ({",".join("?" * len(batch))})',
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(key, found[key])
+
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        rows = []
+        with self._lock:
+            for key, vector in items.items():
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes()))
+
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)', rows
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+
+@attr.s(auto_attribs=True)
+class CachedEncoder:
+    encoder: EncoderProtocol
+    cache: EmbeddingCache
+    namespace: str
+
+    def __attrs_post_init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def encode(
+        self, sentences: list[str], show_progress_bar: bool = False
+    ) -> np.ndarray:
+        keys = [generate_embedding_key(self.namespace, s) for s in sentences]
+        cached = self.cache.get_many(keys)
+        missing = self._collect_missing(sentences, keys, cached)
+        if missing:
+            embeddings = self.encoder.encode(
+                sentences=list(missing.values()), show_progress_bar=show_progress_bar
+            )
+            computed = dict(zip(missing, embeddings, strict=True))
+            self.cache.put_many(computed)
+            cached.update(computed)
+
+        return self._assemble(keys, cached)
+
+    async def aencode(
+        self, sentences: list[str], show_progress_bar: bool = False, bulk: bool = False
+    ) -> np.ndarray:
+        keys = [generate_embedding_key(self.namespace, s) for s in sentences]
+        cached = await asyncio.to_thread(self.cache.get_many, keys)
+        missing = self._collect_missing(sentences, keys, cached)
+        if missing:
+            embeddings = await self.encoder.aencode(
+                sentences=list(missing.values()),
+                show_progress_bar=show_progress_bar,
+                bulk=bulk,
+            )
+            computed = dict(zip(missing, embeddings, strict=True))
+            await asyncio.to_thread(self.cache.put_many, computed)
+            cached.update(computed)
+
+        return self._assemble(keys, cached)
+
+    def close(self) -> None:
+        self.encoder.close()
+        self.cache.close()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            **self.encoder.stats(),
+            'cache': {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'memory_entries': len(self.cache),
+            },
+        }
+
+    def _collect_missing(
+        self, sentences: list[str], keys: list[str], cached: dict[str, np.ndarray]
+    ) -> dict[str, str]:
+        missing = {}
+        for sentence, key in zip(sentences, keys, strict=True):
+            if key in cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing.setdefault(key, sentence)
+        return missing
+
+    @staticmethod
+    def _assemble(keys: list[str], vectors: dict[str, np.ndarray]) -> np.ndarray:
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([np.asarray(vectors[key], dtype=np.float32) for key in keys])
@@ -1,39 +1,170 @@
+import importlib.util
+from typing import TYPE_CHECKING
+
 import attr
 import numpy as np
-import torch
-from sentence_transformers import SentenceTransformer
+from tqdm import tqdm
 
+from embedding.bucketing import build_token_budget_batches
+from embedding.executor import InferenceExecutor
 from settings import get_settings
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+ENCODER_BACKENDS = ('torch', 'torch-int8', 'onnx')
+# backend 需要的額外套件，對應 pyproject.toml 的 extras
+BACKEND_REQUIREMENTS = {'onnx': ('optimum', 'onnxruntime')}
+
+
+def check_backend(backend: str) -> None:
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(
+            f'Unknown encoder backend {backend}, expected one of {ENCODER_BACKENDS}'
+        )
+
+    missing = [
+        module
+        for module in BACKEND_REQUIREMENTS.get(backend, ())
+        if importlib.util.find_spec(module) is None
+    ]
+    if missing:
+        raise ImportError(
+            f'Encoder backend {backend} requires {", ".join(missing)}, '
+            f'install it with `poetry install --extras {backend}`'
+        )
+
 
 @attr.s(auto_attribs=True)
 class RandomEncoder:
     embedding_dim: int = 768
 
     def encode(
-        self, sentences: list[str], show_progress_bar: bool = False
+        self,
+        sentences: list[str],
+        show_progress_bar: bool = False,
+        batch_size: int = 32,
     ) -> np.ndarray:
         return np.random.rand(len(sentences), self.embedding_dim)
 
+    async def aencode(
+        self, sentences: list[str], show_progress_bar: bool = False, bulk: bool = False
+    ) -> np.ndarray:
+        return self.encode(sentences=sentences, show_progress_bar=show_progress_bar)
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
 
 @attr.s(auto_attribs=True)
 class Encoder:
     model_name: str = 'jinaai/jina-embeddings-v2-base-zh'
     max_seq_length: int = 1024
+    max_tokens_per_batch: int = 16384
+    max_batch_size: int = 128
+    backend: str = 'torch'
 
     def __attrs_post_init__(self) -> None:
-        if get_settings().ENVIRONMENT == 'production':
-            self.model = SentenceTransformer(self.model_name, trust_remote_code=True)
-            self.model.max_seq_length = self.max_seq_length
-            device = 'mps' if torch.backends.mps.is_available() else 'cpu'
-            self.model.to(torch.device(device))
+        check_backend(self.backend)
+
+        settings = get_settings()
+        self.executor = InferenceExecutor(
+            max_workers=settings.ENCODER_MAX_WORKERS,
+            max_queue_size=settings.ENCODER_MAX_QUEUE_SIZE,
+        )
 
+        if settings.ENVIRONMENT == 'production':
+            self.model = self._load_model()
         else:
             self.model = RandomEncoder(embedding_dim=768)
 
+    def _load_model(self) -> 'SentenceTransformer':
+        # torch / sentence_transformers 延後到載入模型時才 import，避免拖慢啟動
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == 'onnx':
+            # 使用 model repo 內的 onnx/model.onnx
+            model = SentenceTransformer(
+                self.model_name, trust_remote_code=True, backend='onnx', device='cpu'
+            )
+        else:
+            model = SentenceTransformer(self.model_name, trust_remote_code=True)
+        model.max_seq_length = self.max_seq_length
+
+        if self.backend == 'torch-int8':
+            # dynamic quantization 只支援 CPU
+            model.to(torch.device('cpu'))
+            torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+        elif self.backend == 'torch':
+            device = 'mps' if torch.backends.mps.is_available() else 'cpu'
+            model.to(torch.device(device))
+
+        return model
+
+    @property
+    def cache_namespace(self) -> str:
+        backend = 'random' if isinstance(self.model, RandomEncoder) else self.backend
+        return f'{self.model_name}:{self.max_seq_length}:{backend}'
+
+    def token_lengths(self, sentences: list[str]) -> list[int]:
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is None:
+            return [min(len(sentence), self.max_seq_length) for sentence in sentences]
+
+        input_ids = tokenizer(
+            sentences,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )['input_ids']
+        return [len(ids) for ids in input_ids]
+
     def encode(
         self, sentences: list[str], show_progress_bar: bool = False
     ) -> np.ndarray:
-        return self.model.encode(
-            sentences=sentences, show_progress_bar=show_progress_bar
+        batches = build_token_budget_batches(
+            self.token_lengths(sentences),
+            max_tokens=self.max_tokens_per_batch,
+            max_batch_size=self.max_batch_size,
+        )
+
+        embeddings = None
+        for batch in tqdm(batches, disable=not show_progress_bar):
+            batch_embeddings = self.model.encode(
+                sentences=[sentences[idx] for idx in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+            )
+            if embeddings is None:
+                embeddings = np.empty(
+                    (len(sentences), batch_embeddings.shape[1]),
+                    dtype=batch_embeddings.dtype,
+                )
+            embeddings[batch] = batch_embeddings
+
+        return embeddings if embeddings is not None else np.empty((0, 0))
+
+    async def aencode(
+        self, sentences: list[str], show_progress_bar: bool = False, bulk: bool = False
+    ) -> np.ndarray:
+        run = self.executor.run_bulk if bulk else self.executor.run
+        return await run(
+            self.encode, sentences=sentences, show_progress_bar=show_progress_bar
         )
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def stats(self) -> dict:
+        return {
+            'model_name': self.model_name,
+            'max_seq_length': self.max_seq_length,
+            'backend': self.backend,
+        }
@@ -0,0 +1,56 @@
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import attr
+
+
+class InferenceQueueFullError(RuntimeError):
+    pass
+
+
+@attr.s(auto_attribs=True)
+class InferenceExecutor:
+    max_workers: int = 1
+    max_queue_size: int = 16
+
+    def __attrs_post_init__(self) -> None:
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='inference'
+        )
+        # 同時最多 max_workers 個在跑、max_queue_size 個在排隊，超過的呼叫直接拒絕
+        self._slots = asyncio.Semaphore(self.max_workers + self.max_queue_size)
+        # 批次工作另外計算，最多佔用 max_workers 個位置，互動請求最多只需等一輪
+        self._bulk_slots = asyncio.Semaphore(self.max_workers)
+
+    async def run(
+        self, func: Callable[..., Any], *args: object, **kwargs: object
+    ) -> object:
+        if self._slots.locked():
+            raise InferenceQueueFullError(
+                f'Inference queue is full ({self.max_workers} running, '
+                f'{self.max_queue_size} queued)'
+            )
+
+        async with self._slots:
+            return await self._submit(func, *args, **kwargs)
+
+    async def run_bulk(
+        self, func: Callable[..., Any], *args: object, **kwargs: object
+    ) -> object:
+        # ingest 等批次工作不會被拒絕，排隊等到有空位為止
+        async with self._bulk_slots:
+            return await self._submit(func, *args, **kwargs)
+
+    async def _submit(
+        self, func: Callable[..., Any], *args: object, **kwargs: object
+    ) -> object:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._pool, functools.partial(func, *args, **kwargs)
+        )
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
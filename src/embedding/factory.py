@@ -0,0 +1,45 @@
+from embedding.base import EncoderProtocol
+from embedding.batcher import MicroBatchEncoder
+from embedding.cache import CachedEncoder, EmbeddingCache
+from embedding.encoder import Encoder
+from embedding.remote import RemoteEncoder
+from settings import get_settings
+
+
+def build_encoder() -> EncoderProtocol:
+    settings = get_settings()
+    if settings.ENCODER_MODE == 'remote':
+        return RemoteEncoder(
+            socket_path=settings.ENCODER_SOCKET_PATH,
+            pool_size=settings.ENCODER_REMOTE_POOL_SIZE,
+            timeout=settings.ENCODER_REMOTE_TIMEOUT_SECONDS,
+        )
+    if settings.ENCODER_MODE != 'local':
+        raise ValueError(f'Unknown encoder mode {settings.ENCODER_MODE}')
+
+    return build_local_encoder()
+
+
+def build_local_encoder() -> EncoderProtocol:
+    settings = get_settings()
+    encoder = Encoder(
+        backend=settings.ENCODER_BACKEND,
+        max_tokens_per_batch=settings.ENCODER_MAX_TOKENS_PER_BATCH,
+        max_batch_size=settings.ENCODER_MAX_SENTENCES_PER_BATCH,
+    )
+
+    if settings.EMBEDDING_CACHE_ENABLED:
+        encoder = CachedEncoder(
+            encoder=encoder,
+            cache=EmbeddingCache(
+                path=settings.EMBEDDING_CACHE_PATH,
+                memory_size=settings.EMBEDDING_CACHE_MEMORY_SIZE,
+            ),
+            namespace=encoder.cache_namespace,
+        )
+
+    return MicroBatchEncoder(
+        encoder=encoder,
+        max_wait_ms=settings.ENCODER_BATCH_MAX_WAIT_MS,
+        max_batch_size=settings.ENCODER_BATCH_MAX_SIZE,
+    )
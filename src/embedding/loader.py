@@ -0,0 +1,49 @@
+import asyncio
+from collections.abc import Callable
+
+import attr
+
+from embedding.base import EncoderProtocol
+
+
+class EncoderNotReadyError(RuntimeError):
+    pass
+
+
+@attr.s(auto_attribs=True)
+class EncoderLoader:
+    factory: Callable[[], EncoderProtocol]
+
+    def __attrs_post_init__(self) -> None:
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(asyncio.to_thread(self.factory))
+
+    @property
+    def status(self) -> str:
+        if self._task is None:
+            return 'not_started'
+        if not self._task.done():
+            return 'loading'
+        if self._task.cancelled() or self._task.exception() is not None:
+            return 'failed'
+        return 'ready'
+
+    async def get(self, timeout: float | None = None) -> EncoderProtocol:
+        if self._task is None:
+            raise EncoderNotReadyError('Encoder loading has not been started')
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except TimeoutError as e:
+            raise EncoderNotReadyError('Encoder is still loading') from e
+        except Exception as e:
+            raise EncoderNotReadyError(f'Encoder failed to load: {e}') from e
+
+    def close(self) -> None:
+        if self.status == 'ready':
+            self._task.result().close()
+        elif self._task is not None:
+            self._task.cancel()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import socket
+import struct
+
+import attr
+import numpy as np
+
+from embedding.executor import InferenceQueueFullError
+
+# frame = 4 bytes big-endian 長度 + body
+# request body: JSON {'op': 'encode' | 'stats' | 'ping', 'sentences': [...],
+#   'bulk': bool}
+# response body: 1 byte status + payload
+#   STATUS_EMBEDDINGS: rows, dim (uint32 big-endian) + rows * dim little-endian float32
+#   STATUS_JSON / STATUS_ERROR: UTF-8 JSON / 錯誤訊息
+#   STATUS_BUSY: 推論佇列已滿的錯誤訊息
+FRAME_HEADER = struct.Struct('!I')
+EMBEDDINGS_HEADER = struct.Struct('!II')
+STATUS_EMBEDDINGS = 0
+STATUS_JSON = 1
+STATUS_ERROR = 2
+STATUS_BUSY = 3
+
+
+class RemoteEncoderError(RuntimeError):
+    pass
+
+
+def pack_frame(body: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return await reader.readexactly(length)
+
+
+def pack_request(
+    op: str, sentences: list[str] | None = None, bulk: bool = False
+) -> bytes:
+    body = {'op': op, 'sentences': sentences or [], 'bulk': bulk}
+    return pack_frame(json.dumps(body, ensure_ascii=False).encode())
+
+
+def pack_embeddings(embeddings: np.ndarray) -> bytes:
+    embeddings = np.ascontiguousarray(embeddings, dtype='<f4')
+    rows, dim = embeddings.shape if embeddings.size else (0, 0)
+    return pack_frame(
+        bytes([STATUS_EMBEDDINGS])
+        + EMBEDDINGS_HEADER.pack(rows, dim)
+        + embeddings.tobytes()
+    )
+
+
+def pack_json(payload: dict) -> bytes:
+    return pack_frame(bytes([STATUS_JSON]) + json.dumps(payload).encode())
+
+
+def pack_error(message: str, status: int = STATUS_ERROR) -> bytes:
+    return pack_frame(bytes([status]) + message.encode())
+
+
+def unpack_response(body: bytes) -> np.ndarray | dict:
+    status, payload = body[0], memoryview(body)[1:]
+    if status == STATUS_EMBEDDINGS:
+        rows, dim = EMBEDDINGS_HEADER.unpack_from(payload)
+        # 直接在收到的 buffer 上建立 view，不額外複製
+        return np.frombuffer(
+            payload, dtype='<f4', offset=EMBEDDINGS_HEADER.size, count=rows * dim
+        ).reshape(rows, dim)
+    if status == STATUS_JSON:
+        return json.loads(bytes(payload))
+    if status == STATUS_BUSY:
+        raise InferenceQueueFullError(bytes(payload).decode())
+    raise RemoteEncoderError(bytes(payload).decode())
+
+
+@attr.s(auto_attribs=True)
+class RemoteEncoder:
+    socket_path: str
+    pool_size: int = 8
+    timeout: float = 120.0
+
+    def __attrs_post_init__(self) -> None:
+        self._slots = asyncio.Semaphore(self.pool_size)
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    def encode(
+        self, sentences: list[str], show_progress_bar: bool = False
+    ) -> np.ndarray:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(pack_request('encode', sentences))
+            with sock.makefile('rb') as stream:
+                (length,) = FRAME_HEADER.unpack(stream.read(FRAME_HEADER.size))
+                return unpack_response(stream.read(length))
+
+    async def aencode(
+        self, sentences: list[str], show_progress_bar: bool = False, bulk: bool = False
+    ) -> np.ndarray:
+        return await self._request('encode', sentences, bulk=bulk)
+
+    async def ping(self) -> dict:
+        return await self._request('ping')
+
+    def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+    def stats(self) -> dict:
+        return {'remote': {'socket_path': self.socket_path}}
+
+    async def remote_stats(self) -> dict:
+        return await self._request('stats')
+
+    async def _request(
+        self, op: str, sentences: list[str] | None = None, bulk: bool = False
+    ) -> np.ndarray | dict:
+        async with self._slots:
+            if self._idle:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+
+            try:
+                writer.write(pack_request(op, sentences, bulk=bulk))
+                await writer.drain()
+                body = await asyncio.wait_for(read_frame(reader), timeout=self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+
+            self._idle.append((reader, writer))
+            return unpack_response(body)
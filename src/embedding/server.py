@@ -0,0 +1,75 @@
+import asyncio
+import json
+import logging
+from pathlib import Path
+
+import attr
+
+from embedding.executor import InferenceQueueFullError
+from embedding.loader import EncoderLoader
+from embedding.remote import (
+    STATUS_BUSY,
+    pack_embeddings,
+    pack_error,
+    pack_json,
+    read_frame,
+)
+
+
+@attr.s(auto_attribs=True)
+class EmbeddingServer:
+    loader: EncoderLoader
+    socket_path: str
+
+    async def serve_forever(self) -> None:
+        Path(self.socket_path).unlink(missing_ok=True)
+        self.loader.start()
+        server = await asyncio.start_unix_server(
+            self._handle_connection, path=self.socket_path
+        )
+        logging.info('Embedding server listening on %s', self.socket_path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.loader.close()
+            Path(self.socket_path).unlink(missing_ok=True)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    request = json.loads(await read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break
+
+                writer.write(await self._handle_request(request))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _handle_request(self, request: dict) -> bytes:
+        op = request.get('op')
+        try:
+            if op == 'ping':
+                return pack_json({'status': self.loader.status})
+
+            encoder = await self.loader.get()
+            if op == 'encode':
+                return pack_embeddings(
+                    await encoder.aencode(
+                        sentences=request['sentences'],
+                        bulk=request.get('bulk', False),
+                    )
+                )
+            if op == 'stats':
+                return pack_json(encoder.stats())
+            return pack_error(f'Unknown op {op}')
+        except InferenceQueueFullError as e:
+            # 只拒絕這個請求，由呼叫端決定回 503 或稍後重試
+            return pack_error(str(e), status=STATUS_BUSY)
+        except Exception as e:
+            logging.exception('Embedding server failed to handle %s', op)
+            return pack_error(str(e))
@@ -0,0 +1,61 @@
+import re
+import unicodedata
+import zlib
+from collections import Counter
+
+import attr
+from qdrant_client.http.models import SparseVector
+
+CJK_RANGES = r'぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+# 英數字詞（含 ab-123、v1.2 這類代碼）與連續的 CJK 字元
+TOKEN_PATTERN = re.compile(rf'[0-9a-z]+(?:[._\-/:][0-9a-z]+)*|[{CJK_RANGES}]+')
+CJK_PATTERN = re.compile(rf'[{CJK_RANGES}]')
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(unicodedata.normalize('NFKC', text).lower()):
+        token = match.group()
+        if not CJK_PATTERN.match(token):
+            tokens.append(token)
+            continue
+
+        # CJK 沒有空白分詞，用 unigram + bigram 近似詞彙比對
+        tokens += list(token)
+        tokens += [token[idx : idx + 2] for idx in range(len(token) - 1)]
+    return tokens
+
+
+def token_index(token: str) -> int:
+    return zlib.crc32(token.encode())
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class SparseEncoder:
+    k1: float = 1.2
+    b: float = 0.75
+    avg_doc_tokens: float = 128.0
+
+    def encode_document(self, text: str) -> SparseVector:
+        # BM25 的 tf 飽和與長度正規化在寫入時算好，IDF 交給 Qdrant 的 Modifier.IDF
+        counts = Counter(tokenize(text))
+        doc_tokens = sum(counts.values())
+        norm = self.k1 * (1 - self.b + self.b * doc_tokens / self.avg_doc_tokens)
+        return self._to_sparse_vector(
+            {
+                token: count * (self.k1 + 1) / (count + norm)
+                for token, count in counts.items()
+            }
+        )
+
+    def encode_query(self, text: str) -> SparseVector:
+        return self._to_sparse_vector(dict.fromkeys(tokenize(text), 1.0))
+
+    def _to_sparse_vector(self, weights: dict[str, float]) -> SparseVector:
+        values_by_index = Counter()
+        for token, weight in weights.items():
+            values_by_index[token_index(token)] += weight
+        indices = sorted(values_by_index)
+        return SparseVector(
+            indices=indices, values=[values_by_index[idx] for idx in indices]
+        )
@@ -1,6 +1,8 @@
 import uvicorn
 
 from api.app import app  # noqa: F401
+from settings import get_settings
 
 if __name__ == '__main__':
-    uvicorn.run('api.app:app', host='0.0.0.0', reload=True)
+    workers = get_settings().API_WORKERS
+    uvicorn.run('api.app:app', host='0.0.0.0', reload=workers == 1, workers=workers)
@@ -0,0 +1,15 @@
+import asyncio
+import logging
+
+from embedding.factory import build_local_encoder
+from embedding.loader import EncoderLoader
+from embedding.server import EmbeddingServer
+from settings import get_settings
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    server = EmbeddingServer(
+        loader=EncoderLoader(factory=build_local_encoder),
+        socket_path=get_settings().ENCODER_SOCKET_PATH,
+    )
+    asyncio.run(server.serve_forever())
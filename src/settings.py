@@ -1,3 +1,5 @@
+import functools
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -9,11 +11,88 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
+    API_WORKERS: int = 1
+
+    # database connection pools
+    QDRANT_POOL_SIZE: int = 16
+    MONGODB_POOL_SIZE: int = 20
+    MONGODB_MIN_POOL_SIZE: int = 0
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+
+    # llm clients
+    LLM_CLIENT_CACHE_SIZE: int = 8
+    LLM_POOL_SIZE: int = 10
+    LLM_KEEPALIVE_SECONDS: float = 60.0
+    LLM_TIMEOUT_SECONDS: float = 600.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_HTTP2: bool = True
+
+    # ingest
+    INGEST_MAX_IN_FLIGHT_WRITES: int = 4
+    INGEST_PREPROCESS_WORKERS: int = 0
+    INGEST_CHUNKING_MODE: str = 'window'
+    INGEST_SPAN_SIZE: int = 4
+    INGEST_UPLOAD_GROUP_DOCUMENTS: int = 50
+    INGEST_JOB_MESSAGE_CONCURRENCY: int = 1
+    INGEST_JOB_GMAIL_CONCURRENCY: int = 1
+    INGEST_JOB_HISTORY_SIZE: int = 100
+    QDRANT_UPSERT_WAIT: bool = True
+
+    # vector storage
+    VECTOR_STORAGE_PROFILE: str = 'float32'
+    QDRANT_SEARCH_HNSW_EF: int | None = None
+    QDRANT_SEARCH_EXACT: bool = False
+    QDRANT_SEARCH_RESCORE: bool = True
+    QDRANT_SEARCH_OVERSAMPLING: float | None = None
+
+    # retrieval
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_PREFETCH_MULTIPLIER: int = 4
+    RETRIEVAL_EXPAND_NEIGHBORS: int = 0
+    RETRIEVAL_MERGE_SPANS: bool = True
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_SIZE: int = 1024
+    RETRIEVAL_CACHE_TTL_SECONDS: float = 600.0
+    RETRIEVAL_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    RERANKER_ENABLED: bool = True
+    RERANKER_MODEL_NAME: str = 'cross-encoder/mmarco-mMiniLMv2-L12-H384-v1'
+    RERANKER_MAX_LENGTH: int = 256
+    RERANK_CANDIDATES: int = 20
+    RERANK_TIMEOUT_SECONDS: float = 2.0
+    RERANK_TOP_K: int = 5
+    RERANK_CONTEXT_TOKEN_BUDGET: int = 1500
+
+    # prompt
+    PROMPT_HOT_RELOAD: bool = False
+    PROMPT_TOKENIZER_NAME: str = 'jinaai/jina-embeddings-v2-base-zh'
+    PROMPT_MAX_TOKENS: int = 6000
+    PROMPT_RECENT_TURNS: int = 4
+    PROMPT_MAX_TURN_TOKENS: int = 200
+    PROMPT_DEDUP_THRESHOLD: float = 0.6
+
+    # embedding inference
+    ENCODER_MODE: str = 'local'
+    ENCODER_SOCKET_PATH: str = '/tmp/mydrift-encoder.sock'
+    ENCODER_REMOTE_POOL_SIZE: int = 8
+    ENCODER_REMOTE_TIMEOUT_SECONDS: float = 120.0
+    ENCODER_BACKEND: str = 'torch'
+    ENCODER_LOAD_WAIT_SECONDS: float = 30.0
+    ENCODER_MAX_WORKERS: int = 1
+    ENCODER_MAX_QUEUE_SIZE: int = 16
+    ENCODER_MAX_TOKENS_PER_BATCH: int = 16384
+    ENCODER_MAX_SENTENCES_PER_BATCH: int = 128
+    ENCODER_BATCH_MAX_WAIT_MS: float = 5.0
+    ENCODER_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = 'data/embedding_cache/embeddings.sqlite3'
+    EMBEDDING_CACHE_MEMORY_SIZE: int = 20000
 
     model_config = SettingsConfigDict(
         env_file=('.env', '.env.dev'), env_file_encoding='utf-8', case_sensitive=True
     )
 
 
+@functools.cache
 def get_settings() -> BaseSettings:
+    # 查詢路徑每次都會讀設定，只在第一次解析環境變數與 .env
     return Settings()
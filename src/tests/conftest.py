@@ -1,4 +1,4 @@
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Generator
 
 import pytest
 import pytest_asyncio
@@ -7,9 +7,18 @@ from database.mongodb.base import init_mongodb_cols
 from database.qdrant.base import init_qdrant_cols
 from database.qdrant.client import async_qdrant_client
 from database.qdrant.rag_vec_store import RAGVecStore
+from settings import get_settings
 from utils import generate_message_chunk_id
 
 
+@pytest.fixture(autouse=True)
+def clear_settings_cache() -> Generator:
+    # 測試會用 monkeypatch.setenv 改設定，前後都要重新讀取
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
+
+
 @pytest_asyncio.fixture(scope='class')
 async def setup_qdrant_env() -> AsyncGenerator:
     await init_qdrant_cols()
@@ -32,6 +41,7 @@ async def upsert_mock_chunks() -> list[dict]:
                 start_ts=0, end_ts=100, senders=['MOCK_SENDER_1', 'MOCK_SENDER_2']
             ),
             'embedding': [0.1] * 768,
+            'text': 'MOCK_SENDER_1: 訂單編號 AB-1234 明天出貨',
             'source': 'message',
         }
     ]
@@ -0,0 +1,39 @@
+from collections.abc import AsyncGenerator
+
+import pytest
+from fastapi import HTTPException
+
+from api.utils import safe_stream_wrapper, start_stream
+from embedding.executor import InferenceQueueFullError
+
+
+class TestStartStream:
+    @pytest.mark.asyncio
+    async def test_queue_full_before_first_chunk_is_503(self) -> None:
+        @safe_stream_wrapper
+        async def busy() -> AsyncGenerator[str, None]:
+            raise InferenceQueueFullError('queue is full')
+            yield 'unreachable'
+
+        with pytest.raises(HTTPException) as exc_info:
+            await start_stream(busy())
+        assert exc_info.value.status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_stream_keeps_all_chunks(self) -> None:
+        @safe_stream_wrapper
+        async def tokens() -> AsyncGenerator[str, None]:
+            for token in ['a', 'b', 'c']:
+                yield token
+
+        @safe_stream_wrapper
+        async def empty() -> AsyncGenerator[str, None]:
+            return
+            yield
+
+        assert [token async for token in await start_stream(tokens())] == [
+            'a',
+            'b',
+            'c',
+        ]
+        assert [token async for token in await start_stream(empty())] == []
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from database.mongodb.client import (
+    async_mongodb_client,
+    close_mongodb_client,
+    init_mongodb_client,
+)
+from database.qdrant.client import (
+    async_qdrant_client,
+    close_qdrant_client,
+    init_qdrant_client,
+)
+
+
+class TestSharedClients:
+    @pytest.mark.asyncio
+    async def test_context_managers_borrow_shared_clients(self) -> None:
+        qdrant_client = await init_qdrant_client()
+        mongodb_client = await init_mongodb_client()
+        try:
+            assert await init_qdrant_client() is qdrant_client
+            async with async_qdrant_client() as client:
+                assert client is qdrant_client
+            async with async_mongodb_client() as client:
+                assert client is mongodb_client
+            # 借用結束後共用 client 不會被關閉
+            async with async_mongodb_client() as client:
+                assert client is mongodb_client
+            async with async_mongodb_client(host='mongodb://other:27017') as client:
+                assert client is not mongodb_client
+        finally:
+            await close_qdrant_client()
+            await close_mongodb_client()
+
+        async with async_mongodb_client() as client:
+            assert client is not mongodb_client
+
+    def test_shared_clients_are_per_event_loop(self) -> None:
+        async def init_client() -> AsyncIOMotorClient:
+            client = await init_mongodb_client()
+            await close_mongodb_client()
+            return client
+
+        first_loop_client = asyncio.run(init_client())
+        second_loop_client = asyncio.run(init_client())
+
+        assert first_loop_client is not second_loop_client
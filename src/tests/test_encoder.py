@@ -0,0 +1,355 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import attr
+import numpy as np
+import pytest
+
+from embedding.batcher import MicroBatchEncoder
+from embedding.bucketing import build_token_budget_batches
+from embedding.cache import CachedEncoder, EmbeddingCache
+from embedding.encoder import ENCODER_BACKENDS, Encoder, RandomEncoder
+from embedding.executor import InferenceExecutor, InferenceQueueFullError
+from embedding.loader import EncoderLoader, EncoderNotReadyError
+from embedding.remote import RemoteEncoder, RemoteEncoderError
+from embedding.server import EmbeddingServer
+
+
+@attr.s(auto_attribs=True)
+class CountingEncoder(RandomEncoder):
+    def __attrs_post_init__(self) -> None:
+        self.batch_sizes = []
+
+    def encode(
+        self,
+        sentences: list[str],
+        show_progress_bar: bool = False,
+        batch_size: int = 32,
+    ) -> np.ndarray:
+        self.batch_sizes.append(len(sentences))
+        return np.array(
+            [[float(len(sentence))] * self.embedding_dim for sentence in sentences]
+        )
+
+
+class TestInferenceExecutor:
+    @pytest.mark.asyncio
+    async def test_run_off_event_loop(self) -> None:
+        executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+        loop_thread = threading.get_ident()
+        try:
+            worker_thread = await executor.run(threading.get_ident)
+        finally:
+            executor.shutdown()
+        assert worker_thread != loop_thread
+
+    @pytest.mark.asyncio
+    async def test_bounded_concurrency(self) -> None:
+        executor = InferenceExecutor(max_workers=2, max_queue_size=0)
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work() -> None:
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.01)
+            with lock:
+                running -= 1
+
+        try:
+            results = await asyncio.gather(
+                *[executor.run(work) for _ in range(8)], return_exceptions=True
+            )
+        finally:
+            executor.shutdown()
+        assert peak <= 2
+        assert results[:2] == [None, None]
+        assert all(isinstance(e, InferenceQueueFullError) for e in results[2:])
+
+    @pytest.mark.asyncio
+    async def test_queue_frees_slots(self) -> None:
+        executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+        try:
+            first = await asyncio.gather(
+                *[executor.run(time.sleep, 0.01) for _ in range(2)]
+            )
+            second = await executor.run(threading.get_ident)
+        finally:
+            executor.shutdown()
+        assert first == [None, None]
+        assert second is not None
+
+    @pytest.mark.asyncio
+    async def test_bulk_waits_instead_of_rejecting(self) -> None:
+        executor = InferenceExecutor(max_workers=1, max_queue_size=0)
+        try:
+            bulk = asyncio.gather(
+                *[executor.run_bulk(time.sleep, 0.01) for _ in range(5)]
+            )
+            # 批次工作另外計算位置，不會讓互動請求被拒絕
+            interactive = await executor.run(threading.get_ident)
+            assert await bulk == [None] * 5
+        finally:
+            executor.shutdown()
+        assert interactive is not None
+
+
+class TestMicroBatchEncoder:
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_batch(self) -> None:
+        encoder = CountingEncoder(embedding_dim=4)
+        batcher = MicroBatchEncoder(encoder=encoder, max_wait_ms=5, max_batch_size=32)
+
+        queries = ['a' * n for n in range(1, 11)]
+        results = await asyncio.gather(*[batcher.aencode([q]) for q in queries])
+
+        assert encoder.batch_sizes == [10]
+        for query, result in zip(queries, results, strict=True):
+            assert result.shape == (1, 4)
+            assert result[0, 0] == len(query)
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size(self) -> None:
+        encoder = CountingEncoder(embedding_dim=4)
+        batcher = MicroBatchEncoder(encoder=encoder, max_wait_ms=5, max_batch_size=4)
+
+        await asyncio.gather(*[batcher.aencode(['q']) for _ in range(10)])
+
+        assert sorted(encoder.batch_sizes) == [2, 4, 4]
+
+    @pytest.mark.asyncio
+    async def test_multi_sentence_calls_bypass_batching(self) -> None:
+        encoder = CountingEncoder(embedding_dim=4)
+        batcher = MicroBatchEncoder(encoder=encoder)
+
+        result = await batcher.aencode(['a', 'bb', 'ccc'])
+
+        assert encoder.batch_sizes == [3]
+        assert result.shape == (3, 4)
+
+
+class TestCachedEncoder:
+    def test_only_misses_are_encoded(self, tmp_path: Path) -> None:
+        encoder = CountingEncoder(embedding_dim=4)
+        cached = CachedEncoder(
+            encoder=encoder,
+            cache=EmbeddingCache(path=str(tmp_path / 'cache.sqlite3')),
+            namespace='mock',
+        )
+
+        first = cached.encode(['a', 'bb'])
+        second = cached.encode(['bb', 'ccc', 'a'])
+
+        assert encoder.batch_sizes == [2, 1]
+        np.testing.assert_array_equal(second[0], first[1])
+        np.testing.assert_array_equal(second[2], first[0])
+        assert second[1, 0] == 3
+        assert cached.stats()['cache']['hits'] == 2
+        assert cached.stats()['cache']['misses'] == 3
+
+    @pytest.mark.asyncio
+    async def test_persists_across_instances(self, tmp_path: Path) -> None:
+        path = str(tmp_path / 'cache.sqlite3')
+        cached = CachedEncoder(
+            encoder=CountingEncoder(embedding_dim=4),
+            cache=EmbeddingCache(path=path, memory_size=1),
+            namespace='mock',
+        )
+        await cached.aencode(['a', 'bb', 'ccc'])
+        cached.close()
+
+        encoder = CountingEncoder(embedding_dim=4)
+        reopened = CachedEncoder(
+            encoder=encoder, cache=EmbeddingCache(path=path), namespace='mock'
+        )
+        result = await reopened.aencode(['ccc', 'a'])
+
+        assert encoder.batch_sizes == []
+        assert result[:, 0].tolist() == [3, 1]
+
+    def test_namespace_separates_models(self, tmp_path: Path) -> None:
+        cache = EmbeddingCache(path=str(tmp_path / 'cache.sqlite3'))
+        encoder = CountingEncoder(embedding_dim=4)
+        CachedEncoder(encoder=encoder, cache=cache, namespace='model-a').encode(['a'])
+        CachedEncoder(encoder=encoder, cache=cache, namespace='model-b').encode(['a'])
+
+        assert encoder.batch_sizes == [1, 1]
+
+
+class TestTokenBudgetBatching:
+    def test_batches_respect_budget(self) -> None:
+        lengths = [10, 500, 20, 480, 15, 30]
+        batches = build_token_budget_batches(lengths, max_tokens=1000, max_batch_size=8)
+
+        assert sorted(idx for batch in batches for idx in batch) == list(range(6))
+        for batch in batches:
+            assert (
+                len(batch) == 1 or max(lengths[i] for i in batch) * len(batch) <= 1000
+            )
+        assert [1, 3] in batches
+
+    def test_oversized_input_gets_own_batch(self) -> None:
+        batches = build_token_budget_batches(
+            [5000, 10], max_tokens=1000, max_batch_size=8
+        )
+
+        assert batches == [[0], [1]]
+
+    def test_encode_keeps_input_order(self) -> None:
+        encoder = Encoder(max_tokens_per_batch=8, max_batch_size=2)
+        encoder.model = CountingEncoder(embedding_dim=4)
+        sentences = ['aaa', 'b', 'cccc', 'dd', 'e']
+
+        result = encoder.encode(sentences)
+        encoder.close()
+
+        assert result[:, 0].tolist() == [3, 1, 4, 2, 1]
+        assert len(encoder.model.batch_sizes) > 1
+
+
+class TestEncoderBackend:
+    @pytest.mark.parametrize('backend', ['torch', 'torch-int8'])
+    def test_torch_backends(self, backend: str) -> None:
+        encoder = Encoder(backend=backend)
+        encoder.close()
+
+        assert backend in ENCODER_BACKENDS
+        assert encoder.cache_namespace.endswith(':random')
+
+    def test_unknown_backend(self) -> None:
+        with pytest.raises(ValueError, match='Unknown encoder backend'):
+            Encoder(backend='tensorrt')
+
+    def test_onnx_requires_extra(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(
+            'embedding.encoder.importlib.util.find_spec', lambda name: None
+        )
+
+        with pytest.raises(ImportError, match='poetry install --extras onnx'):
+            Encoder(backend='onnx')
+
+
+class TestEncoderLoader:
+    @pytest.mark.asyncio
+    async def test_fail_fast_while_loading(self) -> None:
+        loaded = threading.Event()
+
+        def slow_factory() -> RandomEncoder:
+            loaded.wait(timeout=5)
+            return RandomEncoder()
+
+        loader = EncoderLoader(factory=slow_factory)
+        assert loader.status == 'not_started'
+        loader.start()
+        assert loader.status == 'loading'
+
+        with pytest.raises(EncoderNotReadyError):
+            await loader.get(timeout=0)
+
+        loaded.set()
+        encoder = await loader.get(timeout=5)
+        assert loader.status == 'ready'
+        assert (await encoder.aencode(['a'])).shape == (1, 768)
+
+    @pytest.mark.asyncio
+    async def test_failed_load(self) -> None:
+        def broken_factory() -> RandomEncoder:
+            raise OSError('model not found')
+
+        loader = EncoderLoader(factory=broken_factory)
+        loader.start()
+
+        with pytest.raises(EncoderNotReadyError, match='model not found'):
+            await loader.get(timeout=5)
+        assert loader.status == 'failed'
+
+
+class TestRemoteEncoder:
+    @pytest.mark.asyncio
+    async def test_round_trip(self, tmp_path: Path) -> None:
+        socket_path = str(tmp_path / 'encoder.sock')
+        encoder = CountingEncoder(embedding_dim=4)
+        server = EmbeddingServer(
+            loader=EncoderLoader(factory=lambda: encoder), socket_path=socket_path
+        )
+        server_task = asyncio.create_task(server.serve_forever())
+        while not Path(socket_path).exists():
+            await asyncio.sleep(0.01)
+
+        remote = RemoteEncoder(socket_path=socket_path, pool_size=2)
+        try:
+            results = await asyncio.gather(
+                *[remote.aencode(['a' * n, 'b']) for n in range(1, 6)]
+            )
+            sync_result = await asyncio.to_thread(remote.encode, ['xyz'])
+            pong = await remote.ping()
+        finally:
+            remote.close()
+            server_task.cancel()
+
+        for n, result in enumerate(results, start=1):
+            assert result.dtype == np.float32
+            assert result.shape == (2, 4)
+            assert result[:, 0].tolist() == [n, 1]
+        assert sync_result[0, 0] == 3
+        assert pong == {'status': 'ready'}
+
+    @pytest.mark.asyncio
+    async def test_queue_full_is_raised(self, tmp_path: Path) -> None:
+        socket_path = str(tmp_path / 'encoder.sock')
+
+        class BusyEncoder(RandomEncoder):
+            async def aencode(
+                self,
+                sentences: list[str],
+                show_progress_bar: bool = False,
+                bulk: bool = False,
+            ) -> np.ndarray:
+                if not bulk:
+                    raise InferenceQueueFullError('queue is full')
+                return self.encode(sentences=sentences)
+
+        server = EmbeddingServer(
+            loader=EncoderLoader(factory=BusyEncoder), socket_path=socket_path
+        )
+        server_task = asyncio.create_task(server.serve_forever())
+        while not Path(socket_path).exists():
+            await asyncio.sleep(0.01)
+
+        remote = RemoteEncoder(socket_path=socket_path)
+        try:
+            with pytest.raises(InferenceQueueFullError, match='queue is full'):
+                await remote.aencode(['a'])
+            bulk_result = await remote.aencode(['a', 'b'], bulk=True)
+        finally:
+            remote.close()
+            server_task.cancel()
+
+        assert bulk_result.shape == (2, 768)
+
+    @pytest.mark.asyncio
+    async def test_server_error_is_raised(self, tmp_path: Path) -> None:
+        socket_path = str(tmp_path / 'encoder.sock')
+
+        def broken_factory() -> RandomEncoder:
+            raise OSError('model not found')
+
+        server = EmbeddingServer(
+            loader=EncoderLoader(factory=broken_factory), socket_path=socket_path
+        )
+        server_task = asyncio.create_task(server.serve_forever())
+        while not Path(socket_path).exists():
+            await asyncio.sleep(0.01)
+
+        remote = RemoteEncoder(socket_path=socket_path)
+        try:
+            with pytest.raises(RemoteEncoderError, match='model not found'):
+                await remote.aencode(['a'])
+        finally:
+            remote.close()
+            server_task.cancel()
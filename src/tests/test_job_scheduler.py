@@ -0,0 +1,112 @@
+import asyncio
+from collections.abc import AsyncGenerator, Callable
+
+import pytest
+
+from core.job_scheduler import IngestJobScheduler
+from core.progress import IngestProgress
+
+
+def build_run(
+    name: str, order: list[str], release: asyncio.Event | None = None
+) -> Callable[[], AsyncGenerator[IngestProgress, None]]:
+    async def run() -> AsyncGenerator[IngestProgress, None]:
+        order.append(name)
+        if release is not None:
+            await release.wait()
+        yield IngestProgress(indexed_ratio=0.5, embedded_chunks=5)
+        yield IngestProgress(indexed_ratio=1.0, embedded_chunks=10)
+
+    return run
+
+
+class TestIngestJobScheduler:
+    @pytest.mark.asyncio
+    async def test_small_jobs_run_first(self) -> None:
+        scheduler = IngestJobScheduler(concurrency={'message': 1}, persist=False)
+        scheduler.start()
+        order = []
+        release = asyncio.Event()
+
+        blocker = await scheduler.submit(
+            'message', size=1, run=build_run('blocker', order, release)
+        )
+        await asyncio.sleep(0)
+        large = await scheduler.submit(
+            'message', size=1000, run=build_run('large', order)
+        )
+        small = await scheduler.submit(
+            'message', size=10, run=build_run('small', order)
+        )
+        release.set()
+
+        while large.status != 'completed':
+            await asyncio.sleep(0.01)
+        await scheduler.close()
+
+        assert order == ['blocker', 'small', 'large']
+        assert blocker.status == small.status == 'completed'
+        assert large.to_dict()['embedded_chunks'] == 10
+        assert large.to_dict()['eta_seconds'] is None
+
+    @pytest.mark.asyncio
+    async def test_cancel_running_and_queued_jobs(self) -> None:
+        scheduler = IngestJobScheduler(concurrency={'gmail': 1}, persist=False)
+        scheduler.start()
+        order = []
+
+        running = await scheduler.submit(
+            'gmail', size=1, run=build_run('running', order, asyncio.Event())
+        )
+        queued = await scheduler.submit('gmail', size=1, run=build_run('queued', order))
+        while running.status != 'running':
+            await asyncio.sleep(0.01)
+
+        assert await scheduler.cancel(queued.job_id)
+        assert await scheduler.cancel(running.job_id)
+        while running.status == 'running':
+            await asyncio.sleep(0.01)
+        await scheduler.close()
+
+        assert running.status == queued.status == 'cancelled'
+        assert order == ['running']
+        assert not await scheduler.cancel(running.job_id)
+
+    @pytest.mark.asyncio
+    async def test_failed_job_reports_error(self) -> None:
+        scheduler = IngestJobScheduler(concurrency={'message': 1}, persist=False)
+        scheduler.start()
+
+        async def run() -> AsyncGenerator[IngestProgress, None]:
+            yield IngestProgress(indexed_ratio=0.25, embedded_chunks=1)
+            raise RuntimeError('boom')
+
+        job = await scheduler.submit('message', size=1, run=run)
+        while job.status in ('queued', 'running'):
+            await asyncio.sleep(0.01)
+        await scheduler.close()
+
+        assert job.status == 'failed'
+        assert job.error == 'boom'
+        assert job.to_dict()['indexed_ratio'] == 0.25
+        with pytest.raises(ValueError):
+            await scheduler.submit('unknown', size=1, run=run)
+
+    @pytest.mark.asyncio
+    async def test_slot_shares_concurrency_with_queued_jobs(self) -> None:
+        scheduler = IngestJobScheduler(concurrency={'message': 1}, persist=False)
+        scheduler.start()
+        order = []
+
+        async with scheduler.slot('message'):
+            job = await scheduler.submit('message', size=1, run=build_run('job', order))
+            await asyncio.sleep(0.05)
+            assert job.status == 'queued'
+
+        while job.status != 'completed':
+            await asyncio.sleep(0.01)
+        await scheduler.close()
+
+        assert order == ['job']
+        with pytest.raises(ValueError):
+            scheduler.slot('unknown')
@@ -0,0 +1,66 @@
+from collections.abc import AsyncGenerator
+
+import pytest
+
+from agent.client import (
+    LLMClientRegistry,
+    async_ollama_client,
+    close_llm_client_registry,
+    init_llm_client_registry,
+)
+from core.llm_handler import LLMHandler
+
+
+class TestLLMClientRegistry:
+    @pytest.mark.asyncio
+    async def test_reuse_and_lru_eviction(self) -> None:
+        registry = LLMClientRegistry(max_size=2)
+
+        async with registry.borrow('ollama', host='http://a:11434') as client_a:
+            pass
+        async with registry.borrow('ollama', host='http://a:11434') as client:
+            assert client is client_a
+
+        async with registry.borrow('ollama', host='http://b:11434') as client_b:
+            # client_b 借用中被淘汰，歸還後才關閉
+            async with registry.borrow('ollama', host='http://c:11434'):
+                pass
+            async with registry.borrow('ollama', host='http://d:11434'):
+                pass
+            assert client_a._client.is_closed
+            assert not client_b._client.is_closed
+        assert client_b._client.is_closed
+
+        stats = registry.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 4
+        assert stats['evictions'] == 2
+        assert stats['clients'] == 2
+        await registry.close()
+
+    @pytest.mark.asyncio
+    async def test_handler_borrows_and_records_ttft(self) -> None:
+        registry = init_llm_client_registry()
+        try:
+            async with async_ollama_client() as first:
+                pass
+            async with async_ollama_client() as second:
+                assert second is first
+
+            async def fake_chat(messages: list[dict]) -> AsyncGenerator[str, None]:
+                yield 'hello'
+                yield ' world'
+
+            handler = LLMHandler(llm_name='llama3', llm_source='ollama', api_key=None)
+            handler.MODEL_REGISTRY['ollama'] = fake_chat
+            tokens = [
+                token
+                async for token in handler.get_llm_chat_func()(
+                    messages=[{'role': 'user', 'content': 'hi'}]
+                )
+            ]
+
+            assert tokens == ['hello', ' world']
+            assert registry.stats()['ttft']['ollama']['count'] == 1
+        finally:
+            await close_llm_client_registry()
@@ -0,0 +1,325 @@
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import pytest
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+
+from core.message_chunker import get_chunking_config
+from core.message_handler import MessageHandler
+from database.qdrant.rag_vec_store import RAGVecStore
+from embedding.encoder import RandomEncoder
+
+
+def build_mock_document(
+    thread_path: str, message_count: int, start_ts: int = 1741300000000
+) -> dict:
+    return {
+        'participants': [{'name': 'Alice'}, {'name': 'Bob'}],
+        'messages': [
+            {
+                'sender_name': 'Alice' if idx % 2 else 'Bob',
+                'timestamp_ms': start_ts + idx * 60000,
+                'content': f'{thread_path} message {idx}',
+            }
+            for idx in range(message_count)
+        ],
+        'thread_path': thread_path,
+    }
+
+
+class TestMessageHandler:
+    @pytest.mark.asyncio
+    async def test_progress_is_reported_per_batch(self) -> None:
+        documents = [build_mock_document(f'inbox/thread_{idx}', 20) for idx in range(5)]
+        handler = MessageHandler(
+            documents=documents, encoder=RandomEncoder(), window_sizes=[5], stride=3
+        )
+
+        progress = [
+            progress
+            async for progress in handler.index_message_chunks(
+                dry_run=True, batch_size=7
+            )
+        ]
+        ratios = [p.indexed_ratio for p in progress]
+
+        # 每個 thread 有 6 個 window，共 30 個 chunk
+        assert len(ratios) == 5
+        assert ratios == sorted(ratios)
+        assert ratios[-1] == 1
+        assert progress[-1].embedded_chunks == 30
+
+    def test_count_matches_built_chunks(self) -> None:
+        handler = MessageHandler(
+            documents=[], encoder=RandomEncoder(), window_sizes=[3, 5], stride=2
+        )
+        for message_count in [0, 2, 3, 5, 6, 11]:
+            document = build_mock_document('inbox/thread', message_count)
+            assert handler._count_chunks(document) == len(
+                handler._build_document_chunks(document)
+            )
+
+    def test_incremental_chunks_only_cover_new_messages(self) -> None:
+        handler = MessageHandler(
+            documents=[], encoder=RandomEncoder(), window_sizes=[3, 5], stride=3
+        )
+        old_document = build_mock_document('inbox/thread', 20)
+        new_document = build_mock_document('inbox/thread', 27)
+        state = {
+            'first_timestamp_ms': old_document['messages'][0]['timestamp_ms'],
+            'last_timestamp_ms': old_document['messages'][-1]['timestamp_ms'],
+            'message_count': 20,
+            'collection_name': RAGVecStore.get_full_collection_name(),
+            'chunking': handler._chunking_key,
+        }
+
+        first_new_index = handler._get_first_new_index(new_document, state)
+        incremental_ids = {
+            chunk['chunk_id']
+            for chunk in handler._build_document_chunks(
+                new_document, first_new_index=first_new_index
+            )
+        }
+        old_ids = {
+            chunk['chunk_id'] for chunk in handler._build_document_chunks(old_document)
+        }
+        new_ids = {
+            chunk['chunk_id'] for chunk in handler._build_document_chunks(new_document)
+        }
+
+        assert first_new_index == 20
+        assert incremental_ids == new_ids - old_ids
+        assert handler._count_chunks(
+            new_document, first_new_index=first_new_index
+        ) == len(incremental_ids)
+
+    def test_span_mode_covers_every_message_once(self) -> None:
+        handler = MessageHandler(
+            documents=[], encoder=RandomEncoder(), **get_chunking_config('span')
+        )
+        old_document = build_mock_document('inbox/thread', 10)
+        new_document = build_mock_document('inbox/thread', 13)
+
+        chunks = handler._build_document_chunks(old_document)
+        lines = [line for chunk in chunks for line in chunk['text'].splitlines()]
+        assert len(chunks) == 3
+        assert lines == [
+            f'{msg["sender_name"]}: {msg["content"]}'
+            for msg in old_document['messages']
+        ]
+
+        # 只重建含有新訊息的 span，包含先前不足一個 span 的尾端
+        state = {
+            'first_timestamp_ms': old_document['messages'][0]['timestamp_ms'],
+            'last_timestamp_ms': old_document['messages'][-1]['timestamp_ms'],
+            'message_count': 10,
+            'collection_name': RAGVecStore.get_full_collection_name(),
+            'chunking': handler._chunking_key,
+        }
+        first_new_index = handler._get_first_new_index(new_document, state)
+        incremental = handler._build_document_chunks(
+            new_document, first_new_index=first_new_index
+        )
+        assert [chunk['text'].count('\n') + 1 for chunk in incremental] == [4, 1]
+        assert incremental[0]['start_timestamp'] == chunks[-1]['start_timestamp']
+
+    def test_changed_history_falls_back_to_full_rebuild(self) -> None:
+        handler = MessageHandler(documents=[], encoder=RandomEncoder())
+        document = build_mock_document('inbox/thread', 20)
+        state = {
+            'first_timestamp_ms': document['messages'][0]['timestamp_ms'],
+            'last_timestamp_ms': document['messages'][-1]['timestamp_ms'],
+            'message_count': 18,
+            'collection_name': RAGVecStore.get_full_collection_name(),
+        }
+
+        assert handler._get_first_new_index(document, state) == 0
+        # 舊 collection 留下的 state 不能拿來略過訊息
+        state['message_count'] = 20
+        state['collection_name'] = 'rag_vector_store-2025-04-09'
+        assert handler._get_first_new_index(document, state) == 0
+        # 切法不同（例如改用 span 模式）時 chunk 邊界對不上，也要全量重建
+        state['collection_name'] = RAGVecStore.get_full_collection_name()
+        state['chunking'] = handler._chunking_key
+        assert handler._get_first_new_index(document, state) == 20
+        state['chunking'] = '[4]:4:True'
+        assert handler._get_first_new_index(document, state) == 0
+
+    def test_stale_chunks_are_detected(self) -> None:
+        span_handler = MessageHandler(
+            documents=[], encoder=RandomEncoder(), **get_chunking_config('span')
+        )
+        old_document = build_mock_document('inbox/thread', 10)
+        new_document = build_mock_document('inbox/thread', 13)
+        state = {
+            'first_timestamp_ms': old_document['messages'][0]['timestamp_ms'],
+            'last_timestamp_ms': old_document['messages'][-1]['timestamp_ms'],
+            'message_count': 10,
+            'collection_name': RAGVecStore.get_full_collection_name(),
+        }
+
+        # 從 window 換成 span 時整個 thread 的舊 chunk 都要刪
+        first_new_index = span_handler._get_first_new_index(new_document, state)
+        assert first_new_index == 0
+        assert (
+            span_handler._get_stale_from_timestamp(new_document, state, first_new_index)
+            == 0
+        )
+
+        # 同樣切法只刪掉被取代的尾端 span
+        state['chunking'] = span_handler._chunking_key
+        first_new_index = span_handler._get_first_new_index(new_document, state)
+        old_tail = span_handler._build_document_chunks(old_document)[-1]
+        assert (
+            span_handler._get_stale_from_timestamp(new_document, state, first_new_index)
+            == old_tail['start_timestamp']
+        )
+
+        # window 模式沒有不完整的尾端，增量時不用刪
+        window_handler = MessageHandler(
+            documents=[], encoder=RandomEncoder(), **get_chunking_config('window')
+        )
+        state['chunking'] = window_handler._chunking_key
+        first_new_index = window_handler._get_first_new_index(new_document, state)
+        assert first_new_index == 10
+        assert (
+            window_handler._get_stale_from_timestamp(
+                new_document, state, first_new_index
+            )
+            is None
+        )
+        assert window_handler._get_stale_from_timestamp(new_document, None, 0) is None
+
+    @pytest.mark.asyncio
+    async def test_delete_thread_points(self) -> None:
+        client = AsyncQdrantClient(location=':memory:')
+        await RAGVecStore.create_collection(client=client)
+        chunks = [
+            {
+                'chunk_id': uuid.UUID(int=idx + 1).hex,
+                'embedding': [float(idx + 1)] * 768,
+                'text': f'message {idx}',
+                'source': 'message',
+                'thread_id': thread_id,
+                'start_timestamp': idx * 1000,
+                'end_timestamp': idx * 1000 + 500,
+            }
+            for idx, thread_id in enumerate(['inbox/a', 'inbox/a', 'inbox/b'])
+        ]
+        async for _ in RAGVecStore.iter_upsert_points(
+            client=client, batched_iter_points=RAGVecStore.prepare_iter_points(chunks)
+        ):
+            pass
+
+        await RAGVecStore.delete_points(
+            client=client,
+            include_filter_map={
+                'source': 'message',
+                'thread_id': 'inbox/a',
+                'start_timestamp': {'gte': 1000},
+            },
+        )
+        remaining = await RAGVecStore.get_existing_ids(
+            client=client, ids=[chunk['chunk_id'] for chunk in chunks]
+        )
+        await client.close()
+
+        assert remaining == {chunks[0]['chunk_id'], chunks[2]['chunk_id']}
+
+    def test_split_threads_are_not_tracked(self) -> None:
+        documents = [
+            build_mock_document('inbox/split', 10),
+            build_mock_document('inbox/split', 10, start_ts=1741000000000),
+            build_mock_document('inbox/single', 10),
+        ]
+        handler = MessageHandler(documents=documents, encoder=RandomEncoder())
+
+        assert [handler._thread_key(doc) for doc in documents] == [
+            None,
+            None,
+            'inbox/single',
+        ]
+
+    @pytest.mark.asyncio
+    async def test_encoder_error_is_raised(self) -> None:
+        class BrokenEncoder(RandomEncoder):
+            async def aencode(
+                self,
+                sentences: list[str],
+                show_progress_bar: bool = False,
+                bulk: bool = False,
+            ) -> None:
+                raise RuntimeError('encoder crashed')
+
+        handler = MessageHandler(
+            documents=[build_mock_document('inbox/thread', 10)],
+            encoder=BrokenEncoder(),
+        )
+
+        with pytest.raises(RuntimeError, match='encoder crashed'):
+            async for _ in handler.index_message_chunks(dry_run=True):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_process_pool_preprocessing_matches_inline(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        documents = [
+            build_mock_document(f'inbox/thread_{idx}', 3 + idx % 9) for idx in range(25)
+        ]
+        first_new_indexes = [idx % 4 for idx in range(25)]
+
+        async def collect(preprocess_workers: int) -> list[list[dict]]:
+            handler = MessageHandler(
+                documents=documents,
+                encoder=RandomEncoder(),
+                window_sizes=[3, 5],
+                stride=2,
+                preprocess_workers=preprocess_workers,
+                preprocess_chunksize=4,
+            )
+            return [
+                batch.chunks
+                async for batch in handler._iter_chunk_batches(
+                    first_new_indexes, batch_size=16
+                )
+            ]
+
+        pools = []
+
+        class RecordingPool(ProcessPoolExecutor):
+            def __init__(self, max_workers: int) -> None:
+                super().__init__(max_workers=max_workers)
+                self.submitted = 0
+                self.shutdown_wait = None
+                pools.append(self)
+
+            def submit(self, *args: object, **kwargs: object) -> Future:
+                self.submitted += 1
+                return super().submit(*args, **kwargs)
+
+            def shutdown(self, wait: bool = True, **kwargs: object) -> None:
+                self.shutdown_wait = wait
+                super().shutdown(wait=wait, **kwargs)
+
+        monkeypatch.setattr('core.message_handler.ProcessPoolExecutor', RecordingPool)
+        inline_batches = await collect(0)
+        assert pools == []
+        pooled_batches = await collect(2)
+
+        assert pooled_batches == inline_batches
+        # 25 份文件每 4 份一組送進 process pool
+        assert [pool.submitted for pool in pools] == [7]
+        assert pools[0].shutdown_wait is False
+
+        # 提早停止讀取時 generator 關閉也會關掉 pool
+        handler = MessageHandler(
+            documents=documents, encoder=RandomEncoder(), preprocess_workers=2
+        )
+        chunk_iter = handler._iter_document_chunks(first_new_indexes)
+        await anext(chunk_iter)
+        await chunk_iter.aclose()
+        assert pools[-1].shutdown_wait is False
+        assert len(pools) == 2
+        # 多份文件的 chunk 會被併進同一個 encoder batch
+        assert all(len(batch) == 16 for batch in inline_batches[:-1])
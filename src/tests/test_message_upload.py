@@ -0,0 +1,128 @@
+import asyncio
+import json
+from collections.abc import AsyncGenerator
+
+import pytest
+
+from core.json_stream import JSONDocumentSplitter, JSONStreamError
+from core.message_upload import MessageUploadHandler
+from embedding.encoder import RandomEncoder
+from tests.test_message_handler import build_mock_document
+
+
+async def iter_bytes(data: bytes, chunk_size: int) -> AsyncGenerator[bytes, None]:
+    for idx in range(0, len(data), chunk_size):
+        yield data[idx : idx + chunk_size]
+
+
+def build_job(committed_documents: int = 0) -> dict:
+    return {
+        'job_id': 'job',
+        'committed_documents': committed_documents,
+        'embedded_chunks': 0,
+        'skipped_chunks': 0,
+    }
+
+
+class TestJSONDocumentSplitter:
+    @pytest.mark.parametrize('chunk_size', [1, 3, 7, 4096])
+    def test_split_concatenated_documents(self, chunk_size: int) -> None:
+        documents = [
+            {'text': 'a}{"\\[', 'nested': [{'x': []}, '中文']},
+            {},
+            {'escaped': '\\"'},
+        ]
+        data = (
+            json.dumps(documents[0], indent=2, ensure_ascii=False)
+            + '\n'
+            + json.dumps(documents[1])
+            + json.dumps(documents[2])
+            + '\n'
+        ).encode()
+
+        splitter = JSONDocumentSplitter()
+        raw_documents = []
+        for idx in range(0, len(data), chunk_size):
+            raw_documents += splitter.feed(data[idx : idx + chunk_size])
+        splitter.close()
+
+        assert [json.loads(raw) for raw in raw_documents] == documents
+
+    def test_reject_non_object_and_truncated_stream(self) -> None:
+        with pytest.raises(JSONStreamError):
+            JSONDocumentSplitter().feed(b'[{"a": 1}]')
+
+        splitter = JSONDocumentSplitter()
+        splitter.feed(b'{"a": "}')
+        with pytest.raises(JSONStreamError):
+            splitter.close()
+
+
+class TestMessageUploadHandler:
+    @pytest.mark.asyncio
+    async def test_resume_skips_committed_documents(self) -> None:
+        documents = [
+            build_mock_document(f'inbox/thread_{idx}', 8, start_ts=idx * 10**9)
+            for idx in range(5)
+        ]
+        data = '\n'.join(json.dumps(doc) for doc in documents).encode()
+
+        handler = MessageUploadHandler(
+            job=build_job(committed_documents=3),
+            encoder=RandomEncoder(),
+            window_sizes=[5],
+            stride=3,
+            group_size=1,
+        )
+        progress = [
+            state
+            async for state in handler.ingest_stream(
+                iter_bytes(data, 64), offset=0, dry_run=True
+            )
+        ]
+
+        # 8 則訊息、window 5、stride 3 -> 每份文件 2 個 chunk，只處理後兩份
+        assert progress[-1]['committed_documents'] == 5
+        assert progress[-1]['embedded_chunks'] == 4
+        assert handler.job['status'] == 'idle'
+
+    @pytest.mark.asyncio
+    async def test_groups_take_slot_and_stop_on_cancel(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        documents = [
+            build_mock_document(f'inbox/thread_{idx}', 8, start_ts=idx * 10**9)
+            for idx in range(5)
+        ]
+        data = '\n'.join(json.dumps(doc) for doc in documents).encode()
+        slot = asyncio.Semaphore(1)
+        slot_states = []
+
+        async def update_job(dry_run: bool, **fields: object) -> bool:
+            handler.job.update(fields)
+            slot_states.append(slot.locked())
+            # 第二組 commit 時收到取消
+            return fields.get('committed_documents') == 2
+
+        handler = MessageUploadHandler(
+            job=build_job(),
+            encoder=RandomEncoder(),
+            window_sizes=[5],
+            stride=3,
+            group_size=1,
+            acquire_slot=lambda: slot,
+        )
+        monkeypatch.setattr(handler, '_update_job', update_job)
+        progress = [
+            state
+            async for state in handler.ingest_stream(
+                iter_bytes(data, 64), offset=0, dry_run=True
+            )
+        ]
+
+        assert progress[-1]['status'] == 'cancelled'
+        assert progress[-1]['committed_documents'] == 2
+        assert progress[-1]['embedded_chunks'] == 4
+        assert handler.job['status'] == 'cancelled'
+        # commit 時已釋放名額
+        assert not any(slot_states)
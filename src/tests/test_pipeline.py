@@ -0,0 +1,120 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+
+import pytest
+
+from core.chunk_writer import ChunkWriter
+from core.pipeline import PipelineStage, run_pipeline
+
+
+async def iter_numbers(count: int) -> AsyncGenerator[int, None]:
+    for number in range(count):
+        yield number
+
+
+class MockVecStore:
+    calls = []
+
+    @classmethod
+    def prepare_iter_points(cls, chunks: list[dict], batch_size: int) -> list:
+        yield [chunk['chunk_id'] for chunk in chunks]
+
+    @classmethod
+    async def upsert_points(cls, client: object, points: list, wait: bool) -> None:
+        await asyncio.sleep(0.05)
+        cls.calls.append((points, wait))
+
+
+class MockDocCol:
+    calls = []
+
+    @classmethod
+    def prepare_iter_docs(cls, chunks: list[dict], batch_size: int) -> list:
+        yield [chunk['chunk_id'] for chunk in chunks]
+
+    @classmethod
+    async def upsert_docs(cls, client: object, docs: list) -> None:
+        await asyncio.sleep(0.05)
+        cls.calls.append(docs)
+
+    @classmethod
+    async def create_index(cls, client: object) -> None:
+        pass
+
+
+class TestPipeline:
+    @pytest.mark.asyncio
+    async def test_stages_run_in_order(self) -> None:
+        async def double(number: int) -> int:
+            return number * 2
+
+        async def increment(number: int) -> int:
+            return number + 1
+
+        results = [
+            item
+            async for item in run_pipeline(iter_numbers(10), stages=[double, increment])
+        ]
+
+        assert results == [number * 2 + 1 for number in range(10)]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_stage(self) -> None:
+        async def slow(number: int) -> int:
+            await asyncio.sleep(0.05)
+            return number
+
+        start = time.perf_counter()
+        results = [
+            item
+            async for item in run_pipeline(
+                iter_numbers(8),
+                stages=[PipelineStage(func=slow, concurrency=4)],
+                queue_size=8,
+            )
+        ]
+
+        assert sorted(results) == list(range(8))
+        assert time.perf_counter() - start < 0.3
+
+    @pytest.mark.asyncio
+    async def test_source_error_is_raised(self) -> None:
+        async def broken_source() -> AsyncGenerator[int, None]:
+            yield 1
+            raise ValueError('broken document')
+
+        async def identity(number: int) -> int:
+            return number
+
+        with pytest.raises(ValueError, match='broken document'):
+            async for _ in run_pipeline(broken_source(), stages=[identity]):
+                pass
+
+
+class TestChunkWriter:
+    @pytest.mark.asyncio
+    async def test_writes_both_stores_concurrently(self) -> None:
+        MockVecStore.calls = []
+        MockDocCol.calls = []
+        writer = ChunkWriter(
+            vec_store=MockVecStore,
+            doc_col=MockDocCol,
+            qdrant_client=None,
+            mongodb_client=None,
+            source='message',
+            qdrant_wait=False,
+        )
+        batches = [[{'chunk_id': f'{b}-{i}'} for i in range(3)] for b in range(4)]
+
+        start = time.perf_counter()
+        written = [
+            chunks async for chunks in writer.iter_write(batches, max_in_flight=4)
+        ]
+        elapsed = time.perf_counter() - start
+        await writer.flush()
+
+        assert len(written) == 4
+        assert elapsed < 0.15
+        assert len(MockDocCol.calls) == 4
+        assert [wait for _, wait in MockVecStore.calls] == [False] * 4 + [True]
@@ -0,0 +1,160 @@
+import threading
+from collections.abc import AsyncGenerator
+
+import pytest
+
+from agent.chat_agent import ChatAgent
+from agent.prompt_builder import PromptBuilder, TokenCounter
+from agent.prompt_registry import PromptTemplate
+from core.retrieval import RetrievedChunk
+
+TEMPLATE = PromptTemplate(
+    name='test', template='You help {user_name}.\nMemory:\n{context}\nQuestion: {query}'
+)
+
+
+def build_chunks(texts: list[str]) -> list[RetrievedChunk]:
+    return [
+        RetrievedChunk(chunk_id=str(idx), source='message', score=1.0, text=text)
+        for idx, text in enumerate(texts)
+    ]
+
+
+class MockChatAgent(ChatAgent):
+    async def _retrieve_similar_chunks(
+        self, query: str, limit: int
+    ) -> list[RetrievedChunk]:
+        return build_chunks(['Bob: 明天去台北', 'Bob: 明天去台北\nAlice: 好啊'])
+
+
+class TestTokenCounter:
+    def test_heuristic_count_and_truncate(self) -> None:
+        counter = TokenCounter()
+
+        assert counter.count('今天天氣') == 4
+        assert counter.count('abcdefgh') == 2
+        truncated = counter.truncate('今天天氣很好 ' * 20, max_tokens=10)
+        assert truncated.endswith('…')
+        assert counter.count(truncated[:-1]) <= 10
+        assert counter.truncate('short', max_tokens=10) == 'short'
+
+    @pytest.mark.asyncio
+    async def test_start_loads_tokenizer_off_event_loop(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        load_threads = []
+
+        class FakeTokenizer:
+            def encode(self, text: str, add_special_tokens: bool) -> list[str]:
+                return text.split()
+
+        class FakeAutoTokenizer:
+            @staticmethod
+            def from_pretrained(name: str) -> FakeTokenizer:
+                load_threads.append(threading.get_ident())
+                return FakeTokenizer()
+
+        monkeypatch.setattr('transformers.AutoTokenizer', FakeAutoTokenizer)
+        counter = TokenCounter(tokenizer_name='fake')
+        counter.start()
+        await counter._load_task
+
+        assert load_threads != [threading.get_ident()]
+        assert counter.count('a b c') == 3
+
+
+class TestPromptBuilder:
+    def test_dedupe_overlapping_windows(self) -> None:
+        builder = PromptBuilder()
+        chunks = build_chunks(
+            [
+                'Alice: 晚餐吃什麼\nBob: 吃拉麵\nAlice: 好',
+                'Bob: 吃拉麵\nAlice: 好\nBob: 七點見',
+                'Alice: 好\nBob: 吃拉麵',
+                'Alice: 晚餐吃什麼？\nBob: 吃拉麵吧\nAlice: 好',
+                'Carol: 報告寫完了嗎',
+            ]
+        )
+
+        deduped = builder.dedupe_chunks(chunks)
+
+        # 重疊的行只保留一次，內容幾乎相同的 chunk 整個略過
+        assert [chunk.chunk_id for chunk in deduped] == ['0', '1', '4']
+        assert deduped[1].text == 'Bob: 七點見'
+        assert chunks[1].text.startswith('Bob: 吃拉麵')
+
+    def test_compact_history(self) -> None:
+        builder = PromptBuilder(recent_turns=2, max_turn_tokens=5)
+        history = [
+            {'role': 'user', 'content': '很久以前的問題' * 10},
+            {'role': 'assistant', 'content': '很久以前的回答' * 10},
+            {'role': 'user', 'content': '上一個問題'},
+            {'role': 'assistant', 'content': '上一個回答'},
+        ]
+
+        compacted = builder.compact_history(history, token_budget=100)
+        assert [turn['content'] for turn in compacted[2:]] == [
+            '上一個問題',
+            '上一個回答',
+        ]
+        assert compacted[0]['content'] == '很久以前的…'
+        assert builder.compact_history(history, token_budget=15) == history[2:]
+
+    def test_build_respects_budget(self) -> None:
+        builder = PromptBuilder(
+            max_prompt_tokens=120, max_context_tokens=30, max_context_chunks=5
+        )
+        history = [
+            {'role': 'user', 'content': f'第 {idx} 個問題' * 5} for idx in range(20)
+        ]
+        chunks = build_chunks([f'Bob: 第 {idx} 則記憶內容' for idx in range(10)])
+
+        built = builder.build(
+            template=TEMPLATE,
+            query='Bob 說了什麼',
+            chunks=chunks,
+            history=history,
+            fields={'user_name': 'Alice'},
+        )
+
+        assert built.prompt_tokens <= 120
+        assert 0 < built.context_chunks < 5
+        assert 0 < built.history_turns < len(history)
+        assert built.messages[-2] == history[-1]
+        assert 'Bob: 第 0 則記憶內容' in built.messages[-1]['content']
+
+    @pytest.mark.asyncio
+    async def test_chat_agent_does_not_mutate_history(self) -> None:
+        sent = []
+
+        build_threads = []
+
+        async def fake_chat(messages: list[dict]) -> AsyncGenerator[str, None]:
+            sent.append(messages)
+            yield 'ok'
+
+        class ThreadRecordingChatAgent(MockChatAgent):
+            def _construct_messages(self, *args: object, **kwargs: object) -> list:
+                build_threads.append(threading.get_ident())
+                return super()._construct_messages(*args, **kwargs)
+
+        agent = ThreadRecordingChatAgent(
+            user_name='Alice', encoder=None, llm_chat_func=fake_chat
+        )
+        history = [
+            {'role': 'user', 'content': '嗨'},
+            {'role': 'assistant', 'content': '你好'},
+            {'role': 'user', 'content': 'Bob 明天要去哪'},
+        ]
+
+        tokens = [
+            token async for token in agent.generate_response('Bob 明天要去哪', history)
+        ]
+
+        assert tokens == ['ok']
+        # prompt 在 thread 裡組，不佔用 event loop
+        assert build_threads != [threading.get_ident()]
+        assert history[-1] == {'role': 'user', 'content': 'Bob 明天要去哪'}
+        assert sent[0][:2] == history[:2]
+        assert sent[0][-1]['role'] == 'user'
+        assert 'Bob: 明天去台北\n\nAlice: 好啊' in sent[0][-1]['content']
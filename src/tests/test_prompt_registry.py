@@ -0,0 +1,100 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from agent.prompt_registry import PromptRegistry, PromptTemplateError
+
+PROMPTS = """
+[greeting_prompt]
+placeholders = ["user_name", "query"]
+default = "Hi {user_name}, you asked: {query}"
+short = "{user_name}: {query}"
+"""
+
+
+def write_prompts(path: Path, content: str, mtime: float | None = None) -> None:
+    path.write_text(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestPromptRegistry:
+    def test_load_and_render(self, tmp_path: Path) -> None:
+        write_prompts(tmp_path / 'greeting.toml', PROMPTS)
+        registry = PromptRegistry(prompt_dir=tmp_path)
+
+        template = registry.get('greeting.toml', 'greeting_prompt')
+        assert template.placeholders == {'user_name', 'query'}
+        assert (
+            registry.render(
+                'greeting.toml',
+                'greeting_prompt',
+                'short',
+                user_name='Alice',
+                query='?',
+            )
+            == 'Alice: ?'
+        )
+        with pytest.raises(PromptTemplateError):
+            template.render(user_name='Alice')
+        with pytest.raises(KeyError):
+            registry.get('greeting.toml', 'unknown_prompt')
+
+    @pytest.mark.parametrize(
+        'content',
+        [
+            '[bad]\nplaceholders = ["query"]\ndefault = "{query} {context}"',
+            '[bad]\ndefault = "{0} {query}"',
+            '[bad]\ndefault = "{user.name}"',
+            '[bad]\ndefault = "{query"',
+        ],
+    )
+    def test_invalid_placeholders_fail_at_load(
+        self, tmp_path: Path, content: str
+    ) -> None:
+        write_prompts(tmp_path / 'bad.toml', content)
+
+        with pytest.raises(PromptTemplateError):
+            PromptRegistry(prompt_dir=tmp_path)
+
+    def test_hot_reload(self, tmp_path: Path) -> None:
+        path = tmp_path / 'greeting.toml'
+        write_prompts(path, PROMPTS, mtime=1_000_000)
+        registry = PromptRegistry(
+            prompt_dir=tmp_path, hot_reload=True, reload_interval=0
+        )
+        static = PromptRegistry(prompt_dir=tmp_path)
+
+        write_prompts(
+            path,
+            PROMPTS.replace('Hi {user_name}', 'Hello {user_name}'),
+            mtime=1_000_001,
+        )
+        assert registry.render(
+            'greeting.toml', 'greeting_prompt', user_name='Alice', query='?'
+        ).startswith('Hello Alice')
+        assert static.render(
+            'greeting.toml', 'greeting_prompt', user_name='Alice', query='?'
+        ).startswith('Hi Alice')
+
+        # 存到一半的錯誤內容不會蓋掉已載入的 prompt
+        write_prompts(path, '[greeting_prompt\n', mtime=1_000_002)
+        assert registry.get('greeting.toml', 'greeting_prompt').template.startswith(
+            'Hello'
+        )
+
+    def test_default_prompts_do_not_depend_on_cwd(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.chdir(tmp_path)
+        registry = PromptRegistry()
+
+        prompt = registry.render(
+            'chat_agent_prompts.toml',
+            'memory_recall_prompt',
+            user_name='Alice',
+            context='Bob: 明天見',
+            query='Bob 說什麼',
+        )
+        assert 'Bob: 明天見' in prompt
@@ -21,3 +21,14 @@ class TestQdrant:
                     limit=1,
                 )
             assert chunk_id == results[0].id.replace('-', '')
+
+    @pytest.mark.asyncio
+    async def test_hybrid_search(self, upsert_mock_chunks: list[dict]) -> None:
+        async with async_qdrant_client() as client:
+            results = await RAGVecStore.search(
+                client=client,
+                query_vector=[0.1] * 768,
+                query_text='AB-1234 出貨',
+                limit=1,
+            )
+        assert upsert_mock_chunks[0]['chunk_id'] == results[0].id.replace('-', '')
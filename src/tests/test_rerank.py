@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from agent.chat_agent import ChatAgent
+from core.rerank import CrossEncoderReranker, IdentityReranker, select_within_budget
+from core.retrieval import RetrievedChunk
+
+
+class MockCrossEncoder:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls = []
+
+    def predict(
+        self, pairs: list[tuple[str, str]], batch_size: int, show_progress_bar: bool
+    ) -> list[float]:
+        self.calls.append((len(pairs), batch_size))
+        time.sleep(self.delay)
+        # 文字越長分數越高，方便驗證排序
+        return [float(len(text)) for _, text in pairs]
+
+
+def build_chunks(texts: list[str]) -> list[RetrievedChunk]:
+    return [
+        RetrievedChunk(chunk_id=str(idx), source='message', score=1.0 - idx, text=text)
+        for idx, text in enumerate(texts)
+    ]
+
+
+class MockChatAgent(ChatAgent):
+    async def _retrieve_similar_chunks(
+        self, query: str, limit: int
+    ) -> list[RetrievedChunk]:
+        self.limit = limit
+        return build_chunks(['a', 'bbb', 'cc', 'dddd'])[:limit]
+
+
+class TestRerank:
+    @pytest.mark.asyncio
+    async def test_cross_encoder_reorders_in_one_batch(self) -> None:
+        reranker = CrossEncoderReranker()
+        reranker._model = MockCrossEncoder()
+        chunks = build_chunks(['a', 'bbb', 'cc'])
+
+        reranked = await reranker.rerank('query', chunks)
+        reranker.close()
+
+        assert [chunk.text for chunk in reranked] == ['bbb', 'cc', 'a']
+        assert [chunk.rerank_score for chunk in reranked] == [3.0, 2.0, 1.0]
+        assert reranker._model.calls == [(3, 3)]
+        # 不改動原本的 chunk，cache 裡的結果保持不變
+        assert chunks[0].rerank_score is None
+
+    @pytest.mark.asyncio
+    async def test_timeout_falls_back_to_vector_order(self) -> None:
+        reranker = CrossEncoderReranker(timeout=0.05)
+        reranker._model = MockCrossEncoder(delay=0.3)
+        chunks = build_chunks(['a', 'bbb', 'cc'])
+
+        reranked = await reranker.rerank('query', chunks)
+        reranker.close()
+
+        assert reranked == chunks
+        assert reranker.stats()['timeouts'] == 1
+
+    @pytest.mark.asyncio
+    async def test_falls_back_until_warmed_up(self) -> None:
+        reranker = CrossEncoderReranker()
+        model = MockCrossEncoder()
+
+        def load_model() -> MockCrossEncoder:
+            reranker._model = model
+            return model
+
+        reranker._get_model = load_model
+        chunks = build_chunks(['a', 'bbb'])
+
+        # 模型載入前不等待，直接回傳向量順序並在背景載入
+        assert await reranker.rerank('query', chunks) == chunks
+        await reranker._load_task
+        reranked = await reranker.rerank('query', chunks)
+        reranker.close()
+
+        assert [chunk.text for chunk in reranked] == ['bbb', 'a']
+        # 第一次是載入後的 warmup 推論
+        assert model.calls == [(1, 1), (2, 2)]
+        assert reranker.stats()['not_ready'] == 1
+
+    def test_select_within_budget(self) -> None:
+        chunks = build_chunks(['今天天氣很好', '訂單已寄出了嗎', 'ok', '收到'])
+
+        selected = select_within_budget(chunks, top_k=3, token_budget=9)
+
+        # 第二個放不進剩餘預算，跳過後由較短的補上
+        assert [chunk.chunk_id for chunk in selected] == ['0', '2', '3']
+        assert select_within_budget(chunks, top_k=1, token_budget=100) == chunks[:1]
+
+    @pytest.mark.asyncio
+    async def test_chat_agent_over_fetches_before_rerank(self) -> None:
+        agent = MockChatAgent(
+            user_name='Alice',
+            encoder=None,
+            llm_chat_func=None,
+            reranker=CrossEncoderReranker(candidates=4),
+        )
+        agent.reranker._model = MockCrossEncoder()
+
+        chunks = await agent._retrieve_context('query', context_window=2)
+        agent.reranker.close()
+
+        assert agent.limit == 4
+        assert [chunk.text for chunk in chunks] == ['dddd', 'bbb', 'cc', 'a']
+
+        agent = MockChatAgent(user_name='Alice', encoder=None, llm_chat_func=None)
+        chunks = await agent._retrieve_context('query', context_window=2)
+
+        assert isinstance(agent.reranker, IdentityReranker)
+        assert agent.limit == 2
+        assert [chunk.text for chunk in chunks] == ['a', 'bbb']
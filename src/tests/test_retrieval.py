@@ -0,0 +1,353 @@
+import uuid
+
+import numpy as np
+import pytest
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import ScoredPoint
+
+from core import retrieval
+from core.retrieval import (
+    RetrievalConstraints,
+    RetrievedChunk,
+    expand_neighbor_chunks,
+    fetch_retrieved_chunks,
+    join_span_texts,
+    merge_overlapping_chunks,
+    to_doc_id,
+)
+from database.qdrant.rag_vec_store import RAGVecStore
+from database.qdrant.storage_profile import get_storage_profile
+from settings import get_settings
+from utils import date_to_timestamp_ms
+
+
+class MockDocCol:
+    calls: list[list[str]] = []
+
+    def __init_subclass__(cls) -> None:
+        cls.calls = []
+
+    @classmethod
+    async def get_doc_by_ids(cls, client: object, ids: list[str]) -> list[dict]:
+        cls.calls.append(ids)
+        # Mongo 回傳的順序與查詢順序無關
+        return [
+            {'_id': _id, 'text': f'{cls.__name__}:{_id}'}
+            for _id in sorted(ids)
+            if not _id.startswith('0')
+        ]
+
+
+class MockChatDoc(MockDocCol):
+    pass
+
+
+class MockGmailDoc(MockDocCol):
+    pass
+
+
+def build_hit(chunk_id: str, source: str, score: float) -> ScoredPoint:
+    return ScoredPoint(
+        id=str(uuid.UUID(chunk_id)),
+        version=0,
+        score=score,
+        payload={'source': source},
+    )
+
+
+class TestFetchRetrievedChunks:
+    @pytest.mark.asyncio
+    async def test_rank_order_and_scores_are_preserved(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(
+            retrieval,
+            'SOURCE_DOC_COLS',
+            {'message': MockChatDoc, 'gmail': MockGmailDoc},
+        )
+        hits = [
+            build_hit('f' * 32, 'message', 0.9),
+            build_hit('a' * 32, 'gmail', 0.8),
+            build_hit('0' * 32, 'message', 0.7),
+            build_hit('c' * 32, 'message', 0.6),
+        ]
+
+        chunks = await fetch_retrieved_chunks(client=None, hits=hits)
+
+        assert [(chunk.chunk_id, chunk.score) for chunk in chunks] == [
+            ('f' * 32, 0.9),
+            ('a' * 32, 0.8),
+            ('c' * 32, 0.6),
+        ]
+        assert chunks[1].text == f'MockGmailDoc:{"a" * 32}'
+        # 每個 source 只查一次
+        assert MockChatDoc.calls == [['f' * 32, '0' * 32, 'c' * 32]]
+        assert MockGmailDoc.calls == [['a' * 32]]
+
+    @pytest.mark.asyncio
+    async def test_unknown_source_raises(self) -> None:
+        with pytest.raises(ValueError):
+            await fetch_retrieved_chunks(
+                client=None, hits=[build_hit('a' * 32, 'unknown', 0.1)]
+            )
+
+
+def build_span_chunk(
+    chunk_id: str, lines: list[int], thread_id: str | None = 'inbox/bob'
+) -> RetrievedChunk:
+    return RetrievedChunk(
+        chunk_id=chunk_id,
+        source='message',
+        score=1.0 / (1 + len(chunk_id)),
+        text='\n'.join(f'Bob: {line}' for line in lines),
+        thread_id=thread_id,
+        start_timestamp=lines[0] * 1000,
+        end_timestamp=lines[-1] * 1000,
+    )
+
+
+class TestSpanMerge:
+    def test_join_span_texts(self) -> None:
+        assert join_span_texts(['a\nb\nc', 'b\nc\nd', 'c', 'e']) == 'a\nb\nc\nd\ne'
+        # 只在較長訊息中出現的文字不算重複
+        assert (
+            join_span_texts(['Alice: hi\nBob: okay', 'Bob: ok'])
+            == 'Alice: hi\nBob: okay\nBob: ok'
+        )
+        assert join_span_texts(['Bob: okay\nAlice: hi', 'kay\nAlice']) == (
+            'Bob: okay\nAlice: hi\nkay\nAlice'
+        )
+
+    def test_merge_overlapping_chunks(self) -> None:
+        chunks = [
+            build_span_chunk('w2', [3, 4, 5, 6, 7]),
+            build_span_chunk('gmail', [1], thread_id=None),
+            build_span_chunk('w1', [0, 1, 2, 3, 4]),
+            build_span_chunk('other', [3, 4, 5], thread_id='inbox/carol'),
+            build_span_chunk('w4', [12, 13, 14]),
+        ]
+
+        merged = merge_overlapping_chunks(chunks)
+
+        assert [chunk.chunk_id for chunk in merged] == ['w2', 'gmail', 'other', 'w4']
+        assert merged[0].text == '\n'.join(f'Bob: {line}' for line in range(8))
+        assert merged[0].score == max(chunks[0].score, chunks[2].score)
+        assert (merged[0].start_timestamp, merged[0].end_timestamp) == (0, 7000)
+        assert merged[0].doc['merged_chunk_ids'] == ['w1', 'w2']
+        assert chunks[0].text == 'Bob: 3\nBob: 4\nBob: 5\nBob: 6\nBob: 7'
+
+    @pytest.mark.asyncio
+    async def test_expand_then_merge_neighbor_spans(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        spans = [list(range(start, start + 4)) for start in range(0, 20, 4)]
+
+        async def get_neighbor_docs(
+            client: object,
+            thread_id: str,
+            start_timestamp: int,
+            end_timestamp: int,
+            before: int,
+            after: int,
+        ) -> list[dict]:
+            idx = next(
+                idx
+                for idx, span in enumerate(spans)
+                if span[0] * 1000 == start_timestamp
+            )
+            return [
+                {
+                    'start_timestamp': span[0] * 1000,
+                    'end_timestamp': span[-1] * 1000,
+                    'text': '\n'.join(f'Bob: {line}' for line in span),
+                }
+                for span in spans[max(idx - before, 0) : idx]
+                + spans[idx + 1 : idx + 1 + after]
+            ]
+
+        monkeypatch.setattr(
+            retrieval.ChatDoc, 'get_neighbor_docs', staticmethod(get_neighbor_docs)
+        )
+        hits = [build_span_chunk('s3', spans[3]), build_span_chunk('s1', spans[1])]
+
+        expanded = await expand_neighbor_chunks(client=None, chunks=hits, neighbors=1)
+        merged = merge_overlapping_chunks(expanded)
+
+        assert expanded[1].text == '\n'.join(f'Bob: {line}' for line in range(12))
+        assert len(merged) == 1
+        assert merged[0].chunk_id == 's3'
+        assert merged[0].text == '\n'.join(f'Bob: {line}' for line in range(20))
+
+
+class TestHybridSearch:
+    @pytest.mark.asyncio
+    async def test_hybrid_search_finds_exact_terms(self) -> None:
+        client = AsyncQdrantClient(location=':memory:')
+        await RAGVecStore.create_collection(client=client)
+        texts = [f'Alice: 今天天氣很好 {idx}' for idx in range(20)]
+        texts[13] = 'Bob: 訂單編號 XK-20931 已經寄出'
+        rng = np.random.default_rng(0)
+        chunks = [
+            {
+                'chunk_id': uuid.UUID(int=idx + 1).hex,
+                'embedding': rng.normal(size=768).tolist(),
+                'text': text,
+                'source': 'message',
+            }
+            for idx, text in enumerate(texts)
+        ]
+        async for _ in RAGVecStore.iter_upsert_points(
+            client=client, batched_iter_points=RAGVecStore.prepare_iter_points(chunks)
+        ):
+            pass
+
+        # dense 最相近的是第 5 筆，第 13 筆排第二，但只有它含有查詢中的單號
+        query_vector = np.array(chunks[5]['embedding']) + 0.8 * np.array(
+            chunks[13]['embedding']
+        )
+        dense_results = await RAGVecStore.search(
+            client=client, query_vector=query_vector.tolist(), limit=3
+        )
+        hybrid_results = await RAGVecStore.search(
+            client=client,
+            query_vector=query_vector.tolist(),
+            query_text='XK-20931 寄到哪裡',
+            limit=3,
+        )
+        await client.close()
+
+        assert to_doc_id(dense_results[0].id) == chunks[5]['chunk_id']
+        assert to_doc_id(hybrid_results[0].id) == chunks[13]['chunk_id']
+
+
+class TestRetrievalConstraints:
+    def test_to_filter_map(self) -> None:
+        constraints = RetrievalConstraints.from_dates(
+            senders=['Bob'], start_date='2025-03-01', end_date='2025-03-31'
+        )
+
+        assert constraints.to_filter_map() == {
+            'senders': ['Bob'],
+            'end_timestamp': {'gte': date_to_timestamp_ms('2025-03-01')},
+            'start_timestamp': {
+                'lte': date_to_timestamp_ms('2025-04-01') - 1,
+            },
+        }
+        assert RetrievalConstraints().to_filter_map() is None
+
+    @pytest.mark.asyncio
+    async def test_filtered_search(self) -> None:
+        client = AsyncQdrantClient(location=':memory:')
+        await RAGVecStore.create_collection(client=client)
+        rng = np.random.default_rng(0)
+        chunks = [
+            {
+                'chunk_id': uuid.UUID(int=idx + 1).hex,
+                'embedding': rng.normal(size=768).tolist(),
+                'text': f'message {idx}',
+                'source': 'message',
+                'senders': ['Alice', sender],
+                'start_timestamp': date_to_timestamp_ms(day),
+                'end_timestamp': date_to_timestamp_ms(day, end_of_day=True),
+                'thread_id': f'inbox/{sender.lower()}',
+            }
+            for idx, (sender, day) in enumerate(
+                [
+                    ('Bob', '2025-02-27'),
+                    ('Bob', '2025-03-15'),
+                    ('Carol', '2025-03-16'),
+                    ('Bob', '2025-04-02'),
+                ]
+            )
+        ]
+        async for _ in RAGVecStore.iter_upsert_points(
+            client=client, batched_iter_points=RAGVecStore.prepare_iter_points(chunks)
+        ):
+            pass
+
+        constraints = RetrievalConstraints.from_dates(
+            senders=['Bob'], start_date='2025-03-01', end_date='2025-03-31'
+        )
+        results = await RAGVecStore.search(
+            client=client,
+            query_vector=rng.normal(size=768).tolist(),
+            query_text='message',
+            limit=10,
+            threshold=-1.0,
+            include_filter_map=constraints.to_filter_map(),
+        )
+        await client.close()
+
+        assert [to_doc_id(point.id) for point in results] == [chunks[1]['chunk_id']]
+        assert results[0].payload['thread_id'] == 'inbox/bob'
+
+
+class TestSearchParams:
+    def test_build_search_params(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        assert RAGVecStore.build_search_params() is None
+
+        monkeypatch.setenv('QDRANT_SEARCH_HNSW_EF', '256')
+        get_settings.cache_clear()
+        params = RAGVecStore.build_search_params()
+        assert params.hnsw_ef == 256
+        assert params.quantization is None
+        assert RAGVecStore.build_search_params(hnsw_ef=32, exact=True).hnsw_ef == 32
+
+        store = RAGVecStore.with_storage_profile(get_storage_profile('float16-binary'))
+        params = store.build_search_params()
+        assert params.quantization.rescore is True
+        assert params.quantization.oversampling == 3.0
+
+        monkeypatch.setenv('QDRANT_SEARCH_OVERSAMPLING', '1.5')
+        get_settings.cache_clear()
+        params = store.build_search_params(rescore=False)
+        assert params.quantization.rescore is False
+        assert params.quantization.oversampling == 1.5
+
+    @pytest.mark.asyncio
+    async def test_search_batch_matches_search(self) -> None:
+        client = AsyncQdrantClient(location=':memory:')
+        await RAGVecStore.create_collection(client=client)
+        rng = np.random.default_rng(0)
+        chunks = [
+            {
+                'chunk_id': uuid.UUID(int=idx + 1).hex,
+                'embedding': rng.normal(size=768).tolist(),
+                'text': f'Alice: 第 {idx} 則訊息',
+                'source': 'message',
+            }
+            for idx in range(30)
+        ]
+        async for _ in RAGVecStore.iter_upsert_points(
+            client=client, batched_iter_points=RAGVecStore.prepare_iter_points(chunks)
+        ):
+            pass
+
+        query_vectors = rng.normal(size=(4, 768)).tolist()
+        query_texts = [None, '第 3 則', None, '第 17 則']
+        batch_results = await RAGVecStore.search_batch(
+            client=client,
+            query_vectors=query_vectors,
+            query_texts=query_texts,
+            threshold=-1.0,
+            limit=5,
+            exact=True,
+        )
+        single_results = [
+            await RAGVecStore.search(
+                client=client,
+                query_vector=query_vector,
+                query_text=query_text,
+                threshold=-1.0,
+                limit=5,
+                exact=True,
+            )
+            for query_vector, query_text in zip(query_vectors, query_texts, strict=True)
+        ]
+        await client.close()
+
+        assert len(batch_results) == 4
+        assert [[point.id for point in points] for points in batch_results] == [
+            [point.id for point in points] for points in single_results
+        ]
+        assert await RAGVecStore.search_batch(client=client, query_vectors=[]) == []
@@ -0,0 +1,162 @@
+from collections.abc import AsyncGenerator
+
+import numpy as np
+import pytest
+
+from core.retrieval import RetrievalConstraints, RetrievedChunk, Retriever
+from core.retrieval_cache import RetrievalCache, invalidate_on_write
+
+EMBEDDINGS = {
+    '上次跟 Bob 去哪裡吃飯': [1.0, 0.0, 0.0],
+    '上次跟 Bob 去哪吃飯？': [0.99, 0.05, 0.0],
+    'Alice 的生日是哪天': [0.0, 1.0, 0.0],
+    '訂單 AB-1234 狀態': [0.0, 0.0, 1.0],
+    '訂單 AB-1235 狀態': [0.0, 0.01, 1.0],
+}
+
+
+class MockEncoder:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def aencode(self, sentences: list[str]) -> np.ndarray:
+        self.calls += 1
+        return np.asarray([EMBEDDINGS[sentence] for sentence in sentences])
+
+
+class MockRetriever(Retriever):
+    async def _search(
+        self,
+        query: str,
+        query_vector: list[float],
+        limit: int,
+        constraints: RetrievalConstraints | None,
+    ) -> list[RetrievedChunk]:
+        self.searches = getattr(self, 'searches', 0) + 1
+        return [RetrievedChunk(chunk_id=query, source='message', score=1.0, text=query)]
+
+
+def put(
+    cache: RetrievalCache,
+    query: str,
+    constraints: RetrievalConstraints | None = None,
+    generation: int | None = None,
+) -> None:
+    cache.put(
+        scope=cache.get_scope(5, constraints),
+        query=query,
+        query_embedding=np.asarray(EMBEDDINGS[query]),
+        constraints=constraints,
+        chunks=[RetrievedChunk(chunk_id=query, source='message', score=1.0, text='')],
+        encode_seconds=0.01,
+        search_seconds=0.1,
+        generation=cache.generation if generation is None else generation,
+    )
+
+
+class TestRetrievalCache:
+    @pytest.mark.asyncio
+    async def test_exact_and_similar_hits(self) -> None:
+        encoder = MockEncoder()
+        retriever = MockRetriever(encoder=encoder, cache=RetrievalCache())
+
+        first = await retriever.retrieve('上次跟 Bob 去哪裡吃飯')
+        exact = await retriever.retrieve(' 上次跟 Bob 去哪裡吃飯')
+        similar = await retriever.retrieve('上次跟 Bob 去哪吃飯？')
+        other = await retriever.retrieve('Alice 的生日是哪天')
+
+        assert [chunk.chunk_id for chunk in exact] == [first[0].chunk_id]
+        assert [chunk.chunk_id for chunk in similar] == [first[0].chunk_id]
+        assert other[0].chunk_id == 'Alice 的生日是哪天'
+        # exact hit 連 embedding 都省掉，similar hit 只省掉搜尋
+        assert encoder.calls == 3
+        assert retriever.searches == 2
+
+        stats = retriever.cache.stats()
+        assert stats['exact_hits'] == 1
+        assert stats['similar_hits'] == 1
+        assert stats['misses'] == 2
+        assert stats['hit_ratio'] == 0.5
+        assert stats['saved_seconds'] > 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(('match_keywords', 'searches'), [(True, 2), (False, 1)])
+    async def test_similar_hit_requires_same_keywords(
+        self, match_keywords: bool, searches: int
+    ) -> None:
+        retriever = MockRetriever(
+            encoder=MockEncoder(), cache=RetrievalCache(match_keywords=match_keywords)
+        )
+
+        await retriever.retrieve('訂單 AB-1234 狀態')
+        other = await retriever.retrieve('訂單 AB-1235 狀態')
+
+        assert retriever.searches == searches
+        if match_keywords:
+            assert other[0].chunk_id == '訂單 AB-1235 狀態'
+
+    def test_scope_separates_constraints(self) -> None:
+        cache = RetrievalCache()
+        constraints = RetrievalConstraints(senders=['Bob'])
+        put(cache, '上次跟 Bob 去哪裡吃飯', constraints=constraints)
+
+        scope = cache.get_scope(5, None)
+        assert cache.get_exact(scope, '上次跟 Bob 去哪裡吃飯') is None
+        assert (
+            cache.get_similar(
+                scope, '上次跟 Bob 去哪裡吃飯', np.asarray([1.0, 0.0, 0.0])
+            )
+            is None
+        )
+        assert cache.get_exact(cache.get_scope(5, constraints), '上次跟 Bob 去哪裡吃飯')
+
+    def test_invalidate_by_source(self) -> None:
+        cache = RetrievalCache()
+        gmail_only = RetrievalConstraints(sources=['gmail'])
+        put(cache, '上次跟 Bob 去哪裡吃飯', constraints=gmail_only)
+        put(cache, 'Alice 的生日是哪天')
+
+        # 沒限定 source 的結果也可能含有 message，要一起失效
+        assert cache.invalidate('message') == 1
+        assert cache.get_exact(cache.get_scope(5, gmail_only), '上次跟 Bob 去哪裡吃飯')
+        assert cache.invalidate('gmail') == 1
+        assert len(cache) == 0
+
+    def test_stale_put_is_dropped(self) -> None:
+        cache = RetrievalCache()
+        generation = cache.generation
+        cache.invalidate('message')
+        put(cache, 'Alice 的生日是哪天', generation=generation)
+
+        assert len(cache) == 0
+
+    def test_ttl_and_lru(self) -> None:
+        cache = RetrievalCache(max_size=2)
+        scope = cache.get_scope(5, None)
+        put(cache, '上次跟 Bob 去哪裡吃飯')
+        put(cache, 'Alice 的生日是哪天')
+        assert cache.get_exact(scope, '上次跟 Bob 去哪裡吃飯')
+        put(cache, '上次跟 Bob 去哪吃飯？')
+
+        assert cache.get_exact(scope, 'Alice 的生日是哪天') is None
+        assert len(cache) == 2
+
+        expired = RetrievalCache(ttl_seconds=0.0)
+        put(expired, 'Alice 的生日是哪天')
+        assert expired.get_exact(scope, 'Alice 的生日是哪天') is None
+        assert len(expired) == 0
+
+    @pytest.mark.asyncio
+    async def test_invalidate_on_write(self) -> None:
+        cache = RetrievalCache()
+
+        async def run() -> AsyncGenerator[int, None]:
+            for idx in range(2):
+                put(cache, 'Alice 的生日是哪天')
+                yield idx
+
+        progress = [item async for item in invalidate_on_write(cache, 'gmail', run)()]
+
+        assert progress == [0, 1]
+        assert len(cache) == 0
+        assert cache.stats()['invalidations'] == 3
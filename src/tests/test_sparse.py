@@ -0,0 +1,19 @@
+from embedding.sparse import SparseEncoder, tokenize
+
+
+class TestSparseEncoder:
+    def test_tokenize_mixed_text(self) -> None:
+        tokens = tokenize('跟Alice約台北，訂單 AB-1234')
+
+        assert 'alice' in tokens
+        assert 'ab-1234' in tokens
+        assert {'台', '北', '台北', '訂單'} <= set(tokens)
+
+    def test_document_weights_saturate(self) -> None:
+        encoder = SparseEncoder()
+        once = encoder.encode_document('AB-1234')
+        many = encoder.encode_document(' '.join(['AB-1234'] * 20))
+
+        assert once.indices == many.indices
+        assert once.values[0] < many.values[0] < encoder.k1 + 1
+        assert encoder.encode_query('ab-1234 AB-1234').values == [1.0]
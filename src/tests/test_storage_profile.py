@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    Datatype,
+    ScalarQuantization,
+    ScalarType,
+)
+
+from database.qdrant.rag_vec_store import (
+    BASE_VERSION_NAME,
+    RAGVecStore,
+    get_rag_vec_store,
+)
+from database.qdrant.storage_profile import (
+    DEFAULT_STORAGE_PROFILE,
+    VECTOR_STORAGE_PROFILES,
+    get_storage_profile,
+)
+from settings import get_settings
+
+
+class TestVectorStorageProfile:
+    def test_project_truncates_and_normalizes(self) -> None:
+        vector = np.random.default_rng(0).normal(size=768)
+
+        full = get_storage_profile('float16').project(vector)
+        truncated = get_storage_profile('float16-d512-int8').project(vector)
+
+        assert len(full) == 768
+        np.testing.assert_allclose(full, vector, rtol=1e-6)
+        assert len(truncated) == 512
+        assert np.linalg.norm(truncated) == pytest.approx(1.0)
+        # 比 profile 短的向量原樣保留
+        assert (
+            len(get_storage_profile('float16-d512-int8').project(vector[:256])) == 256
+        )
+
+    def test_collection_version_names_are_distinct(self) -> None:
+        names = [
+            profile.collection_version_name(BASE_VERSION_NAME)
+            for profile in VECTOR_STORAGE_PROFILES.values()
+        ]
+
+        assert len(set(names)) == len(VECTOR_STORAGE_PROFILES)
+        assert (
+            get_storage_profile(DEFAULT_STORAGE_PROFILE).collection_version_name(
+                BASE_VERSION_NAME
+            )
+            == BASE_VERSION_NAME
+        )
+
+    def test_unknown_profile(self) -> None:
+        with pytest.raises(ValueError, match='Unknown vector storage profile'):
+            get_storage_profile('float8')
+
+    @pytest.mark.parametrize(
+        ('name', 'quantization_type', 'ram_bytes', 'disk_bytes'),
+        [
+            ('float32', None, 768 * 4 + 384, 0),
+            ('float16', None, 768 * 2 + 384, 0),
+            ('float16-int8', ScalarQuantization, 768 + 384, 768 * 2),
+            ('float16-binary', BinaryQuantization, 96 + 384, 768 * 2),
+            ('float16-d512-int8', ScalarQuantization, 512 + 256, 512 * 2),
+        ],
+    )
+    def test_quantization_config(
+        self,
+        name: str,
+        quantization_type: type | None,
+        ram_bytes: int,
+        disk_bytes: int,
+    ) -> None:
+        profile = get_storage_profile(name)
+        vector_params = profile.vector_params()
+
+        if quantization_type is None:
+            assert profile.quantization_config is None
+            assert profile.search_params() is None
+            assert vector_params.on_disk is False
+        else:
+            assert isinstance(profile.quantization_config, quantization_type)
+            assert profile.search_params().quantization.rescore is True
+            assert vector_params.on_disk is True
+        if quantization_type is ScalarQuantization:
+            assert profile.quantization_config.scalar.type == ScalarType.INT8
+        assert vector_params.size == profile.size
+        assert profile.estimate_bytes_per_point() == {
+            'ram': ram_bytes,
+            'disk': disk_bytes,
+        }
+
+    def test_with_storage_profile(self) -> None:
+        profile = get_storage_profile('float16-d512-int8')
+        store = RAGVecStore.with_storage_profile(profile)
+
+        assert issubclass(store, RAGVecStore)
+        assert store.COLLECTION_VERSION_NAME == f'{BASE_VERSION_NAME}-{profile.name}'
+        assert store.VECTOR_CONFIG['default'].size == 512
+        assert store.VECTOR_CONFIG['default'].datatype == Datatype.FLOAT16
+        assert store.HNSW_CONFIG.m == 32
+        assert len(store.prepare_query_vector([1.0] * 768)) == 512
+        assert RAGVecStore.STORAGE_PROFILE.name == DEFAULT_STORAGE_PROFILE
+
+    def test_get_rag_vec_store(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        assert get_rag_vec_store(DEFAULT_STORAGE_PROFILE) is RAGVecStore
+        store = get_rag_vec_store('float16-int8')
+        assert store is get_rag_vec_store('float16-int8')
+        assert store.STORAGE_PROFILE.name == 'float16-int8'
+
+        # 設定錯誤在第一次使用時才報錯，不影響 import
+        monkeypatch.setenv('VECTOR_STORAGE_PROFILE', 'float8')
+        get_settings.cache_clear()
+        get_rag_vec_store.cache_clear()
+        try:
+            with pytest.raises(ValueError, match='float8'):
+                get_rag_vec_store()
+        finally:
+            get_rag_vec_store.cache_clear()
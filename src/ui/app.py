@@ -1,5 +1,6 @@
 import asyncio
 import json
+import time
 from datetime import UTC, datetime, timedelta, timezone
 
 import httpx
@@ -25,44 +26,63 @@ with import_tab:
         accept_multiple_files=True,
     )
 
-    async def send_to_backend_and_stream(data: list[dict]) -> None:
+    async def upload_files_and_stream(files: list) -> None:
         progress = st.progress(0)
         status_text = st.empty()
+        file_keys = [(f.name, f.size) for f in files]
 
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(base_url='http://api:8000') as client:
             try:
-                async with client.stream(
-                    'POST',
-                    'http://api:8000/ingest/message',
-                    json={'documents': data},
-                    timeout=1200,
-                ) as resp:
-                    async for line in resp.aiter_lines():
-                        if not line.strip():
-                            continue
-                        try:
+                # 同一批檔案重新送出時沿用上次的 job，從最後 commit 的檔案接續
+                upload = st.session_state.get('message_upload')
+                if upload and upload['files'] == file_keys:
+                    resp = await client.get(
+                        f'/ingest/message/uploads/{upload["job_id"]}', timeout=10
+                    )
+                    resp.raise_for_status()
+                    committed = resp.json()['committed_documents']
+                else:
+                    resp = await client.post('/ingest/message/uploads', timeout=10)
+                    resp.raise_for_status()
+                    upload = {'job_id': resp.json()['job_id'], 'files': file_keys}
+                    st.session_state['message_upload'] = upload
+                    committed = 0
+
+                for idx, f in enumerate(files):
+                    if idx < committed:
+                        continue
+
+                    async with client.stream(
+                        'PUT',
+                        f'/ingest/message/uploads/{upload["job_id"]}',
+                        params={'offset': idx},
+                        content=f.getvalue(),
+                        headers={'Content-Type': 'application/x-ndjson'},
+                        timeout=None,
+                    ) as resp:
+                        resp.raise_for_status()
+                        async for line in resp.aiter_lines():
+                            if not line.strip():
+                                continue
                             info = json.loads(line)
-                            ratio = info.get('indexed_ratio', 0)
+                            if info.get('status') == 'error':
+                                raise RuntimeError(f'{f.name}: {info["message"]}')
+                            ratio = (idx + info.get('indexed_ratio', 0)) / len(files)
                             percent = int(ratio * 100)
                             progress.progress(percent)
-                            status_text.markdown(f'🚀 Completed: {percent}%')
-                        except Exception as e:
-                            st.warning(f'Unable to parse response: {line} ({e})')
-                    st.success('✅ Indexing completed')
+                            status_text.markdown(
+                                f'🚀 Completed: {percent}% ({f.name}, '
+                                f'embedded {info.get("embedded_chunks", 0)}, '
+                                f'skipped {info.get("skipped_chunks", 0)})'
+                            )
+
+                st.session_state.pop('message_upload', None)
+                st.success('✅ Indexing completed')
             except Exception as e:
-                st.error(f'❌ Sending failed: {e}')
+                st.error(f'❌ Sending failed: {e}. Send again to resume.')
 
     if uploaded_files and st.button('📨 Send to Backend and Index'):
-        docs = []
-        for f in uploaded_files:
-            try:
-                content = json.load(f)
-                docs.append(content)
-            except Exception as e:
-                st.error(f'{f.name} Parsing failed: {e}')
-
-        if docs:
-            asyncio.run(send_to_backend_and_stream(docs))
+        asyncio.run(upload_files_and_stream(uploaded_files))
 
     # ------------- Gmail 授權與導入區塊 -------------
     st.markdown('---')
@@ -104,27 +124,31 @@ with import_tab:
         status_text = st.empty()
 
         try:
-            with httpx.stream(
-                'POST', 'http://api:8000/ingest/gmail', timeout=None
-            ) as response:
-                if response.status_code != 200:
-                    st.error(
-                        f'❌ Import failed: {response.status_code} {response.text}'
-                    )
-                else:
-                    for line in response.iter_lines():
-                        if line:
-                            try:
-                                data = json.loads(line)
-                                ratio = data.get('indexed_ratio', 0)
-                                percent = int(ratio * 100)
-                                progress_bar.progress(
-                                    percent, text=f'Importing... {percent}%'
-                                )
-                                status_text.text(f'{percent}% completed')
-                            except json.JSONDecodeError:
-                                st.warning('⚠️ Received malformed line from stream.')
-            st.success('✅ Import completed!')
+            resp = httpx.post('http://api:8000/ingest/gmail', timeout=30)
+            resp.raise_for_status()
+            job = resp.json()
+
+            # 匯入在後端背景執行，這裡只輪詢進度
+            while job['status'] in ('queued', 'running'):
+                time.sleep(1)
+                resp = httpx.get(
+                    f'http://api:8000/ingest/jobs/{job["job_id"]}', timeout=10
+                )
+                resp.raise_for_status()
+                job = resp.json()
+                percent = int(job.get('indexed_ratio', 0) * 100)
+                eta = job.get('eta_seconds')
+                progress_bar.progress(percent, text=f'Importing... {percent}%')
+                status_text.text(
+                    f'{percent}% completed, '
+                    f'{job.get("chunks_per_second", 0):.1f} chunks/s'
+                    + (f', ETA {eta:.0f}s' if eta is not None else '')
+                )
+
+            if job['status'] == 'completed':
+                st.success('✅ Import completed!')
+            else:
+                st.error(f'❌ Import {job["status"]}: {job.get("error") or ""}')
         except Exception as e:
             st.error(f'❌ Failed to start import: {e}')
 
@@ -176,6 +200,21 @@ with chat_tab:
 
             st.session_state.api_key = None
 
+    # 檢索條件會在 Qdrant 搜尋時直接套用
+    with st.expander('🔎 Retrieval Filters', expanded=False):
+        senders_text = st.text_input(
+            'Senders (comma separated)', placeholder='e.g., Alice, Bob'
+        )
+        date_range = st.date_input('Date range', value=())
+        st.session_state.retrieval_filters = {
+            'senders': [
+                sender.strip() for sender in senders_text.split(',') if sender.strip()
+            ]
+            or None,
+            'start_date': date_range[0].isoformat() if len(date_range) > 0 else None,
+            'end_date': date_range[1].isoformat() if len(date_range) > 1 else None,
+        }
+
     if 'messages' not in st.session_state:
         st.session_state.messages = []
 
@@ -215,6 +254,7 @@ with chat_tab:
                     'llm_name': st.session_state.llm_name,
                     'api_key': st.session_state.api_key,
                     'user_name': st.session_state.user_name,
+                    **st.session_state.retrieval_filters,
                 }
                 if st.session_state.api_key:
                     payload['api_key'] = st.session_state.api_key
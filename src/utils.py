@@ -1,6 +1,12 @@
+import asyncio
 import hashlib
+import math
 import re
-from datetime import datetime, timedelta, timezone
+from collections.abc import AsyncGenerator, Awaitable, Iterable
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+
+from embedding.sparse import CJK_PATTERN
 
 
 def ensure_date_type(
@@ -25,6 +31,18 @@ def ensure_date_type(
     return dt.strftime('%Y-%m-%d')
 
 
+def date_to_timestamp_ms(
+    value: str | date, end_of_day: bool = False, tz_offset_hours: int = 8
+) -> int:
+    tz = timezone(timedelta(hours=tz_offset_hours))
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d').date()
+    dt = datetime(value.year, value.month, value.day, tzinfo=tz)
+    if end_of_day:
+        dt += timedelta(days=1, milliseconds=-1)
+    return int(dt.timestamp() * 1000)
+
+
 def decode_content(content_str: str) -> str:
     try:
         content_str.encode('utf-8')
@@ -36,6 +54,12 @@ def decode_content(content_str: str) -> str:
             return content_str
 
 
+def estimate_tokens(text: str) -> int:
+    # 粗估：CJK 每個字約一個 token，其餘約 4 個字元一個 token
+    cjk_count = len(CJK_PATTERN.findall(text))
+    return cjk_count + math.ceil((len(text) - cjk_count) / 4)
+
+
 def mask_urls(text: str) -> str:
     return re.sub(r'https?://\S+', '[LINK]', text)
 
@@ -48,3 +72,29 @@ def generate_message_chunk_id(start_ts: int, end_ts: int, senders: list[str]) ->
 def generate_gmail_chunk_id(on_date: str, message_id: str) -> str:
     base = f'{on_date}-{message_id}'
     return hashlib.md5(base.encode()).hexdigest()
+
+
+async def iter_bounded_gather(
+    aws: Iterable[Awaitable], limit: int
+) -> AsyncGenerator[Any, None]:
+    # 最多同時 limit 個 awaitable 在跑，依完成順序回傳結果
+    pending = set()
+    try:
+        for aw in aws:
+            pending.add(asyncio.ensure_future(aw))
+            if len(pending) >= limit:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()